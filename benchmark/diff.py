@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/diff.py
+#
+# benchmark of comparing two dumps
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Compares two synthetic --json dumps with json.load() and with debinsight.diff.
+
+Usage: python3 benchmark/diff.py [PACKAGES] [FILES_PER_PACKAGE] [CHANGED_EVERY]
+
+Every CHANGED_EVERY'th package of the second dump gets a new version
+and an additional file. Each way runs in a process of its own, so the
+peak RSS reported is its own.
+"""
+
+import json
+import os
+import os.path
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LOAD = '''
+import json, sys
+old = json.load(open(sys.argv[1]))
+new = json.load(open(sys.argv[2]))
+print(sum(1 for pkg in old.keys() | new.keys() if old.get(pkg) != new.get(pkg)))
+'''
+
+_DIFF = '''
+import io, sys
+from debinsight import diff
+summary = diff.diff(sys.argv[1], sys.argv[2], io.StringIO())
+print(sum(summary[change] for change in diff.CHANGES))
+'''
+
+
+def _write_dump(path: str, packages: int, files: int, changed_every: int) -> None:
+    """Writes a synthetic dump like --json does."""
+    with open(path, 'wt') as f:
+        f.write('{')
+        for n in range(packages):
+            pkg = 'package-' + str(n)
+            paths = {'/usr/share/' + pkg + '/dir' + str(i % 16) + '/file' + str(i): i for i in range(files)}
+            record = {'package': pkg, 'version': '1.0-' + str(n), 'status': 'install ok installed',
+                      'depends': [{'package': 'package-' + str((n + 1) % packages), 'version': '>= 1.0'}],
+                      'files': paths, 'installed': sum(paths.values())}
+            if changed_every and n % changed_every == 0:
+                record['version'] = '1.0-' + str(n) + '+b1'
+                record['files']['/usr/share/' + pkg + '/new'] = 1
+                record['installed'] = record['installed'] + 1
+            f.write(('' if n == 0 else ', ') + json.dumps(pkg) + ': ' + json.dumps(record))
+        f.write('}')
+
+
+def _run(code: str, old: str, new: str) -> tuple:
+    """Runs a way to compare the dumps in a process of its own.
+
+    :return:    tuple of wall time, peak RSS (KB) and the number of changed packages found
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = SOURCE_ROOT
+    t = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', code, old, new], env=env, stdout=subprocess.PIPE, text=True,
+                          check=True)
+    wall = time.perf_counter() - t
+    return wall, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss, proc.stdout.strip()
+
+
+def main() -> None:
+    packages = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    changed_every = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    with tempfile.TemporaryDirectory(prefix='debinsight-diff-') as directory:
+        old = os.path.join(directory, 'old.json')
+        new = os.path.join(directory, 'new.json')
+        _write_dump(old, packages, files, 0)
+        _write_dump(new, packages, files, changed_every)
+        print('{} packages with {} files each, {:.1f} MB per dump'.format(
+            packages, files, os.path.getsize(old) / (1 << 20)))
+        # the diff runs first: RUSAGE_CHILDREN reports the maximum over all children so far
+        for name, code in (('debinsight.diff', _DIFF), ('json.load', _LOAD)):
+            wall, rss, changed = _run(code, old, new)
+            print('{:16} {:7.2f} s   peak RSS {:8.1f} MB   {} packages changed'.format(name, wall, rss / 1024, changed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/generate.py
+#
+# generator of a synthetic dpkg database
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Fabricates a synthetic dpkg database for benchmarking debinsight offline.
+
+The generated tree looks like this:
+
+    ROOT/admin/status           the dpkg status file
+    ROOT/admin/info/*.list      the file lists of the packages
+    ROOT/files/...              the (small) files installed by the packages
+    ROOT/bin/dpkg-query         a fake dpkg-query reading ROOT/admin
+    ROOT/bin/apt-cache          a fake apt-cache reading ROOT/admin
+    ROOT/calls.log              one line per invocation of a fake tool
+
+Packages are named 'pkg-00000', 'pkg-00001', ... and only depend on
+packages with a higher number, so 'pkg-00000' has the biggest
+dependency closure and the last package the biggest reverse
+dependency closure.
+
+Usage: python3 benchmark/generate.py ROOT [PACKAGES] [FANOUT] [FILES_PER_PACKAGE]
+"""
+
+import os
+import os.path
+import random
+import stat
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debinsight.model import Names, Relations
+
+_FAKE_TOOL = r'''#!{python}
+# fake {tool} of the debinsight benchmark, reading {admin}
+import os
+import re
+import sys
+
+ADMIN = {admin!r}
+
+
+def stanzas():
+    with open(os.path.join(ADMIN, 'status')) as f:
+        for text in f.read().split('\n\n'):
+            if text.strip():
+                fields = dict(re.findall(r'^(\S+): (.*)$', text, re.M))
+                yield fields['Package'], fields, text.strip('\n') + '\n'
+
+
+def read_list(pkg):
+    with open(os.path.join(ADMIN, 'info', pkg + '.list')) as f:
+        return f.read()
+
+
+def dpkg_query(args):
+    if args[0] in ('-s', '--status'):
+        wanted = set(args[1:])
+        found = [text for name, _, text in stanzas() if name in wanted]
+        sys.stdout.write('\n'.join(found))
+        for name in wanted - set(name for name, _, _ in stanzas()):
+            sys.stderr.write('dpkg-query: package \'' + name + '\' is not installed\n')
+            return 1
+        return 0
+    if args[0] in ('-L', '--listfiles'):
+        try:
+            sys.stdout.write(read_list(args[1]))
+        except OSError:
+            sys.stderr.write('dpkg-query: package \'' + args[1] + '\' is not installed\n')
+            return 1
+        return 0
+    if args[0] in ('-S', '--search'):
+        wanted = set(args[1:])
+        found = set()
+        for name, _, _ in stanzas():
+            for line in read_list(name).splitlines():
+                if line in wanted:
+                    sys.stdout.write(name + ': ' + line + '\n')
+                    found.add(line)
+        for path in sorted(wanted - found):
+            sys.stderr.write('dpkg-query: no path found matching pattern ' + path + '\n')
+        return 0 if found == wanted else 1
+    if args[0] in ('-W', '--show'):
+        fmt = args[1].partition('=')[2].encode().decode('unicode_escape')
+        for name, fields, _ in stanzas():
+            line = fmt.replace('${{db:Status-Abbrev}}', 'ii ').replace('${{binary:Package}}', name)
+            line = re.sub(r'\$\{{(\S+?)\}}', lambda m: fields.get(m.group(1), ''), line)
+            sys.stdout.write(line)
+        return 0
+    return 2
+
+
+def apt_cache(args):
+    if args[0] != 'rdepends':
+        return 2
+    pkg = args[1]
+    rdepends = []
+    for name, fields, _ in stanzas():
+        for key in ('Depends', 'Pre-Depends', 'Recommends', 'Suggests'):
+            names = [n.strip().split(' ')[0] for n in re.split('[,|]', fields.get(key, ''))]
+            if pkg in names and name not in rdepends:
+                rdepends.append(name)
+    sys.stdout.write(pkg + '\nReverse Depends:\n' + ''.join('  ' + name + '\n' for name in rdepends))
+    return 0
+
+
+LOG = os.path.join(os.path.dirname(ADMIN), 'calls.log')
+ARGS = sys.argv[1:]
+# debinsight passes --admindir before the action
+while ARGS and ARGS[0].startswith('--admindir'):
+    option = ARGS.pop(0)
+    ADMIN = option.partition('=')[2] if '=' in option else ARGS.pop(0)
+
+with open(LOG, 'a') as log:
+    log.write('{tool} ' + ' '.join(ARGS[:1]) + '\n')
+sys.exit({function}(ARGS))
+'''
+
+
+def package_name(n: int) -> str:
+    """The name of the n-th synthetic package."""
+    return 'pkg-{:05d}'.format(n)
+
+
+def package_files(root: str, n: int, files: int) -> list:
+    """The paths of the files installed by the n-th synthetic package."""
+    base = os.path.join(os.path.abspath(root), 'files', package_name(n))
+    return [os.path.join(base, 'd' + str(i % 8), 'f' + str(i)) for i in range(files)]
+
+
+def relations_from_pairs(pairs: list, names: Names) -> Relations:
+    """Relations from (package name, version constraint or None) pairs, without alternatives."""
+    return Relations.from_groups([[(pkg, None, version)] for pkg, version in pairs], names)
+
+
+def generate(root: str, packages: int = 1000, fanout: int = 4, files: int = 20, seed: int = 0) -> None:
+    """Generates a synthetic dpkg database.
+
+    :param root:        the directory to generate the database in (created if needed)
+    :param packages:    number of installed packages
+    :param fanout:      number of dependencies per package (at most)
+    :param files:       number of files per package
+    :param seed:        seed of the random generator
+    """
+    rnd = random.Random(seed)
+    admin = os.path.join(root, 'admin')
+    os.makedirs(os.path.join(admin, 'info'), exist_ok=True)
+    os.makedirs(os.path.join(root, 'bin'), exist_ok=True)
+
+    with open(os.path.join(admin, 'status'), 'wt') as status:
+        for n in range(packages):
+            name = package_name(n)
+            later = range(n + 1, packages)
+            depends = [package_name(d) for d in sorted(rnd.sample(later, min(fanout, len(later))))]
+            if len(depends) > 1:
+                depends[-1] = depends[-1] + ' (>= 1.0)'
+            if len(depends) > 2:
+                depends[0] = depends[0] + ' | ' + package_name(rnd.choice(later))
+            status.write('Package: ' + name + '\n')
+            status.write('Status: install ok installed\n')
+            status.write('Priority: optional\nSection: misc\n')
+            status.write('Installed-Size: ' + str(files * 4) + '\n')
+            status.write('Maintainer: Benchmark <benchmark@example.com>\n')
+            status.write('Architecture: amd64\n')
+            status.write('Version: 1.' + str(n) + '-1\n')
+            if depends:
+                status.write('Depends: ' + ', '.join(depends) + '\n')
+            status.write('Description: synthetic package number ' + str(n) + '\n')
+            status.write(' This package has been generated by the debinsight benchmark.\n\n')
+
+            paths = package_files(root, n, files)
+            directories = sorted(set(os.path.dirname(path) for path in paths))
+            with open(os.path.join(admin, 'info', name + '.list'), 'wt') as f:
+                f.write('/.\n')
+                for directory in directories:
+                    f.write(directory + '\n')
+                for path in paths:
+                    f.write(path + '\n')
+            for directory in directories:
+                os.makedirs(directory, exist_ok=True)
+            for i, path in enumerate(paths):
+                with open(path, 'wb') as f:
+                    f.write(b'x' * (i * 37 % 2048))
+
+    for tool, function in (('dpkg-query', 'dpkg_query'), ('apt-cache', 'apt_cache')):
+        path = os.path.join(root, 'bin', tool)
+        with open(path, 'wt') as f:
+            f.write(_FAKE_TOOL.format(python=sys.executable, tool=tool, function=function,
+                                      admin=os.path.abspath(admin)))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+    args = [int(a) for a in sys.argv[2:5]]
+    generate(sys.argv[1], *args)
+
+
+if __name__ == '__main__':
+    main()
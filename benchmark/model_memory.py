@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/model_memory.py
+#
+# benchmark of the memory footprint of the package model
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Compares the memory needed for all installed packages as nested dicts and as debinsight.model.
+
+Usage: python3 benchmark/model_memory.py [ADMINDIR]
+"""
+
+import gc
+import os
+import os.path
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debinsight.configuration import Configuration
+from debinsight.dpkg import DpkgDatabase, RELATION_FIELDS
+from debinsight.model import INTERNED_FIELDS, FileList, Names, Package
+from generate import relations_from_pairs
+
+
+def _split_relations(value: str) -> list:
+    """Splits a relation field like the former debinsight did."""
+    pairs = []
+    for pkg in value.split(','):
+        pkg = pkg.strip()
+        m = re.match(r'(^.*).\((.*)\)', pkg)
+        pairs.append((m.group(1), m.group(2)) if m else (pkg, None))
+    return pairs
+
+
+def _read_files(listing: str) -> list:
+    """Splits a .list file content into (path, fake size) tuples, allocating fresh path strings."""
+    return [(path, len(path) * 997) for path in listing.splitlines()]
+
+
+def _as_dicts(data: list) -> dict:
+    """Builds the former nested dict model."""
+    packages = {}
+    for name, fields, rdepends, files in data:
+        p = {}
+        for key, value in fields.items():
+            if key in RELATION_FIELDS:
+                value = [{'package': pkg} if version is None else {'package': pkg, 'version': version}
+                         for pkg, version in _split_relations(value)]
+            p[key] = value
+        p['rdepend'] = [{'package': rdep, 'installed': True} for rdep in rdepends]
+        files = _read_files(files)
+        p['files'] = {path: size for path, size in files}
+        p['installed'] = sum(size for _, size in files)
+        packages[name] = p
+    return packages
+
+
+def _as_model(data: list) -> tuple:
+    """Builds the compact model."""
+    names = Names()
+    packages = {}
+    for name, fields, rdepends, files in data:
+        values = {}
+        for key, value in fields.items():
+            if key in RELATION_FIELDS:
+                value = relations_from_pairs(_split_relations(value), names)
+            elif key in INTERNED_FIELDS:
+                value = sys.intern(value)
+            values[sys.intern(key)] = value
+        p = Package(name, values)
+        for rdep in rdepends:
+            p.add_reverse_dependency(names.intern(rdep), True)
+        p.set_files(FileList.from_items(_read_files(files)))
+        packages[name] = p
+    return names, packages
+
+
+def _measure(build, data: list) -> tuple:
+    """Measures the memory allocated by a model which is kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    t = time.perf_counter()
+    model = build(data)
+    elapsed = time.perf_counter() - t
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del model
+    return size, elapsed
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        Configuration().admin_dir = sys.argv[1]
+    dpkg = DpkgDatabase()
+    data = []
+    for name, fields in dpkg.status.items():
+        if ':' in name:
+            continue
+        files = '\n'.join(dpkg.list_files(name) or [])
+        data.append((name, fields, sorted(dpkg.reverse_dependencies(name)), files))
+
+    files = sum(len(d[3].splitlines()) for d in data)
+    dict_size, dict_time = _measure(_as_dicts, data)
+    model_size, model_time = _measure(_as_model, data)
+    print('packages: {}, files: {}'.format(len(data), files))
+    print('nested dicts: {:8.1f} MiB  {:.2f} s'.format(dict_size / 2**20, dict_time))
+    print('model:        {:8.1f} MiB  {:.2f} s ({:.1f}x smaller)'.format(model_size / 2**20, model_time,
+                                                                         dict_size / model_size))
+
+
+if __name__ == '__main__':
+    main()
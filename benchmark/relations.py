@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/relations.py
+#
+# benchmark of the stanza and relation parsing
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Compares the former regex based parsing of package status with the deb822 parser on a full status file.
+
+The former path matched '(^.*): (.*)' on each line (dropping
+continuation lines) and split relation fields on ',' only, matching
+'(^.*).\\((.*)\\)' on each item.
+
+Usage: python3 benchmark/relations.py [ADMINDIR] [ROUNDS]
+"""
+
+import os
+import os.path
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debinsight.deb822 import RELATION_FIELDS, iter_stanzas, parse_relations
+
+
+def _former(text: str) -> list:
+    """Parses all stanzas like the former debinsight did."""
+    packages = []
+    for chunk in text.split('\n\n'):
+        fields = {}
+        for line in chunk.splitlines():
+            m = re.search(r'(^.*): (.*)', line)
+            if m:
+                fields[m.group(1).lower()] = m.group(2)
+        for key, value in fields.items():
+            if key in ['replaces', 'depends', 'breaks', 'recommends', 'conflicts', 'suggests', 'pre-depends']:
+                relations = []
+                for pkg in value.split(','):
+                    pkg = pkg.strip()
+                    m = re.match(r'(^.*).\((.*)\)', pkg)
+                    relations.append((m.group(1), m.group(2)) if m else (pkg, None))
+                fields[key] = relations
+        if fields:
+            packages.append(fields)
+    return packages
+
+
+def _deb822(text: str) -> list:
+    """Parses all stanzas with the deb822 parser."""
+    packages = []
+    for fields in iter_stanzas(text.splitlines()):
+        for key in RELATION_FIELDS:
+            value = fields.get(key, None)
+            if value is not None:
+                fields[key] = parse_relations(value)
+        packages.append(fields)
+    return packages
+
+
+def _timed(parse, text: str, rounds: int) -> tuple:
+    """Runs a parser several times and returns the best time and the result."""
+    best = None
+    result = None
+    for _ in range(rounds):
+        t = time.perf_counter()
+        result = parse(text)
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main() -> None:
+    admin_dir = sys.argv[1] if len(sys.argv) > 1 else '/var/lib/dpkg'
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with open(os.path.join(admin_dir, 'status'), 'rt', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+
+    former_time, former = _timed(_former, text, rounds)
+    deb822_time, deb822 = _timed(_deb822, text, rounds)
+
+    bogus = 0
+    for fields in former:
+        for value in fields.values():
+            for name, _ in value if isinstance(value, list) else ():
+                if re.search(r'[\s|:]', name):
+                    bogus = bogus + 1
+    multiline = sum(1 for fields in deb822 for value in fields.values() if isinstance(value, str) and '\n' in value)
+
+    print('status file:               {} ({} KiB, {} stanzas)'.format(admin_dir, len(text) // 1024, len(deb822)))
+    print('former regex parsing:      {:8.1f} ms ({} bogus package names)'.format(former_time * 1000, bogus))
+    print('deb822 parsing:            {:8.1f} ms'.format(deb822_time * 1000))
+    print('speedup:                   {:8.2f}x'.format(former_time / deb822_time))
+    print('multi-line fields kept:    {:8d} (dropped by the former parsing)'.format(multiline))
+
+
+if __name__ == '__main__':
+    main()
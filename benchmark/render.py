@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/render.py
+#
+# benchmark of rendering the report
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Renders a synthetic database with per-line print() calls and with debinsight.render.
+
+Usage: python3 benchmark/render.py [PACKAGES] [FILES_PER_PACKAGE] [--no-color]
+
+The report is written to /dev/null.
+"""
+
+import contextlib
+import os
+import os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debinsight import color
+from debinsight.configuration import Configuration
+from debinsight.database import Database
+from debinsight.model import FileList, Package
+from debinsight.render import Renderer
+from generate import relations_from_pairs
+
+
+def _fill(packages: int, files: int) -> None:
+    """Fills the database with synthetic packages."""
+    db = Database()
+    for n in range(packages):
+        pkg = 'package-' + str(n)
+        depends = [('package-' + str((n + k) % packages), '>= 1.' + str(k)) for k in range(1, 4)]
+        p = Package(pkg, {'package': pkg, 'version': '1.0-' + str(n),
+                          'depends': relations_from_pairs(depends, db.names)})
+        p.add_reverse_dependency(db.names.intern('package-' + str((n + 1) % packages)), True)
+        p.set_files(FileList.from_items(('/usr/share/' + pkg + '/dir' + str(i % 16) + '/file' + str(i), i)
+                                        for i in range(files)))
+        db.packages[pkg] = p
+
+
+def _print_per_line() -> None:
+    """The former way: a print() and color calls per line."""
+    names = Database().names
+    print(color.header('=== Collecting information done. ==='))
+    for pkg, p in Database().packages.items():
+        print(color.package(pkg))
+        print('\tInstalled version: ' + color.version(p.fields['version']))
+        print('\tDependencies: ')
+        for dep in p.relations('depends').entries(names):
+            print('\t\t' + color.package(dep['package']) + color.dependency(' (' + dep['version'] + ')'))
+        print('\tReverse dependencies: ')
+        for dep in p.reverse_dependencies(names):
+            print('\t\t' + color.package(dep['package']) + ' ' + color.installed('[installed]'))
+        print('\tInstalled files: ')
+        for f, size in p.files.items():
+            print('\t\t' + color.file(f) + ' ' + color.file_size('[' + str(size) + ' Bytes]'))
+        print('\tTotal amount of bytes of installed files: ' + color.file_size(str(p.installed) + ' Bytes'))
+
+
+def main() -> None:
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    packages = int(args[0]) if len(args) > 0 else 1000
+    files = int(args[1]) if len(args) > 1 else 1000
+    Configuration().no_color = '--no-color' in sys.argv
+    _fill(packages, files)
+
+    with open(os.devnull, 'wt') as devnull, contextlib.redirect_stdout(devnull):
+        t = time.perf_counter()
+        _print_per_line()
+        print_time = time.perf_counter() - t
+
+        t = time.perf_counter()
+        Renderer().show(Database())
+        render_time = time.perf_counter() - t
+
+    print('packages: {}, files: {}'.format(packages, packages * files))
+    print('print() per line:  {:.2f} s'.format(print_time))
+    print('render.Renderer:   {:.2f} s ({:.1f}x)'.format(render_time, print_time / render_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/startup.py
+#
+# benchmark of the startup time of debinsight
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Measures the time from starting debinsight to its first output and the imports on the way.
+
+The scenarios are --version and a single package lookup served from
+the persistent cache (which is filled by a first, unmeasured run).
+The time of a bare interpreter start is shown for comparison. For
+each scenario the slowest imports as reported by 'python -X importtime'
+are listed.
+
+Usage: python3 benchmark/startup.py [--admindir DIR] [--package NAME] [--runs N] [--imports N]
+"""
+
+import argparse
+import os
+import os.path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _first_output(cmd: list, env: dict) -> tuple:
+    """Runs a command and measures the time to its first line of output and to its end."""
+    t = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    proc.stdout.readline()
+    first = time.perf_counter() - t
+    proc.stdout.read()
+    proc.wait()
+    return first, time.perf_counter() - t
+
+
+def _imports(cmd: list, env: dict, count: int) -> list:
+    """Runs a command with -X importtime and returns the slowest top level imports.
+
+    :return:    list of tuples of cumulative time (us), self time (us) and module name
+    """
+    proc = subprocess.run([cmd[0], '-X', 'importtime'] + cmd[1:], env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if not line.startswith('import time:') or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        if not name.startswith(' '):
+            imports.append((int(parts[1]), int(parts[0].split(':')[1]), name))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='debinsight startup benchmark')
+    parser.add_argument('--admindir', default='/var/lib/dpkg', help='the dpkg database directory')
+    parser.add_argument('--package', default='dpkg', help='the package to look up')
+    parser.add_argument('--runs', type=int, default=10, help='number of runs per scenario')
+    parser.add_argument('--imports', type=int, default=8, help='number of slowest imports shown')
+    args = parser.parse_args()
+    if sys.dont_write_bytecode:
+        print('PYTHONDONTWRITEBYTECODE is set: run "python3 -m compileall debinsight" first, '
+              'or stale modules are compiled on every run.')
+
+    with tempfile.TemporaryDirectory(prefix='debinsight-startup-') as cache:
+        env = dict(os.environ)
+        env['PYTHONPATH'] = SOURCE_ROOT
+        env['XDG_CACHE_HOME'] = cache
+        debinsight = [sys.executable, '-m', 'debinsight']
+        lookup = debinsight + ['--no-color', '--cache', '--no-files', '--no-rdepend', '--admindir', args.admindir,
+                               args.package]
+        subprocess.run(lookup, env=env, stdout=subprocess.DEVNULL, check=True)
+        scenarios = {
+            'python': [sys.executable, '-c', 'print()'],
+            '--version': debinsight + ['--version'],
+            'cached lookup': lookup,
+        }
+        for name, cmd in scenarios.items():
+            times = [_first_output(cmd, env) for _ in range(args.runs)]
+            print('{:16} first output {:7.1f} ms   total {:7.1f} ms   (median of {} runs)'.format(
+                name, statistics.median(t[0] for t in times) * 1000, statistics.median(t[1] for t in times) * 1000,
+                args.runs))
+            if cmd[1] == '-m':
+                for cumulative_us, self_us, module in _imports(cmd, env, args.imports):
+                    print('    {:>8.1f} ms {:>8.1f} ms self  {}'.format(cumulative_us / 1000, self_us / 1000, module))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/stat_files.py
+#
+# benchmark of stat'ing installed files
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Compares the serial four syscall file stat'ing with debinsight.filestat.
+
+Usage: python3 benchmark/stat_files.py [FILES] [DIRECTORIES]
+"""
+
+import asyncio
+import os
+import os.path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debinsight.filestat import stat_files
+
+
+def _create_files(root: str, files: int, directories: int) -> list:
+    """Creates a tree of small files (and some symlinks).
+
+    :param root:            the root directory
+    :param files:           number of files to create
+    :param directories:     number of directories to spread the files over
+    :return:                list of all paths (including some missing ones)
+    """
+    paths = []
+    for d in range(directories):
+        os.makedirs(os.path.join(root, 'd' + str(d)))
+    for i in range(files):
+        path = os.path.join(root, 'd' + str(i % directories), 'f' + str(i))
+        if i % 10 == 9:
+            os.symlink('f' + str(i - 1), path)
+        elif i % 100 != 99:
+            with open(path, 'wb') as f:
+                f.write(b'x' * (i % 4096))
+        paths.append(path)
+    return paths
+
+
+def _serial(paths: list) -> dict:
+    """The former way: four syscalls per path, serially."""
+    sizes = {}
+    for line in paths:
+        if os.path.exists(line) and os.path.isfile(line) and not os.path.islink(line):
+            sizes[line] = os.path.getsize(line)
+    return sizes
+
+
+def main() -> None:
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    directories = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with tempfile.TemporaryDirectory() as root:
+        paths = _create_files(root, files, directories)
+
+        t = time.perf_counter()
+        serial = _serial(paths)
+        serial_time = time.perf_counter() - t
+
+        t = time.perf_counter()
+        pooled = asyncio.run(stat_files(paths))
+        pooled_time = time.perf_counter() - t
+
+    assert serial == {path: st.st_size for path, st in pooled.items()}
+    print('paths: {} in {} directories'.format(files, directories))
+    print('serial os.path calls: {:.3f} s'.format(serial_time))
+    print('filestat.stat_files:  {:.3f} s ({:.1f}x)'.format(pooled_time, serial_time / pooled_time))
+
+
+if __name__ == '__main__':
+    main()
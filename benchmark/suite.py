@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/suite.py
+#
+# debinsight benchmark suite
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Runs debinsight scenarios against a synthetic dpkg database.
+
+Each scenario runs debinsight as a subprocess, with the fake
+dpkg-query and apt-cache of the generated database first in PATH,
+and records wall time, number of tool subprocesses and peak RSS.
+The results are printed and optionally stored as JSON.
+
+Usage: python3 benchmark/suite.py [--packages N] [--fanout N] [--files N]
+                                  [--backend native|dpkg-query]... [--scenario NAME]...
+                                  [--output RESULTS.json] [--root DIR]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import os.path
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate import generate, package_files, package_name
+
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKENDS = {
+    'native': [],
+    'dpkg-query': ['--no-native'],
+}
+
+
+def _scenarios(root: str, packages: int, files: int) -> dict:
+    """The scenarios: name to debinsight arguments."""
+    some_files = [package_files(root, n, files)[0] for n in range(0, packages, max(packages // 200, 1))]
+    return {
+        'lookup': [package_name(packages // 2)],
+        'follow-depend': ['--follow-depend', package_name(0)],
+        'follow-rdepend': ['--follow-rdepend', package_name(packages - 1)],
+        'file-search': ['--no-files'] + some_files,
+        'json-dump': ['--all', '--json', os.path.join(root, 'dump.json')],
+    }
+
+
+def _run(root: str, args: list) -> dict:
+    """Runs debinsight once and measures it."""
+    log = os.path.join(root, 'calls.log')
+    if os.path.exists(log):
+        os.unlink(log)
+    env = dict(os.environ)
+    env['PATH'] = os.path.join(root, 'bin') + os.pathsep + env.get('PATH', '')
+    env['PYTHONPATH'] = SOURCE_ROOT
+    env['XDG_CACHE_HOME'] = os.path.join(root, 'cache')
+    cmd = [sys.executable, '-m', 'debinsight', '--no-color', '--admindir', os.path.join(root, 'admin')] + args
+    t = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - t
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    stderr = proc.stderr.read().decode()
+    proc.stderr.close()
+    calls = 0
+    if os.path.exists(log):
+        with open(log) as f:
+            calls = sum(1 for _ in f)
+    return {
+        'wall_time': round(wall, 4),
+        'subprocesses': calls,
+        'peak_rss_kib': rusage.ru_maxrss,
+        'returncode': proc.returncode,
+        'stderr': stderr[-500:] if proc.returncode else '',
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='debinsight benchmark suite')
+    parser.add_argument('--packages', type=int, default=1000, help='number of synthetic packages')
+    parser.add_argument('--fanout', type=int, default=4, help='dependencies per package')
+    parser.add_argument('--files', type=int, default=20, help='files per package')
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS), help='backends to run')
+    parser.add_argument('--scenario', action='append', help='scenarios to run (default: all)')
+    parser.add_argument('--output', help='store the results as JSON in this file')
+    parser.add_argument('--root', help='generate the database here and keep it (default: temporary)')
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp(prefix='debinsight-bench-')
+    try:
+        if not os.path.exists(os.path.join(root, 'admin', 'status')):
+            t = time.perf_counter()
+            generate(root, args.packages, args.fanout, args.files)
+            print('generated {} packages in {:.1f} s'.format(args.packages, time.perf_counter() - t))
+        scenarios = _scenarios(root, args.packages, args.files)
+        results = []
+        for name in args.scenario or list(scenarios):
+            for backend in args.backend or list(BACKENDS):
+                result = _run(root, BACKENDS[backend] + scenarios[name])
+                result.update({'scenario': name, 'backend': backend})
+                results.append(result)
+                print('{:16} {:11} {:8.3f} s {:7d} subprocesses {:8d} KiB{}'.format(
+                    name, backend, result['wall_time'], result['subprocesses'], result['peak_rss_kib'],
+                    '' if result['returncode'] == 0 else '  FAILED: ' + result['stderr']))
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        report = {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'parameters': {'packages': args.packages, 'fanout': args.fanout, 'files': args.files},
+            'results': results,
+        }
+        with open(args.output, 'wt') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/verify.py
+#
+# benchmark of verifying installed files against their md5sums
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Compares serial hashing of files with debinsight.verify, cold and with the digests of an earlier run.
+
+Usage: python3 benchmark/verify.py [FILES] [BIG_FILES]
+"""
+
+import asyncio
+import hashlib
+import os
+import os.path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debinsight.verify import compare, hash_files
+
+
+def _create_files(root: str, files: int, big_files: int) -> dict:
+    """Creates small files and some big ones (8 MiB) and their sums.
+
+    :param root:        the root directory
+    :param files:       number of small files to create
+    :param big_files:   number of big files to create
+    :return:            dict of path to hex digest
+    """
+    sums = {}
+    for i in range(files + big_files):
+        path = os.path.join(root, 'f' + str(i))
+        data = os.urandom(8 << 20) if i < big_files else (b'x' * (i % 65536))
+        with open(path, 'wb') as f:
+            f.write(data)
+        sums[path] = hashlib.md5(data).hexdigest()
+    return sums
+
+
+def _serial(sums: dict) -> dict:
+    """The plain way: read and hash each file, one after the other."""
+    digests = {}
+    for path in sums:
+        with open(path, 'rb') as f:
+            digests[path] = hashlib.md5(f.read()).hexdigest()
+    return digests
+
+
+def main() -> None:
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    big_files = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    with tempfile.TemporaryDirectory() as root:
+        sums = _create_files(root, files, big_files)
+
+        t = time.perf_counter()
+        serial = _serial(sums)
+        serial_time = time.perf_counter() - t
+
+        t = time.perf_counter()
+        hashed = asyncio.run(hash_files(sums))
+        cold_time = time.perf_counter() - t
+
+        t = time.perf_counter()
+        again = asyncio.run(hash_files(sums, known=hashed))
+        warm_time = time.perf_counter() - t
+
+    assert serial == sums and again == hashed
+    assert compare(sums, hashed) == {'checked': len(sums), 'modified': [], 'missing': [], 'unreadable': []}
+    print('files: {} small, {} of 8 MiB'.format(files, big_files))
+    print('serial read and hash:      {:.3f} s'.format(serial_time))
+    print('verify.hash_files:         {:.3f} s ({:.1f}x)'.format(cold_time, serial_time / cold_time))
+    print('verify.hash_files, known:  {:.3f} s ({:.1f}x)'.format(warm_time, serial_time / warm_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------
+# benchmark/why.py
+#
+# benchmark of the queries of 'debinsight why'
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Measures building the dependency graph and answering 'why' queries on a synthetic dpkg database.
+
+For comparison each query is also answered the naive way: by the full
+closure of the dependencies of every root, as --follow-depend would
+collect it.
+
+Usage: python3 benchmark/why.py [PACKAGES] [FANOUT] [QUERIES]
+"""
+
+import os
+import os.path
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debinsight.configuration import Configuration
+from debinsight.graph import build_graph
+from debinsight import why
+
+from generate import generate
+
+
+def _closure_answer(graph, target: int) -> bool:
+    """Answers if a package is required by any root by building the dependency closure of each root."""
+    for root in range(len(graph)):
+        if not graph.is_root(root):
+            continue
+        seen = {root}
+        frontier = [root]
+        while frontier:
+            frontier = [v for u in frontier for v in graph.depends[u] if v not in seen and not seen.add(v)]
+        if target in seen:
+            return True
+    return False
+
+
+def main() -> None:
+    packages = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    fanout = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    with tempfile.TemporaryDirectory(prefix='debinsight-why-') as directory:
+        generate(directory, packages, fanout, 1)
+        config = Configuration()
+        config.admin_dir = os.path.join(directory, 'admin')
+        config.no_color = True
+
+        t = time.perf_counter()
+        graph = build_graph()
+        print('{} packages, graph built in {:.1f} ms'.format(len(graph), (time.perf_counter() - t) * 1000))
+
+        rnd = random.Random(0)
+        targets = [graph.names[rnd.randrange(len(graph))] for _ in range(queries)]
+        for name, limit, source in (('shortest chain', 1, False), ('5 chains', 5, False),
+                                    ('shortest chain --from', 1, True)):
+            t = time.perf_counter()
+            for pkg in targets:
+                why.why(graph, pkg, graph.names[0] if source else None, limit)
+            elapsed = (time.perf_counter() - t) * 1000 / queries
+            print('{:24} {:8.3f} ms per query'.format(name, elapsed))
+
+        t = time.perf_counter()
+        for pkg in targets[:10]:
+            _closure_answer(graph, graph.id(pkg))
+        print('{:24} {:8.3f} ms per query'.format('closures', (time.perf_counter() - t) * 1000 / 10))
+
+
+if __name__ == '__main__':
+    main()
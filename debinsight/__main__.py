@@ -15,11 +15,15 @@
 
 import sys
 
-from . import command_line
-
 
 def main() -> None:
     """debinsight main startup."""
+    if sys.argv[1:] in (['-v'], ['--version']):
+        # scripts ask for the version a lot: answer without loading the command line machinery at all
+        from . import __version__
+        print('debinsight V' + __version__)
+        sys.exit(0)
+    from . import command_line
     try:
         command_line.cli(prog_name='debinsight')
     except Exception as e:
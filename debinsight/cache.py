@@ -0,0 +1,114 @@
+# ------------------------------------------------------------
+# debinsight/cache.py
+#
+# persistent cache of collected package data
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module holds the persistent cache of collected package data.
+
+Each entry of the cache is stored together with a signature (e.g. the
+mtime and size of the file the entry has been derived from). An entry
+is only handed out again if the signature still matches.
+"""
+
+import os
+import os.path
+import pickle
+from typing import Any, Optional
+
+_CACHE_VERSION = 4
+"""Version of the cache layout. Caches of other versions are discarded."""
+
+
+def signature(path: str) -> Optional[tuple]:
+    """Computes the signature of a file used to validate cache entries.
+
+    :param path:    path to the file
+    :return:        tuple of mtime (in ns) and size of the file or None if the file is missing
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class Cache:
+
+    """A persistent cache of collected package data."""
+
+    def __init__(self, path: str, rebuild: bool = False):
+        """Constructor.
+
+        :param path:        path to the cache file
+        :param rebuild:     if True, start with an empty cache (ignoring the stored one)
+        """
+        self.path = path
+        self._dirty = False
+        self._entries = {}
+        if not rebuild:
+            self._load()
+
+    def discard(self, keep) -> None:
+        """Removes all entries whose key does not pass a test.
+
+        :param keep:    callable getting a key and returning True if the entry is to be kept
+        """
+        for key in [key for key in self._entries if not keep(key)]:
+            del self._entries[key]
+            self._dirty = True
+
+    def get(self, key: str, sig: Optional[tuple]) -> Any:
+        """Gets an entry of the cache.
+
+        :param key:     the key of the entry
+        :param sig:     the current signature of the source of the entry
+        :return:        the cached value or None if missing or outdated
+        """
+        if sig is None:
+            return None
+        entry = self._entries.get(key, None)
+        if entry is None or entry[0] != sig:
+            return None
+        return entry[1]
+
+    def put(self, key: str, sig: Optional[tuple], value: Any) -> None:
+        """Puts an entry into the cache.
+
+        :param key:     the key of the entry
+        :param sig:     the signature of the source of the entry
+        :param value:   the value to cache
+        """
+        if sig is None:
+            return
+        self._entries[key] = (sig, value)
+        self._dirty = True
+
+    def save(self) -> None:
+        """Writes the cache to disk, if anything has changed."""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.' + str(os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump((_CACHE_VERSION, self._entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def _load(self) -> None:
+        """Loads the cache from disk. A missing, broken or outdated cache is ignored.
+
+        A cache written by another version may refer to classes or modules
+        which are gone, which fails before the version is even checked.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                version, entries = pickle.load(f)
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+            return
+        if version == _CACHE_VERSION:
+            self._entries = entries
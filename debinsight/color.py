@@ -8,12 +8,61 @@
 # (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
 # ------------------------------------------------------------
 
-"""This module generated colorized text outputs for the terminal."""
+"""This module generated colorized text outputs for the terminal.
 
-import colors
+The escape sequences are resolved once per run (see palette()), so
+the ansicolors module is only imported if colors are used at all.
+"""
 
 from .configuration import Configuration
 
+STYLES = {
+    'dependency': {'fg': 'green'},
+    'dropping': {'fg': 'red'},
+    'error': {'fg': 'red'},
+    'file': {'fg': 'green'},
+    'file_size': {'fg': 'magenta'},
+    'header': {'fg': 'yellow', 'style': 'bold'},
+    'installed': {'fg': 'magenta', 'style': 'bold'},
+    'not_installed': {'fg': 'blue'},
+    'package': {'fg': 'white', 'style': 'bold'},
+    'rev_dependency': {'fg': 'red', 'style': 'negative'},
+    'tool': {'fg': 'cyan'},
+    'version': {'fg': 'white', 'style': 'bold'},
+}
+"""The colors and styles of all kinds of text."""
+
+
+def palette(no_color: bool) -> dict:
+    """Resolves the escape sequences of all styles at once.
+
+    :param no_color:    if True, no escape sequences are used at all
+    :return:            dict of style name to a tuple of the prefix and suffix text
+    """
+    if no_color:
+        return {name: ('', '') for name in STYLES}
+    import colors
+    return {name: tuple(colors.color('\0', **style).split('\0')) for name, style in STYLES.items()}
+
+
+_resolved = None
+"""The palette in use as tuple of the no_color setting and the palette."""
+
+
+def _colorize(name: str, t: str) -> str:
+    """Colorizes a text with one of the STYLES.
+
+    :param name:    the name of the style
+    :param t:       the text
+    :return:        a colorized version of the text
+    """
+    global _resolved
+    no_color = Configuration().no_color
+    if _resolved is None or _resolved[0] != no_color:
+        _resolved = (no_color, palette(no_color))
+    prefix, suffix = _resolved[1][name]
+    return prefix + t + suffix
+
 
 def dependency(t: str) -> str:
     """Color for dependencies of a package
@@ -21,9 +70,7 @@ def dependency(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='green')
-    return t
+    return _colorize('dependency', t)
 
 
 def dropping(t: str) -> str:
@@ -32,9 +79,7 @@ def dropping(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='red')
-    return t
+    return _colorize('dropping', t)
 
 
 def error(t: str) -> str:
@@ -43,9 +88,7 @@ def error(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='red')
-    return t
+    return _colorize('error', t)
 
 
 def file(t: str) -> str:
@@ -54,9 +97,7 @@ def file(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='green')
-    return t
+    return _colorize('file', t)
 
 
 def file_size(t: str) -> str:
@@ -65,9 +106,7 @@ def file_size(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='magenta')
-    return t
+    return _colorize('file_size', t)
 
 
 def header(t: str) -> str:
@@ -76,9 +115,7 @@ def header(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='yellow', style='bold')
-    return t
+    return _colorize('header', t)
 
 
 def installed(t: str) -> str:
@@ -87,9 +124,7 @@ def installed(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='magenta', style='bold')
-    return t
+    return _colorize('installed', t)
 
 
 def not_installed(t: str) -> str:
@@ -98,9 +133,7 @@ def not_installed(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='blue')
-    return t
+    return _colorize('not_installed', t)
 
 
 def package(t: str) -> str:
@@ -109,9 +142,7 @@ def package(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='white', style='bold')
-    return t
+    return _colorize('package', t)
 
 
 def rev_dependency(t: str) -> str:
@@ -120,9 +151,7 @@ def rev_dependency(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='red', style='negative')
-    return t
+    return _colorize('rev_dependency', t)
 
 
 def tool(t: str) -> str:
@@ -131,9 +160,7 @@ def tool(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='cyan')
-    return t
+    return _colorize('tool', t)
 
 
 def version(t: str) -> str:
@@ -142,6 +169,4 @@ def version(t: str) -> str:
     :param t:   the text
     :return:    a colorized version of the text
     """
-    if not Configuration().no_color:
-        return colors.color(t, fg='white', style='bold')
-    return t
+    return _colorize('version', t)
@@ -8,38 +8,142 @@
 # (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
 # ------------------------------------------------------------
 
-"""This module provides all command line stuff and figures."""
+"""This module provides all command line stuff and figures.
+
+The heavy modules (asyncio, uvloop and the debinsight algorithm) are
+only imported once a command is actually run, so e.g. --help and
+--version come back quickly.
+"""
 
-import asyncio
 import click
-import uvloop
+import os.path
 import sys
 
 from .configuration import Configuration
-from . import debinsight
+from .deb822 import RELATION_FIELDS
+
+
+class _DefaultCommand(click.Command):
+
+    """The default command of a group, whose name may be left out."""
+
+    def format_usage(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        path = ctx.command_path
+        if ctx.parent is not None:
+            path = ctx.parent.command_path + ' [' + ctx.info_name + ']'
+        formatter.write_usage(path, ' '.join(self.collect_usage_pieces(ctx)))
+
+
+class _DefaultGroup(click.Group):
+
+    """A group of commands, which runs the default command if no other command is named.
+
+    A first argument named like a command runs that command. Arguments
+    of the default command named like a command (e.g. a package 'diff')
+    are given after the name of the default command or after '--'.
+    """
+
+    def __init__(self, *args, default_command: str = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx: click.Context, args: list) -> list:
+        # '--' is never a command: the default command gets it and takes all following arguments as such
+        if not args or args[0] not in self.commands:
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
 
 
-@click.command(context_settings={'help_option_names': ['-h', '--help']})
+@click.group(cls=_DefaultGroup, default_command='inspect', context_settings={'help_option_names': ['-h', '--help']})
+def cli() -> None:
+    """debinsight collects package information of installed packages."""
+
+
+@cli.command(cls=_DefaultCommand, options_metavar='[OPTIONS] [--]',
+             context_settings={'help_option_names': ['-h', '--help']})
+@click.option('--all', 'all_packages', is_flag=True, help='Examine all installed packages.')
 @click.option('--no-color', is_flag=True, help='Turn off color output.')
 @click.option('--no-depend', is_flag=True, help='Turn off output for dependencies.')
 @click.option('--no-rdepend', is_flag=True, help='Turn off output for reverse dependencies.')
 @click.option('--no-files', is_flag=True, help='Turn off list of files.')
 @click.option('--version', '-v', is_flag=True, help='Show version and exit.')
 @click.option('--json', type=click.Path(), help='Dump found information as json into a file.')
+@click.option('--ndjson', type=click.Path(allow_dash=True),
+              help='Stream found information as one JSON record per package into a file (- for stdout).')
+@click.option('--stats', type=click.Path(allow_dash=True),
+              help='Dump run time statistics as json into a file (- for a summary table on stdout).')
+@click.option('--profile', type=click.Path(), help='Dump cProfile statistics (pstats) into a file.')
+@click.option('--usage', is_flag=True,
+              help='Show the disk usage of all files, each counted once (hardlinks, shared files), per directory.')
+@click.option('--usage-depth', type=click.IntRange(min=0), default=2, show_default=True,
+              help='Depth of the directory tree shown with --usage.')
+@click.option('--usage-json', type=click.Path(), help='Dump the disk usage (see --usage) as json into a file.')
+@click.option('--verify', is_flag=True,
+              help='Verify the installed files against the MD5 sums of their packages (modified, missing files).')
 @click.option('--follow-depend', is_flag=True, help='Follow dependency graph (use with caution).')
 @click.option('--follow-rdepend', is_flag=True, help='Follow reverse dependency graph (use with caution).')
+@click.option('--follow-relation', type=click.Choice(RELATION_FIELDS), metavar='KIND', multiple=True,
+              help='Relation kind to follow, one of ' + ', '.join(RELATION_FIELDS)
+              + ' (repeatable) [default: depends, reverse: all].')
+@click.option('--max-depth', type=click.IntRange(min=0), default=None,
+              help='Follow the graphs at most this many steps away from the targets.')
+@click.option('--max-packages', type=click.IntRange(min=1), default=None,
+              help='Stop following the graphs once this many packages are collected.')
+@click.option('--include', metavar='GLOB', multiple=True,
+              help='Only follow packages whose name matches this pattern (repeatable).')
+@click.option('--exclude', metavar='GLOB', multiple=True,
+              help='Do not follow packages whose name matches this pattern (repeatable).')
 @click.option('--drop-not-installed', is_flag=True, help='Do not list not installed packages.')
+@click.option('--admindir', type=click.Path(), default='/var/lib/dpkg', show_default=True,
+              help='The dpkg database directory to read (within each --root).')
+@click.option('--root', type=click.Path(exists=True, file_okay=False), multiple=True,
+              help='Inspect the system installed in this directory, e.g. a chroot or container image '
+                   '(repeatable, the roots are inspected in parallel).')
+@click.option('--cache/--no-cache', default=False,
+              help='Cache package data between runs in $XDG_CACHE_HOME/debinsight (default: off).')
+@click.option('--rebuild-cache', is_flag=True, help='Discard the cached package data and collect it anew.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None,
+              help='Number of packages examined concurrently [default: number of CPUs].')
+@click.option('--no-native', is_flag=True, help='Use dpkg-query instead of reading the dpkg database directly.')
+@click.option('--tool-jobs', type=click.IntRange(min=1), default=None,
+              help='Number of dpkg-query and apt-cache subprocesses running at the same time [default: --jobs].')
+@click.option('--tool-timeout', type=click.FloatRange(min=0), default=60.0, show_default=True,
+              help='Seconds a dpkg-query or apt-cache call may run (0 for no limit).')
+@click.option('--tool-retries', type=click.IntRange(min=0), default=2, show_default=True,
+              help='Retries of a dpkg-query or apt-cache call failing for a transient reason (timeout, lock).')
 @click.argument('target', required=False, nargs=-1)
-def cli(no_color=False,
-        no_depend=False,
-        no_rdepend=False,
-        no_files=False,
-        version=False,
-        json=None,
-        follow_depend=False,
-        follow_rdepend=False,
-        drop_not_installed=False,
-        target=None) -> None:
+def inspect(all_packages=False,
+            no_color=False,
+            no_depend=False,
+            no_rdepend=False,
+            no_files=False,
+            version=False,
+            json=None,
+            ndjson=None,
+            stats=None,
+            profile=None,
+            usage=False,
+            usage_depth=2,
+            usage_json=None,
+            verify=False,
+            follow_depend=False,
+            follow_rdepend=False,
+            follow_relation=(),
+            max_depth=None,
+            max_packages=None,
+            include=(),
+            exclude=(),
+            drop_not_installed=False,
+            admindir='/var/lib/dpkg',
+            root=(),
+            cache=False,
+            rebuild_cache=False,
+            jobs=None,
+            no_native=False,
+            tool_jobs=None,
+            tool_timeout=60.0,
+            tool_retries=2,
+            target=None) -> None:
 
     """debinsight collects package information by examining the dependency
     and reverse dependencies of packages installed in the Debian
@@ -47,36 +151,239 @@ def cli(no_color=False,
     current stats of a package and all files the package installs.
 
     TARGET can be either a package name or a file on the local system.
+    With --all, every installed package is examined.
 
     \b
     E.g.:
         TARGET = openssl ............ start with the openssl package installed.
         TARGET = /usr/bin/openssl ... start with the package containing which had
                                       installed the file "/usr/bin/openssl".
+
+    This is the default command. Other commands: serve, diff, why and impact (see debinsight COMMAND --help).
+    A package named like a command is inspected with 'debinsight inspect PACKAGE' or 'debinsight -- PACKAGE'.
     """
 
     if version:
         show_version()
         sys.exit(0)
 
-    if len(target) == 0:
-        raise click.UsageError('This tool needs at least one TARGET to operate.')
+    if len(target) == 0 and not all_packages:
+        raise click.UsageError('This tool needs at least one TARGET (or --all) to operate.')
+
+    if root and no_native:
+        raise click.UsageError('--root reads the dpkg database of each root, it cannot be used with --no-native.')
+    if root and (ndjson or profile):
+        raise click.UsageError('--root cannot be used with --ndjson or --profile.')
 
     config = Configuration()
+    config.all = all_packages
     config.targets = target
     config.json = json
+    config.ndjson = ndjson
+    config.stats = stats
+    config.profile = profile
+    config.usage = usage or bool(usage_json)
+    config.usage_depth = usage_depth
+    config.usage_json = usage_json
+    config.verify = verify
     config.no_color = no_color
     config.no_depend = no_depend
     config.no_rdepend = no_rdepend
     config.no_files = no_files
     config.follow_depend = follow_depend
     config.follow_rdepend = follow_rdepend
+    config.follow_relations = follow_relation or None
+    config.max_depth = max_depth
+    config.max_packages = max_packages
+    config.include = include
+    config.exclude = exclude
     config.drop_not_installed = drop_not_installed
+    config.admin_dir = admindir
+    config.native = not no_native
+    config.cache = cache
+    config.rebuild_cache = rebuild_cache
+    config.tool_jobs = tool_jobs
+    config.tool_timeout = tool_timeout
+    config.tool_retries = tool_retries
+    config.roots = tuple(dict.fromkeys(os.path.abspath(r) for r in root))
+    if jobs is not None:
+        config.jobs = jobs
 
+    if config.roots:
+        from . import roots
+        roots.run()
+        return
+
+    import asyncio
+    import uvloop
+    from . import debinsight
     uvloop.install()
     asyncio.run(debinsight.run())
 
 
+@cli.command(context_settings={'help_option_names': ['-h', '--help']})
+@click.option('--socket', type=click.Path(), default=None,
+              help='The Unix socket to listen on [default: $XDG_RUNTIME_DIR/debinsight.sock].')
+@click.option('--admindir', type=click.Path(), default='/var/lib/dpkg', show_default=True,
+              help='The dpkg database directory to read.')
+@click.option('--poll-interval', type=click.FloatRange(min=0.1), default=2.0, show_default=True,
+              help='Seconds between two polls of the dpkg database, if inotify is not available.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None,
+              help='Number of packages examined concurrently per query [default: number of CPUs].')
+@click.option('--cache/--no-cache', default=False,
+              help='Cache package data between runs in $XDG_CACHE_HOME/debinsight (default: off).')
+@click.option('--no-color', is_flag=True, help='Turn off color output.')
+def serve(socket=None,
+          admindir='/var/lib/dpkg',
+          poll_interval=2.0,
+          jobs=None,
+          cache=False,
+          no_color=False) -> None:
+
+    """Runs debinsight as daemon answering queries over a Unix socket.
+
+    The dpkg database is read once and kept in memory. Changes made
+    by dpkg are picked up as they happen. Each query is a line of
+    JSON like {"targets": ["bash"], "follow_depend": true} and is
+    answered by a line of JSON shaped like the output of --json.
+    """
+
+    config = Configuration()
+    config.socket = socket
+    config.admin_dir = admindir
+    config.poll_interval = poll_interval
+    config.cache = cache
+    config.no_color = no_color
+    if jobs is not None:
+        config.jobs = jobs
+
+    import asyncio
+    import uvloop
+    from . import server
+    uvloop.install()
+    asyncio.run(server.run())
+
+
+@cli.command(context_settings={'help_option_names': ['-h', '--help']})
+@click.option('--no-color', is_flag=True, help='Turn off color output.')
+@click.option('--no-files', is_flag=True, help='Turn off list of changed files (only count them).')
+@click.option('--json', type=click.Path(), help='Dump the changes as json into a file.')
+@click.argument('old', type=click.Path(exists=True, dir_okay=False))
+@click.argument('new', type=click.Path(exists=True, dir_okay=False))
+def diff(old=None,
+         new=None,
+         no_color=False,
+         no_files=False,
+         json=None) -> None:
+
+    """Compares two dumps of --json or --ndjson (e.g. of two hosts or two image builds).
+
+    Reports added, removed, upgraded, downgraded and otherwise changed
+    packages with their changed relations, files and sizes. The dumps
+    are streamed and only the records of changed packages are read
+    again, so even dumps of whole systems are compared quickly.
+    """
+
+    config = Configuration()
+    config.no_color = no_color
+    config.no_files = no_files
+    config.json = json
+
+    from .diff import run
+    run(old, new)
+
+
+@cli.command(context_settings={'help_option_names': ['-h', '--help']})
+@click.option('--from', 'source', metavar='PACKAGE', help='Find the chains starting at this package.')
+@click.option('--max-chains', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of chains shown at most, the shortest first.')
+@click.option('--max-depth', type=click.IntRange(min=0), default=None,
+              help='Number of relations of a chain at most.')
+@click.option('--relation', type=click.Choice(RELATION_FIELDS), metavar='KIND', multiple=True,
+              help='Relation kind to follow, one of ' + ', '.join(RELATION_FIELDS)
+              + ' (repeatable) [default: pre-depends, depends, recommends].')
+@click.option('--admindir', type=click.Path(), default='/var/lib/dpkg', show_default=True,
+              help='The dpkg database directory to read.')
+@click.option('--cache/--no-cache', default=False,
+              help='Cache package data between runs in $XDG_CACHE_HOME/debinsight (default: off).')
+@click.option('--no-color', is_flag=True, help='Turn off color output.')
+@click.option('--json', type=click.Path(), help='Dump the chains as json into a file.')
+@click.argument('package')
+def why(package=None,
+        source=None,
+        max_chains=1,
+        max_depth=None,
+        relation=(),
+        admindir='/var/lib/dpkg',
+        cache=False,
+        no_color=False,
+        json=None) -> None:
+
+    """Tells why PACKAGE is installed.
+
+    Shows the shortest chains of relations leading to PACKAGE from the
+    packages installed on purpose: the Essential ones and the ones not
+    installed automatically by apt. With --from, the chains start at
+    the given package instead.
+    """
+
+    config = Configuration()
+    config.follow_relations = relation or None
+    config.max_depth = max_depth
+    config.admin_dir = admindir
+    config.cache = cache
+    config.no_color = no_color
+    config.json = json
+
+    from .why import run
+    run(package, source, max_chains)
+
+
+@cli.command(context_settings={'help_option_names': ['-h', '--help']})
+@click.option('--each', is_flag=True, help='Estimate the removal of each PACKAGE on its own (biggest first).')
+@click.option('--installed-size', is_flag=True,
+              help='Take the Installed-Size of the packages instead of the sizes of their files.')
+@click.option('--relation', type=click.Choice(RELATION_FIELDS), metavar='KIND', multiple=True,
+              help='Relation kind keeping packages installed, one of ' + ', '.join(RELATION_FIELDS)
+              + ' (repeatable) [default: pre-depends, depends, recommends].')
+@click.option('--admindir', type=click.Path(), default='/var/lib/dpkg', show_default=True,
+              help='The dpkg database directory to read.')
+@click.option('--cache/--no-cache', default=False,
+              help='Cache package data between runs in $XDG_CACHE_HOME/debinsight (default: off).')
+@click.option('--no-color', is_flag=True, help='Turn off color output.')
+@click.option('--json', type=click.Path(), help='Dump the impact as json into a file.')
+@click.argument('package', nargs=-1, required=True)
+def impact(package=(),
+           each=False,
+           installed_size=False,
+           relation=(),
+           admindir='/var/lib/dpkg',
+           cache=False,
+           no_color=False,
+           json=None) -> None:
+
+    """Estimates the bytes freed and the packages orphaned by removing PACKAGEs.
+
+    A package is orphaned once it is no longer required by any package
+    installed on purpose (the Essential ones and the ones not installed
+    automatically by apt), like 'apt autoremove' would remove it.
+    With --each, hundreds of candidates are evaluated in a single run.
+    """
+
+    config = Configuration()
+    config.follow_relations = relation or None
+    config.admin_dir = admindir
+    config.cache = cache
+    config.no_color = no_color
+    config.json = json
+
+    import asyncio
+    import uvloop
+    from .impact import run
+    uvloop.install()
+    asyncio.run(run(list(package), each, installed_size))
+
+
 def show_version() -> None:
     """Shows the program version."""
     from . import __version__
@@ -10,7 +10,13 @@
 
 """This module holds the application wide configuration."""
 
-import shutil
+import os
+import os.path
+
+from .context import lookup
+
+DEFAULT_ADMIN_DIR = '/var/lib/dpkg'
+"""The dpkg database directory of the running system."""
 
 
 class _Singleton(type):
@@ -19,6 +25,9 @@ class _Singleton(type):
     _instances = {}
 
     def __call__(cls, *args, **kwargs):
+        scoped = lookup(cls)
+        if scoped is not None:
+            return scoped
         if cls not in cls._instances:
             cls._instances[cls] = super(_Singleton, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
@@ -29,7 +38,13 @@ class Configuration(metaclass=_Singleton):
     """The debinsight program configuration."""
 
     def __init__(self):
+        self.admin_dir = DEFAULT_ADMIN_DIR
+        self.all = False
+        self.cache = False
+        self.jobs = os.cpu_count() or 1
         self.json = None
+        self.native = True
+        self.ndjson = None
         self.no_color = False
         self.no_depend = False
         self.no_rdepend = False
@@ -37,7 +52,26 @@ class Configuration(metaclass=_Singleton):
         self.targets = None
         self.follow_depend = False
         self.follow_rdepend = False
+        self.follow_relations = None
         self.drop_not_installed = False
+        self.exclude = ()
+        self.include = ()
+        self.max_depth = None
+        self.max_packages = None
+        self.poll_interval = 2.0
+        self.profile = None
+        self.rebuild_cache = False
+        self.root = None
+        self.roots = ()
+        self.socket = None
+        self.usage = False
+        self.usage_depth = 2
+        self.usage_json = None
+        self.verify = False
+        self.stats = None
+        self.tool_jobs = None
+        self.tool_retries = 2
+        self.tool_timeout = 60.0
         self._apt_cache = None
         self._dpkg_query = None
 
@@ -45,12 +79,20 @@ class Configuration(metaclass=_Singleton):
     def apt_cache(self) -> str:
         """Return the path to the apt-cache executable."""
         if self._apt_cache is None:
+            import shutil
             self._apt_cache = shutil.which(cmd='apt-cache')
         return self._apt_cache
 
+    @property
+    def cache_dir(self) -> str:
+        """Return the directory holding the persistent caches."""
+        base = os.environ.get('XDG_CACHE_HOME', None) or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(base, 'debinsight')
+
     @property
     def dpkg_query(self) -> str:
         """Return the path to the dpkg-query executable."""
         if self._dpkg_query is None:
+            import shutil
             self._dpkg_query = shutil.which(cmd='dpkg-query')
         return self._dpkg_query
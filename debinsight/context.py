@@ -0,0 +1,64 @@
+# ------------------------------------------------------------
+# debinsight/context.py
+#
+# singletons scoped to a context
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module scopes the singletons of debinsight to a context.
+
+The configuration, the databases and the statistics are singletons,
+since the command line runs a single inspection per process. The
+Inspector (see debinsight.inspector) runs many inspections, even
+concurrently within a single event loop. Each inspection binds
+instances of its own to the singleton classes for the current context
+(see contextvars). asyncio tasks copy the context they are created in,
+so all tasks of an inspection get its instances, while the tasks of
+other inspections get theirs.
+"""
+
+import contextlib
+import contextvars
+from typing import Optional
+
+_scoped = contextvars.ContextVar('debinsight_scoped', default=None)
+"""The dict of singleton class to the instance bound for the current context."""
+
+
+def create(cls: type, *args, **kwargs):
+    """Creates an instance of a singleton class apart from the singleton.
+
+    :param cls:     the singleton class
+    :return:        a new instance of the class
+    """
+    instance = cls.__new__(cls)
+    instance.__init__(*args, **kwargs)
+    return instance
+
+
+def lookup(cls: type) -> Optional[object]:
+    """Gets the instance of a singleton class bound for the current context.
+
+    :param cls:     the singleton class
+    :return:        the instance bound or None, if the singleton is to be used
+    """
+    scoped = _scoped.get()
+    if scoped is None:
+        return None
+    return scoped.get(cls, None)
+
+
+@contextlib.contextmanager
+def scope(instances: dict):
+    """Binds instances to singleton classes for the current context.
+
+    :param instances:   dict of singleton class to instance
+    """
+    token = _scoped.set(instances)
+    try:
+        yield
+    finally:
+        _scoped.reset(token)
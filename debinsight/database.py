@@ -11,6 +11,10 @@
 """This module holds the application wide database."""
 
 import json
+from typing import Iterator, TextIO
+
+from .context import lookup
+from .model import Names
 
 
 class _Singleton(type):
@@ -19,6 +23,9 @@ class _Singleton(type):
     _instances = {}
 
     def __call__(cls, *args, **kwargs):
+        scoped = lookup(cls)
+        if scoped is not None:
+            return scoped
         if cls not in cls._instances:
             cls._instances[cls] = super(_Singleton, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
@@ -26,9 +33,14 @@ class _Singleton(type):
 
 class Database(metaclass=_Singleton):
 
-    """The debinsight program database."""
+    """The debinsight program database.
+
+    The packages map the package name to the collected model.Package
+    (or None if not yet examined).
+    """
 
     def __init__(self):
+        self.names = Names()
         self.packages = {}
 
     def add_package(self, package: str) -> None:
@@ -36,23 +48,45 @@ class Database(metaclass=_Singleton):
         if package not in self.packages:
             self.packages[package] = None
             
+    def clear(self) -> None:
+        """Forgets all packages collected so far."""
+        self.names = Names()
+        self.packages = {}
+
     def dump(self) -> str:
         """Dumps the package content to string as JSON.
         
         :return:    a json string of the current DB.
         """
-        return json.dumps(self.packages, ensure_ascii=True)
+        return json.dumps(dict(self.items()), ensure_ascii=True)
 
-    def fix_installed_rdependencies(self):
-        """Fix installed entry for reverse dependencies.
-        
-        Within a list of installed reverse dependencies, we cannot
-        at the first glance detect, if the reverse dependent package
-        is installed or not. Within this step we fix this.
+    def items(self) -> Iterator[tuple]:
+        """Yields all examined packages as the dicts dumped as JSON.
+
+        :return:    yields tuples of package name and dict of the package
+        """
+        for pkg, p in self.packages.items():
+            if p is not None:
+                yield pkg, p.to_dict(self.names)
+
+    def write(self, f: TextIO) -> None:
+        """Writes the package content as JSON to a file.
+
+        Unlike dump() the JSON is encoded and written package by package,
+        so neither the full JSON string nor all package dicts are held in
+        memory at once.
+
+        :param f:   the file to write to
         """
-        for p in self.packages:
-            for rdep in self.packages[p].get('rdepend', {}):
-                rdep['installed'] = rdep['package'] in self.packages
+        encoder = json.JSONEncoder(ensure_ascii=True)
+        f.write('{')
+        separator = ''
+        for pkg, d in self.items():
+            f.write(separator + encoder.encode(pkg) + ': ')
+            for chunk in encoder.iterencode(d):
+                f.write(chunk)
+            separator = ', '
+        f.write('}')
 
     @property
     def open(self) -> list:
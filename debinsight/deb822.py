@@ -0,0 +1,115 @@
+# ------------------------------------------------------------
+# debinsight/deb822.py
+#
+# parsing of deb822 stanzas and package relations
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module parses the deb822 format used by dpkg (e.g. /var/lib/dpkg/status).
+
+A deb822 file is a sequence of stanzas separated by blank lines. Each
+stanza holds 'Field: value' lines, where a value may be continued on
+following lines starting with a space or a tab (e.g. 'Description' or
+'Conffiles').
+
+Relation fields like 'Depends' hold a comma separated list of
+relations. Each relation is a list of alternatives separated by '|'.
+Each alternative is a package name with an optional architecture
+qualifier and an optional version constraint, e.g.
+
+    libc6 (>= 2.28), python3:any, default-mta | mail-transport-agent
+"""
+
+import re
+from typing import Iterable, Iterator
+
+RELATION_FIELDS = ('depends', 'pre-depends', 'recommends', 'suggests', 'enhances', 'breaks', 'conflicts', 'replaces')
+"""Status fields holding relations to other packages."""
+
+_ALTERNATIVE = re.compile(r'\s*([^\s:(\[<]+)(?::([^\s(\[<]+))?\s*'
+                          r'(?:\(\s*([<>=]*)\s*([^)\s]+)\s*\))?\s*'
+                          r'(?:\[[^\]]*\]\s*)?(?:<[^>]*>\s*)*')
+"""An alternative of a relation: name, architecture qualifier, version operator and version.
+
+Architecture restrictions ('[amd64]') and build profiles ('<!nocheck>')
+only show up in source packages; they are accepted but ignored.
+"""
+
+
+def iter_stanzas(lines: Iterable[str]) -> Iterator[dict]:
+    """Streams the stanzas of a deb822 file one by one.
+
+    Field names are lowercased. Continuation lines are appended
+    to the value of the preceding field, separated by a newline.
+
+    :param lines:   an open text file (or any other iterable of lines)
+    :return:        yields a dict of all fields per stanza
+    """
+    stanza = {}
+    key = None
+    for line in lines:
+        line = line.rstrip('\n')
+        if not line:
+            if stanza:
+                yield stanza
+            stanza = {}
+            key = None
+        elif line[0] in ' \t':
+            if key is not None:
+                stanza[key] = stanza[key] + '\n' + line[1:]
+        else:
+            key, _, value = line.partition(':')
+            key = key.lower()
+            stanza[key] = value.strip()
+    if stanza:
+        yield stanza
+
+
+def parse_relations(value: str) -> list:
+    """Parses the value of a relation field like 'Depends'.
+
+    Each relation is a list of its alternatives. Each alternative is
+    a tuple of package name, architecture qualifier (or None) and
+    version constraint like '>= 2.28' (or None). Unparsable
+    alternatives are skipped.
+
+    :param value:   the value of a relation field
+    :return:        list of relations, each a list of (name, arch, version) tuples
+    """
+    relations = []
+    for item in value.split(','):
+        alternatives = []
+        for alternative in item.split('|'):
+            if '(' not in alternative and ':' not in alternative and '[' not in alternative \
+                    and '<' not in alternative:
+                name = alternative.strip()
+                if name:
+                    alternatives.append((name, None, None))
+                continue
+            m = _ALTERNATIVE.fullmatch(alternative)
+            if m is None:
+                continue
+            name, arch, operator, version = m.groups()
+            if version is not None:
+                version = operator + ' ' + version if operator else version
+            alternatives.append((name, arch, version))
+        if alternatives:
+            relations.append(alternatives)
+    return relations
+
+
+def relation_names(value: str) -> Iterator[str]:
+    """Yields the package names mentioned in a relation field value.
+
+    Alternatives ('a | b') yield each package. Version constraints
+    and architecture qualifiers are stripped.
+
+    :param value:   the value of a relation field like 'Depends'
+    :return:        yields the bare package names
+    """
+    for alternatives in parse_relations(value):
+        for name, _, _ in alternatives:
+            yield name
@@ -14,40 +14,159 @@
 """Within this module resides the debinsight algorithm."""
 
 import asyncio
+import contextlib
+import contextvars
+import fnmatch
 import os.path
 import re
 import sys
-from typing import Union
+from typing import Optional, Union
 
-from .configuration import Configuration
+from .configuration import DEFAULT_ADMIN_DIR, Configuration
 from .database import Database
+from .deb822 import RELATION_FIELDS, iter_stanzas, parse_relations
+from .dpkg import DpkgDatabase
+from .export import NdjsonWriter
+from .filestat import in_root, stat_files
+from .model import INTERNED_FIELDS, FileList, Package, Relations
+from .render import Renderer, silence
+from .stats import Statistics
+from .tools import ToolError, ToolRunner
+from .usage import Usage
 from . import color
+from . import verify
 
 
-def _add_dependencies(pkg: str) -> None:
+class _Frontier:
+
+    """The frontier of the breadth-first walk over the package graph.
+
+    Packages reached by following a relation are pruned right here,
+    before they are ever examined: if they are not installed at all,
+    if they are filtered by --include or --exclude or once
+    --max-packages packages have been collected.
+    """
+
+    def __init__(self, packages: list):
+        self.queue = asyncio.Queue()
+        self.visited = set()
+        self._collected = 0
+        self._limit_reached = False
+        for pkg in packages:
+            self._push(pkg, 0)
+
+    def follow(self, pkg: str, depth: int) -> None:
+        """Adds a package reached by following a relation, unless it has been seen already or is pruned.
+
+        :param pkg:     name of the package
+        :param depth:   number of relations followed from a target to the package
+        """
+        installed = _installed.get()
+        if pkg in self.visited or (installed is not None and pkg.partition(':')[0] not in installed):
+            return
+        max_packages = Configuration().max_packages
+        if max_packages is not None and self._collected >= max_packages:
+            if not self._limit_reached:
+                _report(color.dropping('Collected ' + str(max_packages) + ' packages, not following any further.'))
+                self._limit_reached = True
+            self.visited.add(pkg)
+            Statistics().packages_pruned = Statistics().packages_pruned + 1
+            return
+        if not _followed(pkg):
+            self.visited.add(pkg)
+            Statistics().packages_pruned = Statistics().packages_pruned + 1
+            return
+        self._push(pkg, depth)
+
+    def _push(self, pkg: str, depth: int) -> None:
+        """Adds a package to examine, unless it has been seen already.
+
+        :param pkg:     name of the package
+        :param depth:   number of relations followed from a target to the package
+        """
+        if pkg in self.visited:
+            return
+        self.visited.add(pkg)
+        self._collected = self._collected + 1
+        Database().add_package(pkg)
+        self.queue.put_nowait((pkg, depth))
+
+
+_SEARCH_BATCH_SIZE = 1024
+"""Maximum number of paths passed to a single dpkg-query --search call."""
+
+_NOT_FOUND = 1
+"""Exit code of dpkg-query, if a package or path is not found (any other failure is an error)."""
+
+_installed = contextvars.ContextVar('debinsight_installed', default=None)
+"""The names of all installed packages, if the package graph is followed or reverse dependencies are queried."""
+
+_ndjson = contextvars.ContextVar('debinsight_ndjson', default=None)
+"""The writer of package records as NDJSON, if requested."""
+
+_progress = contextvars.ContextVar('debinsight_progress', default=print)
+"""The callable getting the progress messages of the collection."""
+
+_tools = contextvars.ContextVar('debinsight_tools', default=None)
+"""The runner of all tool subprocesses of the collection."""
+
+_tools_found = set()
+"""The names of the tools found on the system so far."""
+
+
+def _add_dependencies(pkg: str, depth: int, frontier: _Frontier) -> None:
     """Adds the dependencies of a package to the list of packages to examine.
 
-    :param pkg:     name of the package to gather dependencies from
+    Only the relation kinds configured with --follow-relation are
+    followed ('depends' by default).
+
+    :param pkg:         name of the package to gather dependencies from
+    :param depth:       number of relations followed from a target to the package
+    :param frontier:    the packages still to examine
     """
     p = Database().packages.get(pkg, None)
     if p is None:
         return
-    depends = p.get('depends', None)
-    if depends:
-        for d in depends:
-            Database().add_package(d['package'])
+    for kind in Configuration().follow_relations or ('depends',):
+        relations = p.relations(kind)
+        if relations:
+            for i in relations.ids:
+                frontier.follow(Database().names[i], depth + 1)
 
 
-def _add_reverse_dependencies(pkg: str) -> None:
+def _add_reverse_dependencies(pkg: str, depth: int, frontier: _Frontier) -> None:
     """Adds the reverse dependencies of a package to the list of packages to examine.
 
-    :param pkg:     name of the package to gather reverse dependencies from
+    With --follow-relation only packages referring to the package by one
+    of the given relation kinds are followed. apt-cache does not tell the
+    kind of a reverse dependency, so with --no-native all are followed.
+
+    :param pkg:         name of the package to gather reverse dependencies from
+    :param depth:       number of relations followed from a target to the package
+    :param frontier:    the packages still to examine
     """
     p = Database().packages.get(pkg, None)
-    if p is None:
+    if p is None or p.rdepend_ids is None:
         return
-    for rd in p.get('rdepend', []):
-        Database().add_package(rd['package'])
+    kinds = Configuration().follow_relations
+    if kinds and _native():
+        for rdep in sorted(DpkgDatabase().reverse_dependencies(pkg, kinds)):
+            frontier.follow(rdep, depth + 1)
+        return
+    for i in p.rdepend_ids:
+        frontier.follow(Database().names[i], depth + 1)
+
+
+def _check_tool(args: tuple, returncode: int, stderr: bytes, tolerated: tuple = ()) -> None:
+    """Raises the error of a failed tool call together with what the tool wrote to stderr.
+
+    :param args:        the tool and its arguments
+    :param returncode:  the exit code of the tool
+    :param stderr:      the stderr of the tool
+    :param tolerated:   exit codes besides 0 which are no failure
+    """
+    if returncode != 0 and returncode not in tolerated:
+        raise ToolError(args, 'failed with exit code ' + str(returncode), stderr)
 
 
 async def _collect_package_files(pkg: str) -> None:
@@ -57,19 +176,29 @@ async def _collect_package_files(pkg: str) -> None:
     """
     if pkg not in Database().packages:
         return
-    print(color.package(pkg) + ': collecting installed files...')
-    proc = await asyncio.create_subprocess_exec(Configuration().dpkg_query, '--listfiles', pkg,
-                                                stdout=asyncio.subprocess.PIPE,
-                                                stderr=asyncio.subprocess.PIPE)
-    stdout, _ = await proc.communicate()
-    if proc.returncode == 0:
-        package_size = 0
-        for line in stdout.decode().splitlines():
-            if os.path.exists(line) and os.path.isfile(line) and not os.path.islink(line):
-                file_size = os.path.getsize(line)
-                Database().packages[pkg].setdefault('files', {})[line] = file_size
-                package_size = package_size + file_size
-        Database().packages[pkg]['installed'] = package_size
+    _report(color.package(pkg) + ': collecting installed files...')
+    files = None
+    usage = Configuration().usage
+    if _native():
+        files = DpkgDatabase().cached_files(pkg)
+        if files is not None and usage and not files.detailed:
+            files = None
+        if files is None:
+            paths = DpkgDatabase().list_files(pkg)
+    else:
+        paths = await _query_package_files(pkg)
+    if files is None and paths is not None:
+        Statistics().files_stated = Statistics().files_stated + len(paths)
+        with Statistics().phase('stat files'):
+            stats = await stat_files(paths, Configuration().root)
+        files = FileList.from_stats(stats, detailed=usage)
+        if _native():
+            DpkgDatabase().cache_files(pkg, files)
+    if files is not None:
+        if usage:
+            with Statistics().phase('usage'):
+                Usage().add(files)
+        Database().packages[pkg].set_files(files)
 
 
 async def _collect_package_reverse_dependencies(pkg: str) -> None:
@@ -79,20 +208,17 @@ async def _collect_package_reverse_dependencies(pkg: str) -> None:
     """
     if pkg not in Database().packages:
         return
-    print(color.package(pkg) + ': collecting reverse dependencies...')
-    proc = await asyncio.create_subprocess_exec(Configuration().apt_cache, 'rdepends', pkg,
-                                                stdout=asyncio.subprocess.PIPE,
-                                                stderr=asyncio.subprocess.PIPE)
-    stdout, _ = await proc.communicate()
-    revdep = []
-    if proc.returncode == 0:
-        for line in stdout.decode().splitlines():
-            m = re.search(r'^\s\s(\S*)$', line)
-            if m and m.group(1) not in revdep:
-                revdep.append(m.group(1))
-    for rdep in revdep:
-        entry = {'package': rdep, 'installed': False}
-        Database().packages[pkg].setdefault('rdepend', []).append(entry)
+    _report(color.package(pkg) + ': collecting reverse dependencies...')
+    if _native():
+        dpkg = DpkgDatabase()
+        revdep = [(rdep, dpkg.is_installed(rdep)) for rdep in sorted(dpkg.reverse_dependencies(pkg))]
+    else:
+        # installed like dpkg tells ('ii'), just as DpkgDatabase.is_installed() does
+        installed = _installed.get()
+        rdepends = await _query_package_reverse_dependencies(pkg)
+        revdep = [(rdep, rdep.partition(':')[0] in installed) for rdep in rdepends]
+    for rdep, installed in revdep:
+        Database().packages[pkg].add_reverse_dependency(Database().names.intern(rdep), installed)
 
 
 async def _collect_package_status(pkg: str) -> None:
@@ -100,125 +226,259 @@ async def _collect_package_status(pkg: str) -> None:
     
     :param pkg:     name of the package.
     """
-    print(color.package(pkg) + ': collecting status information...')
-    proc = await asyncio.create_subprocess_exec(Configuration().dpkg_query, '--status', pkg,
-                                                stdout=asyncio.subprocess.PIPE,
-                                                stderr=asyncio.subprocess.PIPE)
-    stdout, _ = await proc.communicate()
-    if proc.returncode == 0:
-        Database().packages[pkg] = {}
-        for line in stdout.decode().splitlines():
-            m = re.search(r'(^.*): (.*)', line)
-            if m:
-                key = m.group(1).lower()
-                value = _expand_deb_query_value(key, m.group(2))
-                Database().packages[pkg][key] = value
+    _report(color.package(pkg) + ': collecting status information...')
+    if _native():
+        fields = DpkgDatabase().lookup(pkg)
     else:
-        print(color.package(pkg) + color.dropping(' is not installed, dropping.'))
+        fields = await _query_package_status(pkg)
+    if fields is not None:
+        values = {}
+        for key, value in fields.items():
+            values[sys.intern(key)] = _expand_deb_query_value(key, value)
+        Database().packages[pkg] = Package(pkg, values)
+    else:
+        _report(color.package(pkg) + color.dropping(' is not installed, dropping.'))
         del Database().packages[pkg]
 
 
+async def _collect_package_verification(pkg: str) -> None:
+    """Verifies the installed files of a package against the MD5 sums of the package.
+
+    Digests of files unchanged since an earlier run are taken from the cache.
+
+    :param pkg:     name of the package
+    """
+    if pkg not in Database().packages:
+        return
+    md5sums = DpkgDatabase().md5sums(pkg)
+    if md5sums is None:
+        return
+    _report(color.package(pkg) + ': verifying installed files...')
+    sums = verify.parse_md5sums(md5sums)
+    known = DpkgDatabase().cached_hashes(pkg)
+    hashed = await verify.hash_files(sums, Configuration().root, known)
+    if hashed != known:
+        DpkgDatabase().cache_hashes(pkg, hashed)
+    Database().packages[pkg].verified = verify.compare(sums, hashed)
+
+
+async def _collect_all_packages() -> None:
+    """Collect all installed packages as targets."""
+    _report('Collecting all installed packages...')
+    if _native():
+        packages = DpkgDatabase().installed_packages()
+    else:
+        packages = await _query_installed_packages()
+    for pkg in packages:
+        Database().add_package(pkg)
+    _report('Found ' + str(len(packages)) + ' installed packages.')
+
+
+async def _collect_installed_names() -> None:
+    """Collect the names of all installed packages, so the walk never follows packages not installed."""
+    if _native():
+        packages = DpkgDatabase().installed_packages()
+    else:
+        packages = await _query_installed_packages()
+    _installed.set(set(pkg.partition(':')[0] for pkg in packages))
+
+
 async def _collect_targets() -> None:
     """Collect all targets to inspect."""
+    if Configuration().all:
+        await _collect_all_packages()
+    paths = []
     tasks = []
+    root = Configuration().root
     for target in Configuration().targets:
-        tasks.append(asyncio.create_task(_detect_target(target)))
-    await asyncio.wait(tasks)
-
+        if root is None and os.path.exists(target):
+            paths.append(os.path.abspath(target))
+        elif root is not None and target.startswith('/') and _lexists_in_root(target, root):
+            paths.append(os.path.normpath(target))
+        else:
+            tasks.append(_grab_package(target))
+    if paths:
+        tasks.append(_detect_packages_for_files(paths))
+    await asyncio.gather(*tasks)
 
-async def _detect_package_for_file(path: str) -> None:
-    """Detect the package which installed a certain file and if so add the package to insight.
 
-    :param path:        path to file
-    """
-    path = os.path.abspath(path)
-    print('Searching for ' + color.file(path) + '...')
-    proc = await asyncio.create_subprocess_exec(Configuration().dpkg_query, '--search', path,
-                                                stdout=asyncio.subprocess.PIPE,
-                                                stderr=asyncio.subprocess.PIPE)
-    stdout, stderr = await proc.communicate()
-    if proc.returncode == 0:
-        for line in stdout.decode().splitlines():
-            m = re.search(r'(^.*):.*', line)
-            if m:
-                pkg = m.group(1)
-                print('Found ' + color.file(path) + ' in package ' + color.package(pkg))
-                await _grab_package(pkg)
+async def _detect_packages_for_files(paths: list) -> None:
+    """Detect the packages which installed certain files and add these packages to insight.
 
+    All paths are searched at once.
 
-async def _detect_target(target: str) -> None:
-    """Search for the given target name.
-    This searches the local operating system if the given target
-    is a package name or a file.
-
-    :param target:  the target to search
+    :param paths:       list of absolute paths to files
     """
-    if os.path.exists(target):
-        await _detect_package_for_file(target)
+    for path in paths:
+        _report('Searching for ' + color.file(path) + '...')
+    if _native():
+        owners = DpkgDatabase().search_files(paths)
     else:
-        await _grab_package(target)
+        owners = await _query_file_owners(paths)
+    packages = []
+    for path in paths:
+        if path not in owners:
+            _report(color.error('No package found which installed ') + color.file(path))
+            continue
+        for pkg in owners[path]:
+            _report('Found ' + color.file(path) + ' in package ' + color.package(pkg))
+            if pkg not in packages:
+                packages.append(pkg)
+    await asyncio.gather(*[_grab_package(pkg) for pkg in packages])
 
 
 async def _examine_open_packages() -> None:
-    """Collect information about all current open packages."""
-    for pkg in Database().open:
-        await _examine_package(pkg)
+    """Collect information about all current open packages.
 
+    The package graph is walked breadth-first by a pool of concurrent
+    workers, each taking the next package from the frontier.
+    """
+    frontier = _Frontier(Database().open)
+    workers = [asyncio.create_task(_examine_worker(frontier)) for _ in range(max(Configuration().jobs, 1))]
+    walk = asyncio.create_task(frontier.queue.join())
+    try:
+        await asyncio.wait(workers + [walk], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in workers + [walk]:
+            task.cancel()
+        results = await asyncio.gather(*workers, walk, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
 
-async def _examine_package(pkg: str) -> None:
+
+async def _examine_package(pkg: str, depth: int, frontier: _Frontier) -> None:
     """Collect information about a single package.
-    
-    :param pkg:     the name of the package to collect information for.
+
+    Relations of packages at --max-depth are not followed any further.
+
+    :param pkg:         the name of the package to collect information for.
+    :param depth:       number of relations followed from a target to the package
+    :param frontier:    the packages still to examine
+    """
+    Statistics().packages_visited = Statistics().packages_visited + 1
+    with Statistics().phase('status'):
+        await _collect_package_status(pkg)
+    tasks = []
+    if _needs_reverse_dependencies():
+        tasks.append(_timed('reverse dependencies', _collect_package_reverse_dependencies(pkg)))
+    if _needs_files():
+        tasks.append(_timed('files', _collect_package_files(pkg)))
+    if Configuration().verify:
+        tasks.append(_timed('verify', _collect_package_verification(pkg)))
+    await asyncio.gather(*tasks)
+    max_depth = Configuration().max_depth
+    if max_depth is None or depth < max_depth:
+        if Configuration().follow_depend:
+            _add_dependencies(pkg, depth, frontier)
+        if Configuration().follow_rdepend:
+            _add_reverse_dependencies(pkg, depth, frontier)
+    if _native():
+        _export_package(pkg)
+
+
+async def _examine_worker(frontier: _Frontier) -> None:
+    """Examines packages from the frontier until cancelled.
+
+    :param frontier:    the packages still to examine
     """
-    await _collect_package_status(pkg)
-    await _collect_package_reverse_dependencies(pkg)
-    await _collect_package_files(pkg)
-    if Configuration().follow_depend:
-        _add_dependencies(pkg)
-    if Configuration().follow_rdepend:
-        _add_reverse_dependencies(pkg)
+    while True:
+        pkg, depth = await frontier.queue.get()
+        try:
+            await _examine_package(pkg, depth, frontier)
+        finally:
+            frontier.queue.task_done()
 
 
-def _expand_deb_query_value(key: str, value: str) -> Union[str, list]:
+def _export_package(pkg: str) -> None:
+    """Writes the record of a completely examined package to the NDJSON output.
+
+    If the files of the package are neither shown nor dumped as JSON
+    later on, they are dropped from the database once written.
+
+    :param pkg:     the name of the package
+    """
+    p = Database().packages.get(pkg, None)
+    ndjson = _ndjson.get()
+    if ndjson is None or p is None:
+        return
+    with Statistics().phase('ndjson'):
+        ndjson.write(pkg, p.to_dict(Database().names))
+    if Configuration().no_files and not Configuration().json:
+        p.files = None
+
+
+def _expand_deb_query_value(key: str, value: str) -> Union[str, Relations]:
     """Expands a value gained from deb-query --status if necessary.
     
     Some keys like 'Depends' are a list of other packages, which
-    might contain package version information too. For further
-    ease of computation we break them into a list of tuples of necessary.
+    might contain alternatives, architecture qualifiers and package
+    version information too. For further ease of computation we
+    break them into Relations (package IDs with optional version)
+    if necessary.
     
     :param key:     the key as gained by deb-query
     :param value:   the value of this key
     :return:
     """
-    if key in ['replaces', 'depends', 'breaks', 'recommends', 'conflicts', 'suggests', 'pre-depends']:
-        package_version_list = []
-        for pkg in value.split(','):
-            pkg = pkg.strip()
-            m = re.match(r'(^.*).\((.*)\)', pkg)
-            if m:
-                package_version_list.append({'package': m.group(1), 'version': m.group(2)})
-            else:
-                package_version_list.append({'package': pkg})
-        return package_version_list
+    if key in RELATION_FIELDS:
+        return Relations.from_groups(parse_relations(value), Database().names)
+    if key in INTERNED_FIELDS:
+        return sys.intern(value)
     return value
 
 
 def _ensures_apt_cache_presence() -> None:
-    """Asserts that apt-cache is found on the system."""
+    """Asserts that apt-cache is found on the system.
+
+    apt-cache is only looked for once it is needed for the first time.
+    """
+    if 'apt-cache' in _tools_found:
+        return
     if Configuration().apt_cache is None:
-        sys.stderr.write('apt-cache not found on the system.\n')
-        sys.stderr.write('Is this a Debian (or Debian derivative) system?\n')
-        sys.exit(1)
-    print('Found apt-cache: ' + color.tool(Configuration().apt_cache))
+        raise RuntimeError('apt-cache not found on the system.\nIs this a Debian (or Debian derivative) system?\n')
+    _report('Found apt-cache: ' + color.tool(Configuration().apt_cache))
+    _tools_found.add('apt-cache')
+
+
+def _ensures_dpkg_database_presence() -> None:
+    """Asserts that a dpkg database given with --admindir can be read directly.
+
+    Only the database of the running system falls back to dpkg-query,
+    if it cannot be read directly. Any other database is an error, as
+    it must not be mixed up with the one of the running system.
+    """
+    config = Configuration()
+    if not config.native or DpkgDatabase().available:
+        return
+    if os.path.abspath(config.admin_dir) != DEFAULT_ADMIN_DIR:
+        raise RuntimeError('Cannot read the dpkg database ' + DpkgDatabase().status_file + '\n')
 
 
 def _ensures_dpkg_query_presence() -> None:
-    """Asserts that dpkg-query is found on the system."""
+    """Asserts that dpkg-query is found on the system.
+
+    dpkg-query is only looked for once it is needed for the first time.
+    """
+    if 'dpkg-query' in _tools_found:
+        return
     if Configuration().dpkg_query is None:
-        sys.stderr.write('dpkg-query not found on the system.\n')
-        sys.stderr.write('Is this a Debian (or Debian derivative) system?\n')
-        sys.exit(1)
-    print('Found dpkg-query: ' + color.tool(Configuration().dpkg_query))
+        raise RuntimeError('dpkg-query not found on the system.\nIs this a Debian (or Debian derivative) system?\n')
+    _report('Found dpkg-query: ' + color.tool(Configuration().dpkg_query))
+    _tools_found.add('dpkg-query')
+
+
+def _followed(pkg: str) -> bool:
+    """Checks if a package passes the --include and --exclude filters.
+
+    :param pkg:     the package name (an ':arch' qualifier is ignored)
+    :return:        True, if the package is to be followed
+    """
+    name = pkg.partition(':')[0]
+    include = Configuration().include
+    if include and not any(fnmatch.fnmatchcase(name, pattern) for pattern in include):
+        return False
+    return not any(fnmatch.fnmatchcase(name, pattern) for pattern in Configuration().exclude)
 
 
 async def _grab_package(pkg: str) -> None:
@@ -229,127 +489,292 @@ async def _grab_package(pkg: str) -> None:
     if pkg in Database().packages:
         return
     
-    print('Searching for ' + color.package(pkg) + '...')
-    proc = await asyncio.create_subprocess_exec(Configuration().dpkg_query, '--status', pkg,
-                                                stdout=asyncio.subprocess.PIPE,
-                                                stderr=asyncio.subprocess.PIPE)
-    await proc.communicate()
-    if proc.returncode != 0:
-        print(color.error('Failed to locate package ') + color.package(pkg) + color.error(' on the system.'))
+    _report('Searching for ' + color.package(pkg) + '...')
+    if _native():
+        found = DpkgDatabase().lookup(pkg) is not None
+    else:
+        found = await _query_package_status(pkg) is not None
+    if not found:
+        _report(color.error('Failed to locate package ') + color.package(pkg) + color.error(' on the system.'))
     else:
         Database().add_package(pkg)
-        print('Package ' + color.package(pkg) + ' found.')
+        _report('Package ' + color.package(pkg) + ' found.')
 
 
-def _show_data() -> None:
-    """Shows the gathered information to the user."""
-    print(color.header('=== Collecting information done. ==='))
-    for pkg in Database().packages:
-        _show_package(pkg)
-    if not Configuration().no_files:
-        _show_sum_installed()
+def _lexists_in_root(path: str, root: str) -> bool:
+    """Checks if a path exists within another root (without following the path itself, if it is a symlink).
+
+    :param path:    absolute path within the root
+    :param root:    the root directory
+    :return:        True, if the path exists
+    """
+    try:
+        return os.path.lexists(in_root(path, root))
+    except OSError:
+        return False
 
 
-def _show_package(pkg: str) -> None:
-    """Shows the gathered information to the user for a single package.
+def _native() -> bool:
+    """Checks if we read the dpkg database directly instead of using dpkg-query.
 
-    :param pkg:     the package to show
+    :return:    True, if the dpkg database is to be read directly.
     """
-    p = Database().packages[pkg]
-    print(color.package(pkg))
-    print('\tInstalled version: ' + color.version(p['version']))
-    if not Configuration().no_depend:
-        _show_package_dependencies(p.get('depends', None))
-    if not Configuration().no_rdepend:
-        _show_package_reverse_dependencies(p.get('rdepend', None))
-    if not Configuration().no_files:
-        _show_package_files(p.get('files', None))
-        _show_package_total_size(p.get('installed', None))
+    return Configuration().native and DpkgDatabase().available
 
 
-def _show_package_dependencies(dependencies: list) -> None:
-    """Shows a dependency list to the user.
+def _needs_files() -> bool:
+    """Checks if the installed files of the packages are shown, dumped or accounted at all.
 
-    :param dependencies:    the list of dependencies
+    :return:    True, if the installed files are to be collected
     """
-    if dependencies is None:
-        return
-    print('\tDependencies: ')
-    for dep in dependencies:
-        pkg_str = color.package(dep['package'])
-        version_str = ''
-        if 'version' in dep:
-            version_str = color.dependency(' (' + dep['version'] + ')')
-        print('\t\t' + pkg_str + version_str)
+    config = Configuration()
+    return not config.no_files or config.usage or bool(config.json) or bool(config.ndjson)
 
 
-def _show_package_files(files: dict) -> None:
-    """Shows files of a package to the user.
+def _needs_reverse_dependencies() -> bool:
+    """Checks if the reverse dependencies of the packages are shown, dumped or followed at all.
 
-    :param files:       the files of a package
+    :return:    True, if the reverse dependencies are to be collected
     """
-    if files is None:
-        return
-    print('\tInstalled files: ')
-    for f in files:
-        file_str = color.file(f)
-        filesize_str = ' ' + color.file_size('[' + str(files[f]) + ' Bytes]')
-        print('\t\t' + file_str + filesize_str)
+    config = Configuration()
+    return not config.no_rdepend or config.follow_rdepend or bool(config.json) or bool(config.ndjson)
 
 
-def _show_package_reverse_dependencies(dependencies: list) -> None:
-    """Shows a reverse dependency list to the user.
+async def _query_file_owners(paths: list) -> dict:
+    """Query the packages which installed the given files with dpkg-query --search.
 
-    :param dependencies:    the list of dependencies
+    The paths are passed in large batches to as few dpkg-query calls as
+    possible, which run concurrently (as far as the tool runner allows).
+
+    :param paths:   list of absolute paths
+    :return:        dict of path to the list of packages which installed the path
     """
-    if dependencies is None:
-        return
-    print('\tReverse dependencies: ')
-    for dep in dependencies:
-        pkg_str = color.package(dep['package'])
-        if dep['installed'] or not Configuration().drop_not_installed:
-            if dep['installed']:
-                installed_str = ' ' + color.installed('[installed]')
-            else:
-                installed_str = ' ' + color.not_installed('[not installed]')
-            print('\t\t' + pkg_str + installed_str)
+    _ensures_dpkg_query_presence()
+    owners = {}
+    batches = [('--search',) + tuple(paths[i:i + _SEARCH_BATCH_SIZE]) for i in range(0, len(paths), _SEARCH_BATCH_SIZE)]
+    results = await asyncio.gather(*[_run_dpkg_query(*args) for args in batches])
+    for args, (returncode, stdout, stderr) in zip(batches, results):
+        _check_tool((Configuration().dpkg_query,) + args, returncode, stderr, (_NOT_FOUND,))
+        for line in stdout.decode().splitlines():
+            if line.startswith('diversion by '):
+                continue
+            m = re.match(r'(.*?): (/.*)$', line)
+            if m:
+                owners.setdefault(m.group(2), []).extend(m.group(1).split(', '))
+    return owners
+
 
+async def _query_installed_packages() -> list:
+    """Query the names of all installed packages with a single dpkg-query call.
 
-def _show_package_total_size(size: int) -> None:
-    """Shows the total size of all installed files of a package to the user.
+    A package installed for several architectures is named
+    'name:arch' for all but the first architecture.
 
-    :param size:    the total amount of bytes installed by the package
+    :return:    list of package names
     """
-    if size is None:
-        return
-    print('\tTotal amount of bytes of installed files: ' + color.file_size(str(size) + ' Bytes'))
+    _ensures_dpkg_query_presence()
+    args = ('--show', '--showformat=${db:Status-Abbrev} ${Package} ${Architecture}\n')
+    returncode, stdout, stderr = await _run_dpkg_query(*args)
+    _check_tool((Configuration().dpkg_query,) + args, returncode, stderr)
+    packages = []
+    seen = set()
+    for line in stdout.decode().splitlines():
+        fields = line.split()
+        if len(fields) == 3 and fields[0].startswith('ii'):
+            packages.append(fields[1] if fields[1] not in seen else fields[1] + ':' + fields[2])
+            seen.add(fields[1])
+    return packages
+
+
+async def _query_package_files(pkg: str) -> Optional[list]:
+    """Query the list of files installed by a package with dpkg-query --listfiles.
 
+    :param pkg:     the name of the package
+    :return:        the list of paths or None if the package is not installed
+    """
+    _ensures_dpkg_query_presence()
+    returncode, stdout, stderr = await _run_dpkg_query('--listfiles', pkg)
+    _check_tool((Configuration().dpkg_query, '--listfiles', pkg), returncode, stderr, (_NOT_FOUND,))
+    if returncode != 0:
+        return None
+    return stdout.decode().splitlines()
 
-def _show_sum_installed() -> None:
-    """Shows the total sum of all installed files collected."""
-    total_sum = 0
-    for p in Database().packages:
-        total_sum = total_sum + Database().packages[p].get('installed', 0)
-    print('Total sum of bytes installed by these packages: ' + color.file_size(str(total_sum) + ' Bytes'))
 
+async def _query_package_reverse_dependencies(pkg: str) -> list:
+    """Query the reverse dependencies of a package with apt-cache rdepends.
 
-async def run() -> None:
-    """The debinsight algorithm."""
-    try:
-        _ensures_apt_cache_presence()
-        _ensures_dpkg_query_presence()
+    :param pkg:     the name of the package
+    :return:        the list of reverse dependent package names
+    """
+    _ensures_apt_cache_presence()
+    args = (Configuration().apt_cache, 'rdepends', pkg)
+    returncode, stdout, stderr = await _run_tool(*args)
+    if returncode != 0 and b'No packages found' in stderr:
+        # a package apt does not know of (e.g. of another --admindir)
+        return []
+    _check_tool(args, returncode, stderr)
+    revdep = []
+    for line in stdout.decode().splitlines():
+        m = re.search(r'^\s\s(\S*)$', line)
+        if m and m.group(1) not in revdep:
+            revdep.append(m.group(1))
+    return revdep
+
+
+async def _query_package_status(pkg: str) -> Optional[dict]:
+    """Query the status fields of a single package with dpkg-query --status.
+
+    :param pkg:     the name of the package
+    :return:        the status fields (lowercased keys) or None if the package is not installed
+    """
+    _ensures_dpkg_query_presence()
+    returncode, stdout, stderr = await _run_dpkg_query('--status', pkg)
+    _check_tool((Configuration().dpkg_query, '--status', pkg), returncode, stderr, (_NOT_FOUND,))
+    if returncode != 0:
+        return None
+    for stanza in iter_stanzas(stdout.decode().splitlines()):
+        return stanza
+    return None
+
+
+def _report(message: str) -> None:
+    """Hands a progress message of the collection to the progress callback (print by default).
+
+    :param message:     the message
+    """
+    _progress.get()(message)
+
+
+async def _run_dpkg_query(*args: str) -> tuple:
+    """Runs dpkg-query on the dpkg database of --admindir.
+
+    :param args:    the arguments of dpkg-query
+    :return:        the return code, the stdout and the stderr (as bytes) of dpkg-query
+    """
+    return await _run_tool(Configuration().dpkg_query, '--admindir=' + Configuration().admin_dir, *args)
+
+
+async def _run_tool(*args: str) -> tuple:
+    """Runs a tool as subprocess and collects its output.
+
+    The calls go through the tool runner of the collection, which
+    bounds the number of subprocesses (--tool-jobs), times out hung
+    calls and retries transient failures (see debinsight.tools).
+
+    :param args:    the tool and its arguments
+    :return:        the return code, the stdout and the stderr (as bytes) of the tool
+    """
+    return await _tools.get().run(*args)
+
+
+def _show_data() -> None:
+    """Shows the gathered information to the user."""
+    with Statistics().phase('render'):
+        Renderer().show(Database())
+
+
+def _show_statistics() -> None:
+    """Shows or dumps the run time statistics, if requested."""
+    if Configuration().stats == '-':
+        Statistics().write_table(sys.stdout)
+    elif Configuration().stats:
+        with open(Configuration().stats, 'wt') as f:
+            Statistics().write_json(f)
+
+
+async def _timed(phase: str, coro) -> None:
+    """Awaits a coroutine and adds the time spent to a phase of the statistics.
+
+    :param phase:   the name of the phase
+    :param coro:    the coroutine
+    """
+    with Statistics().phase(phase):
+        await coro
+
+
+async def collect() -> None:
+    """Collects the information of the targets (and of the packages followed) into the database.
+
+    Nothing is shown or dumped here, this is up to the caller.
+    """
+    _installed.set(None)
+    _ensures_dpkg_database_presence()
+    config = Configuration()
+    _tools.set(ToolRunner(config.tool_jobs or config.jobs, config.tool_timeout, config.tool_retries))
+    if _native():
+        _report('Reading dpkg database: ' + color.tool(DpkgDatabase().status_file))
+        with Statistics().phase('read dpkg database'):
+            DpkgDatabase().status
+    with Statistics().phase('targets'):
         await _collect_targets()
-        
-        while Database().open:
-            await _examine_open_packages()
+    if config.follow_depend or config.follow_rdepend or (not _native() and _needs_reverse_dependencies()):
+        with Statistics().phase('installed packages'):
+            await _collect_installed_names()
+    with Statistics().phase('walk'):
+        await _examine_open_packages()
+
+
+@contextlib.contextmanager
+def reporting(progress):
+    """Hands the progress messages of the collection to a callback instead of printing them.
 
-        Database().fix_installed_rdependencies()
-        _show_data()
+    The callback is bound to the current context, so concurrent
+    collections within other tasks keep their own callbacks.
+
+    :param progress:    callable getting each progress message (or None to drop them)
+    """
+    token = _progress.set(progress or (lambda message: None))
+    try:
+        yield
+    finally:
+        _progress.reset(token)
 
-        if Configuration().json:
-            with open(Configuration().json, 'wt') as f:
-                f.write(Database().dump())
+
+async def run() -> None:
+    """The debinsight algorithm."""
+    try:
+        Statistics()
+        ndjson = None
+        if Configuration().ndjson:
+            ndjson = NdjsonWriter(Configuration().ndjson)
+            _ndjson.set(ndjson)
+        with contextlib.ExitStack() as stack:
+            if ndjson is not None:
+                stack.callback(ndjson.close)
+                if ndjson.stream is sys.stdout:
+                    stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+            if Configuration().profile:
+                import cProfile
+                profiler = cProfile.Profile()
+                stack.callback(profiler.dump_stats, Configuration().profile)
+                stack.enter_context(profiler)
+            await _run()
+        _show_statistics()
+
+    except BrokenPipeError:
+        silence(sys.stdout)
+        sys.exit(1)
 
     except Exception as e:
         sys.stderr.write('Error: ' + str(e))
         sys.exit(1)
+
+
+async def _run() -> None:
+    """Collects, shows and dumps the package information."""
+    await collect()
+
+    if not _native():
+        for pkg in Database().packages:
+            _export_package(pkg)
+    else:
+        DpkgDatabase().save_cache()
+    _show_data()
+
+    if Configuration().json:
+        with Statistics().phase('json'), open(Configuration().json, 'wt') as f:
+            Database().write(f)
+
+    if Configuration().usage_json:
+        with open(Configuration().usage_json, 'wt') as f:
+            Usage().write_json(f)
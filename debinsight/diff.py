@@ -0,0 +1,482 @@
+# ------------------------------------------------------------
+# debinsight/diff.py
+#
+# differences between two dumps of collected package data
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module compares two dumps of collected package data ('debinsight diff').
+
+A dump is either the output of --json (a single JSON object keyed by
+package) or of --ndjson (one JSON record per line). Dumps of whole
+systems get big, mostly due to the file lists, so they are never
+loaded as a whole:
+
+1. Each dump is streamed once, record by record, into an index of
+   package name to the offset, length and digest of its record (plus
+   its version and installed size).
+2. Packages only in one of the indexes have been added or removed.
+   Packages whose records have the same digest are unchanged. Only
+   the records of the remaining packages are read again by offset,
+   one pair at a time, and compared in detail.
+
+So memory is bounded by the index and a single pair of records.
+"""
+
+import hashlib
+import json
+import re
+import sys
+from typing import BinaryIO, Iterator, Optional, TextIO
+
+from .configuration import Configuration
+from .deb822 import RELATION_FIELDS
+from .render import silence
+from . import color
+
+CHANGES = ('added', 'removed', 'upgraded', 'downgraded', 'changed')
+"""The kinds of changes of a package, in the order of the summary."""
+
+_CHUNK_SIZE = 1 << 20
+"""Number of bytes read at least at once from a dump of --json."""
+
+_TRUNCATED_TAIL = 8
+"""A JSON decoding error this close to the end of the text read so far may be due to a record read partly."""
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _Entry:
+
+    """The index entry of a single package record in a dump."""
+
+    __slots__ = ('offset', 'length', 'digest', 'version', 'installed')
+
+    def __init__(self, offset: int, length: int, digest: bytes, version: Optional[str], installed: Optional[int]):
+        self.offset = offset
+        self.length = length
+        self.digest = digest
+        self.version = version
+        self.installed = installed
+
+
+def _compare_fragment(a: str, b: str) -> int:
+    """Compares the upstream versions or the revisions of two versions like dpkg does.
+
+    :param a:   first upstream version or revision
+    :param b:   second upstream version or revision
+    :return:    < 0, 0 or > 0 if a is older, equal or newer than b
+    """
+    def order(s: str, i: int) -> int:
+        if i >= len(s) or s[i].isdigit():
+            return 0
+        if s[i].isalpha():
+            return ord(s[i])
+        if s[i] == '~':
+            return -1
+        return ord(s[i]) + 256
+
+    i = j = 0
+    while i < len(a) or j < len(b):
+        while (i < len(a) and not a[i].isdigit()) or (j < len(b) and not b[j].isdigit()):
+            difference = order(a, i) - order(b, j)
+            if difference:
+                return difference
+            i = i + 1
+            j = j + 1
+        while i < len(a) and a[i] == '0':
+            i = i + 1
+        while j < len(b) and b[j] == '0':
+            j = j + 1
+        first_difference = 0
+        while i < len(a) and a[i].isdigit() and j < len(b) and b[j].isdigit():
+            if not first_difference:
+                first_difference = ord(a[i]) - ord(b[j])
+            i = i + 1
+            j = j + 1
+        if i < len(a) and a[i].isdigit():
+            return 1
+        if j < len(b) and b[j].isdigit():
+            return -1
+        if first_difference:
+            return first_difference
+    return 0
+
+
+def _compare_packages(old: dict, new: dict) -> dict:
+    """Compares the records of a package in both dumps.
+
+    :param old:     the record of the package in the old dump
+    :param new:     the record of the package in the new dump
+    :return:        dict of the differences (empty if there are none)
+    """
+    changes = {}
+    fields = {}
+    for key in sorted(old.keys() | new.keys()):
+        if key in ('package', 'version', 'files', 'installed', 'rdepend') or key in RELATION_FIELDS:
+            continue
+        if old.get(key, None) != new.get(key, None):
+            fields[key] = [old.get(key, None), new.get(key, None)]
+    if fields:
+        changes['fields'] = fields
+
+    relations = {}
+    for kind in RELATION_FIELDS + ('rdepend',):
+        before = _relations(old.get(kind, None), kind)
+        after = _relations(new.get(kind, None), kind)
+        if before != after:
+            before_set = set(before)
+            after_set = set(after)
+            relations[kind] = {'added': [r for r in after if r not in before_set],
+                               'removed': [r for r in before if r not in after_set]}
+    if relations:
+        changes['relations'] = relations
+
+    old_files = old.get('files', None) or {}
+    new_files = new.get('files', None) or {}
+    if old_files != new_files:
+        changes['files'] = {
+            'added': {path: size for path, size in new_files.items() if path not in old_files},
+            'removed': {path: size for path, size in old_files.items() if path not in new_files},
+            'changed': {path: [old_files[path], size] for path, size in new_files.items()
+                        if path in old_files and old_files[path] != size},
+        }
+    if old.get('installed', None) != new.get('installed', None):
+        changes['installed'] = [old.get('installed', None), new.get('installed', None)]
+    return changes
+
+
+def _compare_versions(a: str, b: str) -> int:
+    """Compares two Debian package versions ([epoch:]upstream[-revision]) like dpkg does.
+
+    :param a:   first version
+    :param b:   second version
+    :return:    < 0, 0 or > 0 if a is older, equal or newer than b
+    """
+    def split(version: str) -> tuple:
+        epoch, _, rest = version.partition(':') if ':' in version else ('0', '', version)
+        upstream, _, revision = rest.rpartition('-') if '-' in rest else (rest, '', '')
+        return int(epoch or '0'), upstream, revision
+
+    epoch_a, upstream_a, revision_a = split(a)
+    epoch_b, upstream_b, revision_b = split(b)
+    if epoch_a != epoch_b:
+        return epoch_a - epoch_b
+    return _compare_fragment(upstream_a, upstream_b) or _compare_fragment(revision_a, revision_b)
+
+
+def _delta(old: Optional[int], new: Optional[int]) -> str:
+    """Formats the difference of two sizes.
+
+    :param old:     the old size (None counts as 0)
+    :param new:     the new size (None counts as 0)
+    :return:        the signed difference
+    """
+    return '{:+d}'.format((new or 0) - (old or 0))
+
+
+def _diff_package(old_entry: Optional[_Entry], new_entry: Optional[_Entry],
+                  old_file: BinaryIO, new_file: BinaryIO) -> Optional[dict]:
+    """Compares a package in both dumps.
+
+    :param old_entry:   the index entry of the package in the old dump (None if missing)
+    :param new_entry:   the index entry of the package in the new dump (None if missing)
+    :param old_file:    the old dump
+    :param new_file:    the new dump
+    :return:            dict of the change or None if the package is unchanged
+    """
+    if new_entry is None:
+        return {'change': 'removed', 'version': [old_entry.version, None], 'installed': [old_entry.installed, None]}
+    if old_entry is None:
+        return {'change': 'added', 'version': [None, new_entry.version], 'installed': [None, new_entry.installed]}
+    if old_entry.digest == new_entry.digest:
+        return None
+    changes = _compare_packages(_read(old_file, old_entry), _read(new_file, new_entry))
+    order = 0
+    if old_entry.version is not None and new_entry.version is not None:
+        order = _compare_versions(old_entry.version, new_entry.version)
+    if order == 0 and old_entry.version == new_entry.version and not changes:
+        return None
+    d = {'change': 'upgraded' if order < 0 else 'downgraded' if order > 0 else 'changed',
+         'version': [old_entry.version, new_entry.version]}
+    d.update(changes)
+    return d
+
+
+def _index(path: str) -> dict:
+    """Streams a dump into an index of its package records.
+
+    :param path:    the dump of --json or --ndjson
+    :return:        dict of package name to _Entry
+    """
+    index = {}
+    with open(path, 'rb') as f:
+        for name, offset, data, record in _records(f):
+            if not isinstance(record, dict) or 'package' not in record or not isinstance(name, str):
+                raise ValueError(path + ' is not a dump of debinsight --json or --ndjson.')
+            index[name] = _Entry(offset, len(data), hashlib.blake2b(data, digest_size=16).digest(),
+                                 record.get('version', None), record.get('installed', None))
+    return index
+
+
+def _json_records(f: BinaryIO) -> Iterator[tuple]:
+    """Yields the package records of a dump of --json, reading it chunk by chunk.
+
+    The dump is decoded as latin-1, so positions within the text are
+    the byte offsets within the file. --json writes plain ASCII anyway.
+
+    :param f:   the dump
+    :return:    yields tuples of package name, byte offset, raw bytes and decoded dict of the records
+    """
+    decoder = json.JSONDecoder()
+    malformed = f.name + ' is not a dump of debinsight --json or --ndjson.'
+    text = ''
+    base = 0
+    pos = 0
+    state = 'start'
+    while True:
+        try:
+            p = _WHITESPACE.match(text, pos).end()
+            if state == 'start':
+                if text[p] != '{':
+                    raise ValueError(malformed)
+                pos = p + 1
+                state = 'first'
+                continue
+            if text[p] == '}':
+                return
+            if state == 'next':
+                if text[p] != ',':
+                    raise ValueError(malformed)
+                p = _WHITESPACE.match(text, p + 1).end()
+            name, p = decoder.raw_decode(text, p)
+            p = _WHITESPACE.match(text, p).end()
+            if text[p] != ':':
+                raise ValueError(malformed)
+            start = _WHITESPACE.match(text, p + 1).end()
+            record, end = decoder.raw_decode(text, start)
+        except (IndexError, json.JSONDecodeError) as e:
+            if isinstance(e, json.JSONDecodeError) and not _truncated(e):
+                raise ValueError(malformed)
+            # the record continues beyond the text read so far: read as much again as is pending,
+            # so a big record is decoded a few times only instead of once per chunk
+            chunk = f.read(max(_CHUNK_SIZE, len(text) - pos))
+            if not chunk:
+                raise ValueError(malformed)
+            base = base + pos
+            text = text[pos:] + chunk.decode('latin-1')
+            pos = 0
+            continue
+        yield name, base + start, text[start:end].encode('latin-1'), record
+        pos = end
+        state = 'next'
+
+
+def _ndjson_records(f: BinaryIO) -> Iterator[tuple]:
+    """Yields the package records of a dump of --ndjson, line by line.
+
+    :param f:   the dump
+    :return:    yields tuples of package name, byte offset, raw bytes and decoded dict of the records
+    """
+    malformed = f.name + ' is not a dump of debinsight --json or --ndjson.'
+    offset = 0
+    for line in f:
+        data = line.rstrip()
+        if data:
+            try:
+                record = json.loads(data)
+            except ValueError:
+                raise ValueError(malformed) from None
+            yield record.get('package', None) if isinstance(record, dict) else None, offset, data, record
+        offset = offset + len(line)
+
+
+def _records(f: BinaryIO) -> Iterator[tuple]:
+    """Yields the package records of a dump of --json or of --ndjson, whichever it is.
+
+    The first member of a dump of --json is a package record, the first
+    member of a dump of --ndjson is a field of the first package record.
+    Only the first member is decoded to tell them apart, no matter how
+    the dump is laid out.
+
+    :param f:   the dump
+    :return:    yields tuples of package name, byte offset, raw bytes and decoded dict of the records
+    """
+    records = _json_records(f)
+    try:
+        first = next(records, None)
+        is_json = first is None or (isinstance(first[3], dict) and 'package' in first[3])
+    except ValueError:
+        first = None
+        is_json = False
+    if is_json:
+        if first is not None:
+            yield first
+        yield from records
+        return
+    records.close()
+    f.seek(0)
+    yield from _ndjson_records(f)
+
+
+def _read(f: BinaryIO, entry: _Entry) -> dict:
+    """Reads a package record again.
+
+    :param f:       the dump
+    :param entry:   the index entry of the record
+    :return:        the record
+    """
+    f.seek(entry.offset)
+    return json.loads(f.read(entry.length))
+
+
+def _relations(value, kind: str) -> list:
+    """Formats the relations of a kind of a package record.
+
+    :param value:   the relations as dumped (a list of dicts)
+    :param kind:    the kind of the relations (a relation field or 'rdepend')
+    :return:        list of the relations as text
+    """
+    if not isinstance(value, list):
+        return [] if value is None else [str(value)]
+    if kind == 'rdepend':
+        return [dep['package'] + ('' if dep.get('installed', True) else ' [not installed]') for dep in value]
+    relations = []
+    for dep in value:
+        alternatives = [dep] + dep.get('alternatives', [])
+        relations.append(' | '.join(alternative['package']
+                                    + (':' + alternative['arch'] if 'arch' in alternative else '')
+                                    + (' (' + alternative['version'] + ')' if 'version' in alternative else '')
+                                    for alternative in alternatives))
+    return relations
+
+
+def _truncated(e: json.JSONDecodeError) -> bool:
+    """Checks if a JSON decoding error may be due to a record read partly (rather than a malformed one).
+
+    :param e:   the error
+    :return:    True, if reading further may fix the error
+    """
+    return len(e.doc) - e.pos <= _TRUNCATED_TAIL or e.msg.startswith('Unterminated string')
+
+
+def _write_text(out: TextIO, name: str, d: dict) -> None:
+    """Writes the change of a package as text.
+
+    :param out:     the stream to write to
+    :param name:    the name of the package
+    :param d:       the change of the package
+    """
+    old_version, new_version = d['version']
+    change = d['change']
+    if change == 'added':
+        version = color.version(str(new_version))
+    elif change == 'removed':
+        version = color.version(str(old_version))
+    elif old_version != new_version:
+        version = color.version(str(old_version)) + ' -> ' + color.version(str(new_version))
+    else:
+        version = color.version(str(new_version))
+    line = change.capitalize() + ' ' + color.package(name) + ' ' + version
+    if 'installed' in d:
+        old_size, new_size = d['installed']
+        if change == 'added':
+            line = line + ' ' + color.file_size('[' + str(new_size or 0) + ' Bytes]')
+        elif change == 'removed':
+            line = line + ' ' + color.file_size('[' + str(old_size or 0) + ' Bytes]')
+        else:
+            line = line + ' ' + color.file_size('[' + _delta(old_size, new_size) + ' Bytes]')
+    out.write(line + '\n')
+
+    for key, (old, new) in d.get('fields', {}).items():
+        out.write('\t' + key.capitalize() + ': ' + str(old) + ' -> ' + str(new) + '\n')
+    for kind, relations in d.get('relations', {}).items():
+        label = 'Reverse dependencies' if kind == 'rdepend' else kind.title()
+        for relation in relations['added']:
+            out.write('\t' + label + ' added: ' + color.dependency(relation) + '\n')
+        for relation in relations['removed']:
+            out.write('\t' + label + ' removed: ' + color.dependency(relation) + '\n')
+    files = d.get('files', None)
+    if files is None:
+        return
+    out.write('\tFiles added: ' + str(len(files['added'])) + ', removed: ' + str(len(files['removed']))
+              + ', changed: ' + str(len(files['changed'])) + '\n')
+    if Configuration().no_files:
+        return
+    for path, size in files['added'].items():
+        out.write('\t\t+ ' + color.file(path) + ' ' + color.file_size('[' + str(size) + ' Bytes]') + '\n')
+    for path, size in files['removed'].items():
+        out.write('\t\t- ' + color.file(path) + ' ' + color.file_size('[' + str(size) + ' Bytes]') + '\n')
+    for path, (old, new) in files['changed'].items():
+        out.write('\t\t~ ' + color.file(path) + ' '
+                  + color.file_size('[' + str(old) + ' -> ' + str(new) + ' Bytes]') + '\n')
+
+
+def diff(old_path: str, new_path: str, out: TextIO, json_out: Optional[TextIO] = None) -> dict:
+    """Compares two dumps and writes the changed packages as they are found.
+
+    :param old_path:    the old dump of --json or --ndjson
+    :param new_path:    the new dump of --json or --ndjson
+    :param out:         the stream to write the text report to
+    :param json_out:    the stream to write the changes as JSON to (optional)
+    :return:            the summary: the number of packages per kind of change and the installed bytes
+    """
+    old_index = _index(old_path)
+    new_index = _index(new_path)
+    summary = {change: 0 for change in CHANGES}
+    summary['unchanged'] = 0
+    summary['installed'] = [sum(entry.installed or 0 for entry in old_index.values()),
+                            sum(entry.installed or 0 for entry in new_index.values())]
+    encoder = json.JSONEncoder(ensure_ascii=True)
+    if json_out is not None:
+        json_out.write('{"packages": {')
+    separator = ''
+    with open(old_path, 'rb') as old_file, open(new_path, 'rb') as new_file:
+        for name in sorted(old_index.keys() | new_index.keys()):
+            d = _diff_package(old_index.get(name, None), new_index.get(name, None), old_file, new_file)
+            if d is None:
+                summary['unchanged'] = summary['unchanged'] + 1
+                continue
+            summary[d['change']] = summary[d['change']] + 1
+            _write_text(out, name, d)
+            if json_out is not None:
+                json_out.write(separator + encoder.encode(name) + ': ')
+                for chunk in encoder.iterencode(d):
+                    json_out.write(chunk)
+                separator = ', '
+    if json_out is not None:
+        json_out.write('}, "summary": ' + encoder.encode(summary) + '}\n')
+    return summary
+
+
+def run(old_path: str, new_path: str) -> None:
+    """Compares two dumps and reports the changes.
+
+    :param old_path:    the old dump of --json or --ndjson
+    :param new_path:    the new dump of --json or --ndjson
+    """
+    try:
+        out = sys.stdout
+        out.write('--- ' + color.file(old_path) + '\n+++ ' + color.file(new_path) + '\n')
+        if Configuration().json:
+            with open(Configuration().json, 'wt') as json_out:
+                summary = diff(old_path, new_path, out, json_out)
+        else:
+            summary = diff(old_path, new_path, out)
+        old_size, new_size = summary['installed']
+        out.write(color.header('Summary: ' + ', '.join(str(summary[change]) + ' ' + change for change in CHANGES)
+                               + ', ' + str(summary['unchanged']) + ' unchanged packages; installed '
+                               + str(old_size) + ' -> ' + str(new_size) + ' Bytes ('
+                               + _delta(old_size, new_size) + ')') + '\n')
+        out.flush()
+
+    except BrokenPipeError:
+        silence(sys.stdout)
+        sys.exit(1)
+
+    except Exception as e:
+        sys.stderr.write('Error: ' + str(e) + '\n')
+        sys.exit(1)
@@ -0,0 +1,485 @@
+# ------------------------------------------------------------
+# debinsight/dpkg.py
+#
+# direct access to the dpkg database
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module reads the dpkg database (e.g. /var/lib/dpkg/status) directly.
+
+Instead of asking dpkg-query for every single package, the status
+database is read once and kept as an in-memory index keyed by
+package name.
+"""
+
+import hashlib
+import os.path
+from typing import Optional
+
+from .cache import Cache, signature
+from .configuration import Configuration
+from .context import lookup
+from .deb822 import RELATION_FIELDS, iter_stanzas, relation_names
+from .model import FileList
+
+
+def installed_packages(status: dict) -> list:
+    """Get the names of all installed packages of a dpkg status index.
+
+    A package installed for several architectures is named
+    'name:arch' for all but the first architecture.
+
+    :param status:  dict of package name (and 'name:arch') to status fields (see DpkgDatabase.status)
+    :return:        list of package names
+    """
+    packages = []
+    for key, fields in status.items():
+        name = fields.get('package', None)
+        if key == name or (':' in key and status.get(name, None) is not fields):
+            if fields.get('status', '').endswith(' installed'):
+                packages.append(key)
+    return packages
+
+
+class _Singleton(type):
+
+    """Singleton class instance."""
+    _instances = {}
+
+    def __call__(cls, *args, **kwargs):
+        scoped = lookup(cls)
+        if scoped is not None:
+            return scoped
+        if cls not in cls._instances:
+            cls._instances[cls] = super(_Singleton, cls).__call__(*args, **kwargs)
+        return cls._instances[cls]
+
+
+class DpkgDatabase(metaclass=_Singleton):
+
+    """The dpkg database as found in the dpkg admin directory."""
+
+    def __init__(self):
+        self._cache = None
+        self._list_files = None
+        self._reverse_dependencies = None
+        self._stanzas = {}
+        self._status = None
+
+    @property
+    def available(self) -> bool:
+        """Checks if the dpkg database can be read directly.
+
+        :return:    True, if the dpkg status file is readable.
+        """
+        return os.access(self.status_file, os.R_OK)
+
+    @property
+    def cache(self) -> Optional[Cache]:
+        """The persistent cache of this dpkg database, if caching is turned on.
+
+        :return:    the cache or None
+        """
+        if self._cache is None and (Configuration().cache or Configuration().rebuild_cache):
+            key = hashlib.sha1(os.path.abspath(Configuration().admin_dir).encode()).hexdigest()[:16]
+            self._cache = Cache(os.path.join(Configuration().cache_dir, key + '.pickle'),
+                                rebuild=Configuration().rebuild_cache)
+        return self._cache
+
+    def cache_files(self, pkg: str, files: FileList) -> None:
+        """Stores the files (with sizes) of a package in the persistent cache.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :param files:   the files installed by the package
+        """
+        name = self._list_file(pkg)
+        if self.cache is not None and name is not None:
+            self.cache.put('files:' + name, signature(os.path.join(self.info_dir, name)), files)
+
+    def cache_hashes(self, pkg: str, hashed: dict) -> None:
+        """Stores the digests of the files of a package in the persistent cache.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :param hashed:  dict of path to tuple of inode, mtime (in ns), size and hex digest
+        """
+        name = self._md5sums_file(pkg)
+        if self.cache is not None and name is not None:
+            self.cache.put('md5:' + name, signature(os.path.join(self.info_dir, name)), hashed)
+
+    def cached_files(self, pkg: str) -> Optional[FileList]:
+        """Gets the files (with sizes) of a package from the persistent cache.
+
+        The entry is only valid as long as the .list file of the package is unchanged.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        the files installed by the package or None
+        """
+        name = self._list_file(pkg)
+        if self.cache is None or name is None:
+            return None
+        return self.cache.get('files:' + name, signature(os.path.join(self.info_dir, name)))
+
+    def cached_hashes(self, pkg: str) -> Optional[dict]:
+        """Gets the digests of the files of a package from the persistent cache.
+
+        The entry is only valid as long as the .md5sums file of the package
+        is unchanged, each digest only as long as its file is unchanged.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        dict of path to tuple of inode, mtime (in ns), size and hex digest or None
+        """
+        name = self._md5sums_file(pkg)
+        if self.cache is None or name is None:
+            return None
+        return self.cache.get('md5:' + name, signature(os.path.join(self.info_dir, name)))
+
+    @property
+    def info_dir(self) -> str:
+        """Path to the dpkg info directory holding the per package files."""
+        return os.path.join(Configuration().admin_dir, 'info')
+
+    def installed_packages(self) -> list:
+        """Get the names of all installed packages.
+
+        A package installed for several architectures is named
+        'name:arch' for all but the first architecture.
+
+        :return:    list of package names
+        """
+        return installed_packages(self.status)
+
+    def is_installed(self, pkg: str) -> bool:
+        """Checks if a package is fully installed.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        True, if dpkg reports the package as installed
+        """
+        fields = self.lookup(pkg)
+        return fields is not None and fields.get('status', '').endswith(' installed')
+
+    def list_files(self, pkg: str) -> Optional[list]:
+        """Get the list of files installed by a package.
+
+        This reads the '<pkg>.list' (or '<pkg>:<arch>.list') file of
+        the dpkg info directory, which is what dpkg-query --listfiles
+        reports too.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        list of paths installed by the package or None
+        """
+        name = self._list_file(pkg)
+        if name is None:
+            return None
+        try:
+            with open(os.path.join(self.info_dir, name), 'rt', encoding='utf-8', errors='replace') as f:
+                return f.read().splitlines()
+        except OSError:
+            return None
+
+    @property
+    def _list_file_index(self) -> dict:
+        """The index of all package file lists in the dpkg info directory.
+
+        :return:    dict of the name of a .list file without suffix ('name' or 'name:arch') to the file name
+        """
+        if self._list_files is None:
+            self._list_files = self._scan_list_files()
+        return self._list_files
+
+    def lookup(self, pkg: str) -> Optional[dict]:
+        """Get the status fields of a package known to dpkg.
+
+        Packages which dpkg does remember but which are not installed
+        (status 'not-installed') are treated as unknown, just like
+        dpkg-query --status does.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        the status fields of the package or None
+        """
+        return self.status.get(pkg, None)
+
+    def md5sums(self, pkg: str) -> Optional[str]:
+        """Get the MD5 sums of the files installed by a package.
+
+        This reads the '<pkg>.md5sums' (or '<pkg>:<arch>.md5sums') file
+        of the dpkg info directory. Conffiles are not listed there.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        the content of the file or None if the package has no MD5 sums
+        """
+        name = self._md5sums_file(pkg)
+        if name is None:
+            return None
+        try:
+            with open(os.path.join(self.info_dir, name), 'rt', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def refresh_list_file(self, name: str) -> None:
+        """Updates the index of package file lists for a single .list file which appeared or vanished.
+
+        Changed .list files need no update here: cached file lists are
+        validated against the signature of their .list file anyway.
+
+        :param name:    the name of the .list file (e.g. 'bash.list')
+        """
+        index = self._list_file_index
+        key = name[:-len('.list')]
+        if os.path.exists(os.path.join(self.info_dir, name)):
+            index[key] = name
+        else:
+            index.pop(key, None)
+
+    def refresh_list_files(self) -> None:
+        """Forgets the index of package file lists, so the dpkg info directory is scanned again when needed."""
+        self._list_files = None
+
+    def refresh_status(self) -> set:
+        """Re-reads the dpkg status file, parsing only the stanzas which changed since the last refresh.
+
+        The raw text of each stanza is remembered, so unchanged stanzas
+        are reused as they are and the package and reverse dependency
+        indexes are only updated for the packages whose stanza changed.
+        The first refresh parses all stanzas.
+
+        :return:    set of names of the packages whose stanza changed, appeared or vanished
+        """
+        sig = signature(self.status_file)
+        with open(self.status_file, 'rt', encoding='utf-8', errors='replace') as f:
+            chunks = [chunk for chunk in f.read().split('\n\n') if chunk.strip()]
+        previous = self._stanzas
+        stanzas = {}
+        for chunk in chunks:
+            stanza = previous.get(chunk, None)
+            if stanza is None:
+                stanza = next(iter_stanzas(chunk.splitlines()), {})
+            stanzas[chunk] = stanza
+
+        if not previous or self._status is None:
+            self._status = {}
+            for stanza in stanzas.values():
+                self._index_stanza(self._status, stanza)
+            self._reverse_dependencies = None
+            changed = set(stanza.get('package', None) for stanza in stanzas.values())
+        else:
+            changed = set(stanza.get('package', None) for chunk, stanza in previous.items() if chunk not in stanzas)
+            changed.update(stanza.get('package', None) for chunk, stanza in stanzas.items() if chunk not in previous)
+            before = {name: self._status.get(name, None) for name in changed}
+            for key in [key for key in self._status if key.partition(':')[0] in changed]:
+                del self._status[key]
+            for stanza in stanzas.values():
+                if stanza.get('package', None) in changed:
+                    self._index_stanza(self._status, stanza)
+            if self._reverse_dependencies is not None:
+                for name in changed:
+                    self._link_relations(name, before[name], False)
+                    self._link_relations(name, self._status.get(name, None), True)
+        changed.discard(None)
+        self._stanzas = stanzas
+
+        if self.cache is not None:
+            self.cache.put('status', sig, self._status)
+            if self._reverse_dependencies is not None:
+                self.cache.put('rdepends', sig, self._reverse_dependencies)
+        return changed
+
+    def reverse_dependencies(self, pkg: str, kinds: tuple = RELATION_FIELDS) -> set:
+        """Get the names of all packages which refer to a package in one of their relation fields.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :param kinds:   the relation fields to consider (default: all)
+        :return:        set of names of reverse dependent packages
+        """
+        if self._reverse_dependencies is None:
+            sig = signature(self.status_file)
+            if self.cache is not None:
+                self._reverse_dependencies = self.cache.get('rdepends', sig)
+            if self._reverse_dependencies is None:
+                self._reverse_dependencies = self._invert_relations()
+                if self.cache is not None:
+                    self.cache.put('rdepends', sig, self._reverse_dependencies)
+        name = pkg.partition(':')[0]
+        rdepends = set()
+        for kind in kinds:
+            rdepends.update(self._reverse_dependencies.get(kind, {}).get(name, ()))
+        return rdepends
+
+    def save_cache(self) -> None:
+        """Writes the persistent cache, dropping entries of packages no longer installed."""
+        if self.cache is None:
+            return
+        names = set(self._list_file_index.values())
+        names.update(name[:-len('.list')] + '.md5sums' for name in list(names))
+
+        def keep(key: str) -> bool:
+            prefix, _, name = key.partition(':')
+            return prefix not in ('files', 'md5') or name in names
+
+        self.cache.discard(keep)
+        self.cache.save()
+
+    def search_files(self, paths: list) -> dict:
+        """Searches the packages which installed the given files.
+
+        All file lists of the dpkg info directory are read exactly once,
+        no matter how many paths are searched.
+
+        :param paths:   list of absolute paths
+        :return:        dict of path to the list of packages which installed the path
+        """
+        wanted = set(paths)
+        owners = {}
+        for name in sorted(set(self._list_file_index.values())):
+            pkg = name[:-len('.list')]
+            try:
+                with open(os.path.join(self.info_dir, name), 'rt', encoding='utf-8', errors='replace') as f:
+                    for line in f:
+                        line = line.rstrip('\n')
+                        if line in wanted:
+                            owners.setdefault(line, []).append(pkg)
+            except OSError:
+                continue
+        return owners
+
+    @property
+    def status(self) -> dict:
+        """The index of all packages found in the dpkg status file.
+
+        :return:    dict of package name to status fields
+        """
+        if self._status is None:
+            sig = signature(self.status_file)
+            if self.cache is not None:
+                self._status = self.cache.get('status', sig)
+            if self._status is None:
+                self._status = self._load_status()
+                if self.cache is not None:
+                    self.cache.put('status', sig, self._status)
+        return self._status
+
+    @property
+    def status_file(self) -> str:
+        """Path to the dpkg status file."""
+        return os.path.join(Configuration().admin_dir, 'status')
+
+    def _invert_relations(self) -> dict:
+        """Builds the reverse dependency index of all packages in a single pass.
+
+        :return:    dict of relation field to dict of package name to the set of names of packages referring to it
+        """
+        index = {key: {} for key in RELATION_FIELDS}
+        for name, fields in self.status.items():
+            if ':' in name:
+                continue
+            for key in RELATION_FIELDS:
+                value = fields.get(key, None)
+                if value is None:
+                    continue
+                for target in relation_names(value):
+                    if target != name:
+                        index[key].setdefault(target, set()).add(name)
+        return index
+
+    @staticmethod
+    def _index_stanza(index: dict, stanza: dict) -> None:
+        """Adds a stanza of the status file to the package index.
+
+        Packages which are not installed (status 'not-installed') are skipped.
+
+        :param index:   dict of package name (and 'name:arch') to status fields
+        :param stanza:  the status fields of a package
+        """
+        name = stanza.get('package', None)
+        if name is None or stanza.get('status', '').endswith(' not-installed'):
+            return
+        index.setdefault(name, stanza)
+        arch = stanza.get('architecture', None)
+        if arch is not None:
+            index[name + ':' + arch] = stanza
+
+    def _link_relations(self, name: str, fields: Optional[dict], link: bool) -> None:
+        """Adds or removes the edges of a package to the reverse dependency index.
+
+        :param name:    the package name
+        :param fields:  the status fields of the package (or None)
+        :param link:    True to add the edges, False to remove them
+        """
+        if fields is None:
+            return
+        for key in RELATION_FIELDS:
+            value = fields.get(key, None)
+            if value is None:
+                continue
+            index = self._reverse_dependencies[key]
+            for target in relation_names(value):
+                if target == name:
+                    continue
+                if link:
+                    index.setdefault(target, set()).add(name)
+                elif target in index:
+                    index[target].discard(name)
+                    if not index[target]:
+                        del index[target]
+
+    def _load_status(self) -> dict:
+        """Reads the dpkg status file stanza by stanza and builds the package index.
+
+        :return:    dict of package name (and 'name:arch') to status fields
+        """
+        index = {}
+        with open(self.status_file, 'rt', encoding='utf-8', errors='replace') as f:
+            for stanza in iter_stanzas(f):
+                self._index_stanza(index, stanza)
+        return index
+
+    def _list_file(self, pkg: str) -> Optional[str]:
+        """Gets the name of the .list file of a package.
+
+        dpkg names the file 'name:arch.list' for Multi-Arch: same packages
+        and 'name.list' otherwise. A bare package name stands for its
+        first stanza in the status file (see lookup()), so the file is
+        chosen by the architecture of that stanza.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        the name of the .list file or None if the package is unknown
+        """
+        index = self._list_file_index
+        name, _, arch = pkg.partition(':')
+        fields = self.lookup(pkg)
+        if not arch and fields is not None:
+            arch = fields.get('architecture', '')
+        if arch:
+            found = index.get(name + ':' + arch, None)
+            if found is not None or (fields is None and pkg != name):
+                return found
+        return index.get(name, None)
+
+    def _md5sums_file(self, pkg: str) -> Optional[str]:
+        """Gets the name of the .md5sums file of a package, which sits next to its .list file.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        the name of the .md5sums file or None if the package is unknown
+        """
+        name = self._list_file(pkg)
+        return name[:-len('.list')] + '.md5sums' if name is not None else None
+
+    def _scan_list_files(self) -> dict:
+        """Scans the dpkg info directory once for all package file lists.
+
+        :return:    dict of the name of a .list file without suffix ('name' or 'name:arch') to the file name
+        """
+        index = {}
+        try:
+            entries = os.scandir(self.info_dir)
+        except OSError:
+            return index
+        with entries:
+            for entry in entries:
+                if not entry.name.endswith('.list'):
+                    continue
+                index[entry.name[:-len('.list')]] = entry.name
+        return index
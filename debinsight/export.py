@@ -0,0 +1,63 @@
+# ------------------------------------------------------------
+# debinsight/export.py
+#
+# streaming export of collected package data
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module streams collected package data as newline delimited JSON.
+
+Each package is written as a single JSON object on a line of its own
+as soon as it has been examined, instead of dumping the whole database
+at the very end.
+"""
+
+import json
+import sys
+from typing import TextIO
+
+
+class NdjsonWriter:
+
+    """Writes one JSON record per package."""
+
+    def __init__(self, path: str):
+        """Constructor.
+
+        :param path:    the file to write to, '-' for stdout
+        """
+        self._encoder = json.JSONEncoder(ensure_ascii=True)
+        self._file = None
+        self._stream = None
+        if path == '-':
+            self._stream = sys.stdout
+        else:
+            self._file = open(path, 'wt')
+            self._stream = self._file
+
+    def close(self) -> None:
+        """Flushes and closes the output."""
+        self._stream.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def stream(self) -> TextIO:
+        """The stream the records are written to."""
+        return self._stream
+
+    def write(self, pkg: str, data: dict) -> None:
+        """Writes the record of a single package.
+
+        :param pkg:     the name of the package
+        :param data:    the collected data of the package
+        """
+        record = {'package': pkg}
+        record.update(data)
+        for chunk in self._encoder.iterencode(record):
+            self._stream.write(chunk)
+        self._stream.write('\n')
@@ -0,0 +1,152 @@
+# ------------------------------------------------------------
+# debinsight/filestat.py
+#
+# stat'ing of installed files
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module stats the files installed by packages.
+
+Every path is examined with a single os.lstat call. The paths are
+grouped by directory into batches, which are run on the default
+thread pool executor of the event loop so that big file lists do
+not block the other collectors.
+
+When inspecting another root (a chroot or container image), the paths
+of the packages are stat'ed within that root. Symlinks in the directories
+of a path are resolved within the root as well, so an absolute link of
+the image (like lib -> /usr/lib) never leads to the files of the host.
+"""
+
+import asyncio
+import errno
+import os
+import os.path
+import stat
+from typing import Optional
+
+BATCH_SIZE = 512
+"""Approximate number of paths stat'ed by a single job of the thread pool."""
+
+MAX_SYMLINKS = 40
+"""Number of symlinks followed in a single path at most (like the kernel does)."""
+
+
+def _resolve_directory(directory: str, root: str) -> str:
+    """Resolves all symlinks of a directory within another root.
+
+    Absolute link targets start over at the root and '..' never leaves it.
+
+    :param directory:   absolute path of the directory within the root
+    :param root:        the root directory
+    :return:            the path to access the directory
+    :raises OSError:    if there are too many symlinks in the path
+    """
+    resolved = []
+    pending = list(reversed(directory.split('/')))
+    links = 0
+    while pending:
+        part = pending.pop()
+        if part in ('', '.'):
+            continue
+        if part == '..':
+            if resolved:
+                resolved.pop()
+            continue
+        try:
+            target = os.readlink(os.path.join(root, *resolved, part))
+        except OSError:
+            # no symlink (or missing, which the caller finds out)
+            resolved.append(part)
+            continue
+        links = links + 1
+        if links > MAX_SYMLINKS:
+            raise OSError(errno.ELOOP, os.strerror(errno.ELOOP), directory)
+        if target.startswith('/'):
+            resolved = []
+        pending.extend(reversed(target.split('/')))
+    return os.path.join(root, *resolved)
+
+
+def in_root(path: str, root: Optional[str], directories: Optional[dict] = None) -> str:
+    """Gets the path of a file of another root as seen from here.
+
+    The directories of the path are resolved within the root, the
+    file itself is not followed, if it is a symlink.
+
+    :param path:        absolute path of the file within the root
+    :param root:        the root directory (None for the running system)
+    :param directories: dict of directories resolved before to use and fill (if any)
+    :return:            the path to access the file
+    :raises OSError:    if there are too many symlinks in the path
+    """
+    if root is None:
+        return path
+    directory, name = os.path.split('/' + path.lstrip('/'))
+    if directories is None:
+        directories = {}
+    resolved = directories.get(directory, None)
+    if resolved is None:
+        resolved = directories[directory] = _resolve_directory(directory, root)
+    return os.path.join(resolved, name)
+
+
+def _lstat_batch(paths: list, root: Optional[str] = None) -> list:
+    """Stats a batch of paths and keeps the regular files.
+
+    :param paths:   list of paths
+    :param root:    the root directory the paths are in (None for the running system)
+    :return:        list of tuples of path and os.stat_result of all regular files (no links)
+    """
+    found = []
+    directories = {}
+    for path in paths:
+        try:
+            st = os.lstat(in_root(path, root, directories))
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            found.append((path, st))
+    return found
+
+
+def _batches(paths: list) -> list:
+    """Groups paths by directory into batches of about BATCH_SIZE paths.
+
+    :param paths:   list of paths
+    :return:        list of lists of paths
+    """
+    by_directory = {}
+    for path in paths:
+        by_directory.setdefault(os.path.dirname(path), []).append(path)
+    batches = []
+    batch = []
+    for directory_paths in by_directory.values():
+        batch.extend(directory_paths)
+        if len(batch) >= BATCH_SIZE:
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+async def stat_files(paths: list, root: Optional[str] = None) -> dict:
+    """Stats all regular files (no links) of a list of paths.
+
+    :param paths:   list of paths
+    :param root:    the root directory the paths are in (None for the running system)
+    :return:        dict of path to os.stat_result, in the order of the given paths
+    """
+    if len(paths) <= BATCH_SIZE:
+        return dict(_lstat_batch(paths, root))
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[loop.run_in_executor(None, _lstat_batch, batch, root)
+                                     for batch in _batches(paths)])
+    found = {}
+    for result in results:
+        found.update(result)
+    return {path: found[path] for path in paths if path in found}
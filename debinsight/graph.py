@@ -0,0 +1,474 @@
+# ------------------------------------------------------------
+# debinsight/graph.py
+#
+# the dependency graph of all installed packages
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module holds the dependency graph of all installed packages.
+
+The graph is built once from the index of the dpkg database: each
+installed package gets an integer ID and the relations of the kinds
+chosen become edges, kept as lists of IDs in both directions. A
+relation to a virtual package is an edge to each installed package
+providing it; of the alternatives of a relation ('a | b') each one
+installed is an edge.
+
+A package installed for several architectures is a package of its own
+per architecture, named 'name:arch' for all but the first one (like
+the dpkg database index does). A relation without architecture
+qualifier (or with ':any') leads to the package of the same
+architecture, if installed, else to the package of that name.
+
+The packages installed on purpose are the roots of the graph: the
+Essential packages and those not marked as automatically installed
+by apt (/var/lib/apt/extended_states). Without apt's marks, packages
+no other package depends on are taken instead.
+
+Queries run on the IDs and only touch the packages they need, no
+closure of the graph is ever built.
+"""
+
+import heapq
+import os.path
+from typing import Iterator, Optional
+
+from .configuration import Configuration
+from .deb822 import iter_stanzas, parse_relations, relation_names
+from .dpkg import DpkgDatabase, installed_packages
+from .model import Names
+from .stats import Statistics
+
+DEFAULT_KINDS = ('pre-depends', 'depends', 'recommends')
+"""The relation kinds of the graph by default: the ones apt installs packages for."""
+
+REASONS = ('essential', 'manually installed', 'not required by any package')
+"""The reasons of roots to be installed, by the index of Graph.reasons."""
+
+
+def auto_installed(path: str) -> Optional[set]:
+    """Reads the names of the packages apt has installed automatically.
+
+    :param path:    path to apt's extended_states file
+    :return:        set of package names (and 'name:arch') or None, if the file cannot be read
+    """
+    auto = set()
+    try:
+        with open(path, 'rt', encoding='utf-8', errors='replace') as f:
+            for stanza in iter_stanzas(f):
+                if stanza.get('auto-installed', '0') != '1':
+                    continue
+                name = stanza.get('package', None)
+                if name is not None:
+                    auto.add(name)
+                    auto.add(name + ':' + stanza.get('architecture', ''))
+    except OSError:
+        return None
+    return auto
+
+
+def build_graph() -> 'Graph':
+    """Builds the dependency graph of the dpkg database configured.
+
+    The relation kinds of the graph are the ones of --relation.
+
+    :return:    the graph of all installed packages
+    """
+    dpkg = DpkgDatabase()
+    if not dpkg.available:
+        raise RuntimeError('Cannot read the dpkg database ' + dpkg.status_file + '.')
+    with Statistics().phase('graph'):
+        return Graph(dpkg.status, Configuration().follow_relations or DEFAULT_KINDS,
+                     auto_installed(extended_states_file(Configuration().admin_dir)))
+
+
+def extended_states_file(admin_dir: str) -> str:
+    """Gets the path to apt's extended_states file next to a dpkg database.
+
+    :param admin_dir:   the dpkg database directory (e.g. /var/lib/dpkg)
+    :return:            the path to the extended_states file (e.g. /var/lib/apt/extended_states)
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(admin_dir)), 'apt', 'extended_states')
+
+
+class Graph:
+
+    """The dependency graph of all installed packages."""
+
+    def __init__(self, status: dict, kinds: tuple = DEFAULT_KINDS, auto: Optional[set] = None):
+        """Constructor.
+
+        :param status:  the index of the dpkg database (see DpkgDatabase.status)
+        :param kinds:   the relation kinds turned into edges
+        :param auto:    the names of the packages installed automatically (None if unknown)
+        """
+        self.kinds = tuple(kinds)
+        self.names = Names()
+        installed = sorted(installed_packages(status))
+        for name in installed:
+            self.names.intern(name)
+        arches = [status[name].get('architecture', 'all') for name in installed]
+        # 'name' and 'name:arch' of each package, like the index of the dpkg database
+        self._ids = dict(self.names.ids)
+        for u, name in enumerate(installed):
+            self._ids.setdefault(name.partition(':')[0] + ':' + arches[u], u)
+
+        providers = {}
+        for u, name in enumerate(installed):
+            provides = status[name].get('provides', None)
+            if provides is not None:
+                for virtual in relation_names(provides):
+                    providers.setdefault(virtual, []).append(u)
+
+        self.depends = [[] for _ in installed]
+        self.relations = [bytearray() for _ in installed]
+        self.rdepends = [[] for _ in installed]
+        for u, name in enumerate(installed):
+            fields = status[name]
+            seen = set()
+            for k, kind in enumerate(self.kinds):
+                value = fields.get(kind, None)
+                if value is None:
+                    continue
+                for alternatives in parse_relations(value):
+                    for target, qualifier, _ in alternatives:
+                        v = self._resolve(target, qualifier, arches[u])
+                        if v is not None:
+                            targets = (v,)
+                        else:
+                            targets = providers.get(target, ())
+                            targets = [w for w in targets if arches[w] in (arches[u], 'all')] or targets
+                        for v in targets:
+                            if v != u and v not in seen:
+                                seen.add(v)
+                                self.depends[u].append(v)
+                                self.relations[u].append(k)
+                                self.rdepends[v].append(u)
+
+        self.reasons = bytearray(b'\xff' * len(installed))
+        for u, name in enumerate(installed):
+            bare = name.partition(':')[0]
+            if status[name].get('essential', 'no') == 'yes':
+                self.reasons[u] = 0
+            elif auto is not None:
+                # apt marks packages per architecture, older apt without any
+                if bare + ':' + arches[u] not in auto and bare + ':' not in auto:
+                    self.reasons[u] = 1
+            elif not self.rdepends[u]:
+                self.reasons[u] = 2
+
+    def __contains__(self, pkg: str) -> bool:
+        return pkg in self._ids
+
+    def __len__(self) -> int:
+        return len(self.depends)
+
+    def id(self, pkg: str) -> int:
+        """Gets the ID of an installed package.
+
+        :param pkg:     the package name (optionally with ':arch' qualifier)
+        :return:        the ID of the package
+        """
+        i = self._ids.get(pkg, None)
+        if i is None:
+            raise ValueError('Package ' + pkg + ' is not installed.')
+        return i
+
+    def is_root(self, u: int) -> bool:
+        """Checks if a package is installed on purpose.
+
+        :param u:   the ID of the package
+        :return:    True, if the package is a root of the graph
+        """
+        return self.reasons[u] != 0xff
+
+    def reason(self, u: int) -> Optional[str]:
+        """Gets the reason a root is installed.
+
+        :param u:   the ID of the package
+        :return:    one of REASONS or None, if the package is not a root
+        """
+        return REASONS[self.reasons[u]] if self.is_root(u) else None
+
+    def relation(self, u: int, v: int) -> str:
+        """Gets the relation kind of an edge.
+
+        :param u:   the ID of the package depending on v
+        :param v:   the ID of the package u depends on
+        :return:    the relation kind (e.g. 'depends')
+        """
+        return self.kinds[self.relations[u][self.depends[u].index(v)]]
+
+    def chains(self, target: int, source: Optional[int] = None, limit: int = 1,
+               max_depth: Optional[int] = None) -> list:
+        """Finds the shortest chains of relations leading to a package.
+
+        Without a source the chains start at the roots of the graph
+        (not passing any other root), so they tell why the package is
+        installed at all.
+
+        :param target:      the ID of the package
+        :param source:      the ID of the package the chains start at (None for the roots)
+        :param limit:       the number of chains found at most
+        :param max_depth:   the number of relations of a chain at most (None for no limit)
+        :return:            list of chains, the shortest first, each a list of package IDs
+        """
+        if limit <= 1:
+            if source is not None:
+                chain = self._shortest_chain(source, target, max_depth)
+            else:
+                chain = self._shortest_root_chain(target, max_depth)
+            return [chain] if chain is not None else []
+        return list(self._iter_chains(target, source, limit, max_depth))
+
+    def dominators(self) -> list:
+        """Computes the immediate dominator of each package reachable from the roots.
+
+        A package dominates another one, if every chain from the roots
+        to the other package passes it; so removing a package makes
+        exactly the packages it dominates unreachable. The roots hang
+        off a virtual package with the ID len(graph). This is the
+        iterative algorithm of Cooper, Harvey and Kennedy ("A Simple,
+        Fast Dominance Algorithm").
+
+        :return:    list of the ID of the immediate dominator by package ID (len(graph) for
+                    the roots, None for packages not reachable at all)
+        """
+        n = len(self.depends)
+        start = n
+        order = []
+        number = [None] * (n + 1)
+        visited = bytearray(n + 1)
+        visited[start] = 1
+        stack = [(start, iter(u for u in range(n) if self.is_root(u)))]
+        while stack:
+            u, successors = stack[-1]
+            for v in successors:
+                if not visited[v]:
+                    visited[v] = 1
+                    stack.append((v, iter(self.depends[v])))
+                    break
+            else:
+                stack.pop()
+                number[u] = len(order)
+                order.append(u)
+
+        idom = [None] * (n + 1)
+        idom[start] = start
+        changed = True
+        while changed:
+            changed = False
+            for v in reversed(order[:-1]):
+                new = None
+                predecessors = self.rdepends[v] + [start] if self.is_root(v) else self.rdepends[v]
+                for p in predecessors:
+                    if idom[p] is None:
+                        continue
+                    if new is None:
+                        new = p
+                        continue
+                    a, b = p, new
+                    while a != b:
+                        while number[a] < number[b]:
+                            a = idom[a]
+                        while number[b] < number[a]:
+                            b = idom[b]
+                    new = a
+                if idom[v] != new:
+                    idom[v] = new
+                    changed = True
+        return idom[:n]
+
+    def reachable(self, removed: set = frozenset()) -> bytearray:
+        """Sweeps the packages reachable from the roots once.
+
+        :param removed:     IDs of packages taken out of the graph
+        :return:            1 for each package ID reachable, else 0
+        """
+        seen = bytearray(len(self.depends))
+        frontier = [u for u in range(len(self.depends)) if self.is_root(u) and u not in removed]
+        for u in frontier:
+            seen[u] = 1
+        while frontier:
+            layer = []
+            for u in frontier:
+                for v in self.depends[u]:
+                    if not seen[v] and v not in removed:
+                        seen[v] = 1
+                        layer.append(v)
+            frontier = layer
+        return seen
+
+    def _distances(self, target: int, max_depth: Optional[int], stop_at_roots: bool) -> dict:
+        """Measures the distance of all packages to a package, walking the reverse dependencies.
+
+        :param target:          the ID of the package
+        :param max_depth:       the distance measured at most (None for no limit)
+        :param stop_at_roots:   if True, the walk does not pass roots (other than the target)
+        :return:                dict of package ID to its number of relations to the target
+        """
+        distance = {target: 0}
+        frontier = [target]
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth = depth + 1
+            layer = []
+            for v in frontier:
+                if stop_at_roots and v != target and self.is_root(v):
+                    continue
+                for u in self.rdepends[v]:
+                    if u not in distance:
+                        distance[u] = depth
+                        layer.append(u)
+            frontier = layer
+        return distance
+
+    def _iter_chains(self, target: int, source: Optional[int], limit: int,
+                     max_depth: Optional[int]) -> Iterator[list]:
+        """Enumerates the chains leading to a package, the shortest first.
+
+        The distances to the target bound the length of each partial
+        chain from below, so the partial chains are extended best first
+        and only along packages which still reach the target in time.
+
+        :param target:      the ID of the package
+        :param source:      the ID of the package the chains start at (None for the roots)
+        :param limit:       the number of chains yielded at most
+        :param max_depth:   the number of relations of a chain at most (None for no limit)
+        :return:            yields the chains, each a list of package IDs
+        """
+        distance = self._distances(target, max_depth, source is None)
+        if source is not None:
+            sources = [source] if source in distance else []
+        else:
+            sources = sorted(u for u in distance if self.is_root(u))
+        heap = [(distance[u], u, (u,)) for u in sources]
+        heapq.heapify(heap)
+        found = 0
+        while heap and found < limit:
+            _, _, chain = heapq.heappop(heap)
+            u = chain[-1]
+            if u == target:
+                yield list(chain)
+                found = found + 1
+                continue
+            for v in self.depends[u]:
+                d = distance.get(v, None)
+                if d is None or v in chain:
+                    continue
+                if source is None and v != target and self.is_root(v):
+                    continue
+                bound = len(chain) + d
+                if max_depth is None or bound <= max_depth:
+                    heapq.heappush(heap, (bound, v, chain + (v,)))
+
+    def _resolve(self, name: str, qualifier: Optional[str], arch: str) -> Optional[int]:
+        """Gets the package a relation of a package of an architecture leads to.
+
+        :param name:        the package name of the relation
+        :param qualifier:   the architecture qualifier of the relation (e.g. 'any', 'i386' or None)
+        :param arch:        the architecture of the package having the relation
+        :return:            the ID of the package or None, if not installed
+        """
+        if qualifier not in (None, 'any', 'native'):
+            return self._ids.get(name + ':' + qualifier, None)
+        v = self._ids.get(name + ':' + arch, None)
+        return v if v is not None else self._ids.get(name, None)
+
+    def _shortest_chain(self, source: int, target: int, max_depth: Optional[int]) -> Optional[list]:
+        """Finds the shortest chain from one package to another by a bidirectional breadth-first search.
+
+        Each step extends the smaller of the two frontiers by a whole
+        layer: the dependencies walked from the source or the reverse
+        dependencies walked from the target.
+
+        :param source:      the ID of the package the chain starts at
+        :param target:      the ID of the package the chain ends at
+        :param max_depth:   the number of relations of the chain at most (None for no limit)
+        :return:            the chain as list of package IDs or None, if there is none
+        """
+        if source == target:
+            return [source]
+        forward = {source: None}
+        backward = {target: None}
+        forward_depth = {source: 0}
+        backward_depth = {target: 0}
+        forward_frontier = [source]
+        backward_frontier = [target]
+        depth = 0
+        while forward_frontier and backward_frontier and (max_depth is None or depth < max_depth):
+            depth = depth + 1
+            meet = None
+            if len(forward_frontier) <= len(backward_frontier):
+                layer = []
+                for u in forward_frontier:
+                    for v in self.depends[u]:
+                        if v in forward:
+                            continue
+                        forward[v] = u
+                        forward_depth[v] = forward_depth[u] + 1
+                        layer.append(v)
+                        if v in backward and (meet is None or backward_depth[v] < backward_depth[meet]):
+                            meet = v
+                forward_frontier = layer
+            else:
+                layer = []
+                for v in backward_frontier:
+                    for u in self.rdepends[v]:
+                        if u in backward:
+                            continue
+                        backward[u] = v
+                        backward_depth[u] = backward_depth[v] + 1
+                        layer.append(u)
+                        if u in forward and (meet is None or forward_depth[u] < forward_depth[meet]):
+                            meet = u
+                backward_frontier = layer
+            if meet is not None:
+                chain = []
+                u = meet
+                while u is not None:
+                    chain.append(u)
+                    u = forward[u]
+                chain.reverse()
+                u = backward[meet]
+                while u is not None:
+                    chain.append(u)
+                    u = backward[u]
+                return chain
+        return None
+
+    def _shortest_root_chain(self, target: int, max_depth: Optional[int]) -> Optional[list]:
+        """Finds the shortest chain from any root to a package.
+
+        The reverse dependencies are walked from the package until the
+        first layer holding a root, so only the neighbourhood of the
+        package is ever visited.
+
+        :param target:      the ID of the package
+        :param max_depth:   the number of relations of the chain at most (None for no limit)
+        :return:            the chain as list of package IDs or None, if there is none
+        """
+        parent = {target: None}
+        frontier = [target]
+        depth = 0
+        while frontier:
+            roots = [u for u in frontier if self.is_root(u)]
+            if roots:
+                chain = [min(roots)]
+                while parent[chain[-1]] is not None:
+                    chain.append(parent[chain[-1]])
+                return chain
+            if max_depth is not None and depth >= max_depth:
+                break
+            depth = depth + 1
+            layer = []
+            for v in frontier:
+                for u in self.rdepends[v]:
+                    if u not in parent:
+                        parent[u] = v
+                        layer.append(u)
+            frontier = layer
+        return None
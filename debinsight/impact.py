@@ -0,0 +1,186 @@
+# ------------------------------------------------------------
+# debinsight/impact.py
+#
+# the impact of removing packages
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module estimates the impact of removing packages ('debinsight impact').
+
+Removing packages orphans all packages no longer reachable from the
+packages installed on purpose (the roots, see debinsight.graph), just
+like 'apt autoremove' would remove them afterwards. Reachability is a
+single sweep over the dependency graph from the roots.
+
+Evaluating many candidates each on its own (--each) needs no sweep per
+candidate at all: the packages orphaned by removing a single package
+are exactly the ones it dominates, so a single dominator tree answers
+for all candidates at once.
+
+The bytes freed are the sizes of the installed files (as collected by
+'debinsight inspect', cached with --cache) of the packages removed and
+orphaned, or the Installed-Size of the packages (--installed-size).
+"""
+
+import asyncio
+import json
+import sys
+from typing import Iterable, TextIO
+
+from .configuration import Configuration
+from .dpkg import DpkgDatabase
+from .filestat import stat_files
+from .graph import Graph, build_graph
+from .model import FileList
+from .render import silence
+from .stats import Statistics
+from . import color
+
+
+async def _sizes(graph: Graph, packages: Iterable[int], installed_size: bool) -> dict:
+    """Gets the installed sizes of packages.
+
+    The files of all packages are stat'ed concurrently.
+
+    :param graph:           the dependency graph
+    :param packages:        IDs of the packages
+    :param installed_size:  if True, take the Installed-Size field instead of the sizes of the files
+    :return:                dict of package ID to size in bytes
+    """
+    dpkg = DpkgDatabase()
+    sizes = {}
+
+    async def collect(u: int) -> None:
+        pkg = graph.names[u]
+        files = dpkg.cached_files(pkg)
+        if files is None:
+            paths = dpkg.list_files(pkg) or []
+            Statistics().files_stated = Statistics().files_stated + len(paths)
+            files = FileList.from_stats(await stat_files(paths, Configuration().root))
+            dpkg.cache_files(pkg, files)
+        sizes[u] = files.total
+
+    if installed_size:
+        for u in packages:
+            try:
+                sizes[u] = int(dpkg.lookup(graph.names[u]).get('installed-size', '0')) * 1024
+            except ValueError:
+                sizes[u] = 0
+    else:
+        with Statistics().phase('stat files'):
+            await asyncio.gather(*[collect(u) for u in packages])
+    return sizes
+
+
+async def each(graph: Graph, candidates: list, installed_size: bool = False) -> dict:
+    """Estimates the impact of removing each of the candidates on its own.
+
+    :param graph:           the dependency graph
+    :param candidates:      names of the packages
+    :param installed_size:  if True, take the Installed-Size field instead of the sizes of the files
+    :return:                dict of candidate to its impact (see impact()), the biggest first
+    """
+    ids = [graph.id(pkg) for pkg in candidates]
+    with Statistics().phase('dominators'):
+        idom = graph.dominators()
+        children = [[] for _ in range(len(graph))]
+        for v, d in enumerate(idom):
+            if d is not None and d < len(graph):
+                children[d].append(v)
+    dominated = {}
+    for u in ids:
+        below = []
+        if idom[u] is not None:
+            frontier = list(children[u])
+            while frontier:
+                below.extend(frontier)
+                frontier = [w for v in frontier for w in children[v]]
+        dominated[u] = sorted(below)
+    sizes = await _sizes(graph, set(ids).union(*dominated.values()), installed_size)
+    answers = {}
+    for u in ids:
+        answers[graph.names[u]] = _answer(graph, [u], dominated[u], sizes)
+    return dict(sorted(answers.items(), key=lambda item: -item[1]['bytes']))
+
+
+async def impact(graph: Graph, packages: list, installed_size: bool = False) -> dict:
+    """Estimates the impact of removing a set of packages together.
+
+    :param graph:           the dependency graph
+    :param packages:        names of the packages
+    :param installed_size:  if True, take the Installed-Size field instead of the sizes of the files
+    :return:                the packages removed and orphaned with their sizes and the bytes freed in total
+    """
+    removed = sorted(set(graph.id(pkg) for pkg in packages))
+    with Statistics().phase('reachability'):
+        before = graph.reachable()
+        after = graph.reachable(set(removed))
+    orphaned = [u for u in range(len(graph)) if before[u] and not after[u] and u not in removed]
+    sizes = await _sizes(graph, removed + orphaned, installed_size)
+    return _answer(graph, removed, orphaned, sizes)
+
+
+def _answer(graph: Graph, removed: list, orphaned: list, sizes: dict) -> dict:
+    """Puts the impact of a removal together.
+
+    :param graph:       the dependency graph
+    :param removed:     IDs of the packages removed
+    :param orphaned:    IDs of the packages orphaned
+    :param sizes:       dict of package ID to size in bytes
+    :return:            the answer as dict (e.g. for JSON)
+    """
+    return {
+        'removed': {graph.names[u]: sizes[u] for u in removed},
+        'orphaned': {graph.names[u]: sizes[u] for u in orphaned},
+        'bytes': sum(sizes[u] for u in removed) + sum(sizes[u] for u in orphaned),
+    }
+
+
+def _write_text(out: TextIO, answer: dict) -> None:
+    """Writes the impact of a removal as text.
+
+    :param out:     the stream to write to
+    :param answer:  the impact (see impact())
+    """
+    out.write('Removing ' + ', '.join(color.package(pkg) for pkg in answer['removed']) + ' frees '
+              + color.file_size(str(answer['bytes']) + ' Bytes') + ', ' + str(len(answer['orphaned']))
+              + ' packages orphaned.\n')
+    for title, packages in (('Removed', answer['removed']), ('Orphaned', answer['orphaned'])):
+        for pkg, size in packages.items():
+            out.write('\t' + title + ': ' + color.package(pkg) + ' '
+                      + color.file_size('[' + str(size) + ' Bytes]') + '\n')
+
+
+async def run(packages: list, each_alone: bool, installed_size: bool) -> None:
+    """Estimates and reports the impact of removing packages.
+
+    :param packages:        names of the packages
+    :param each_alone:      if True, evaluate the removal of each package on its own
+    :param installed_size:  if True, take the Installed-Size field instead of the sizes of the files
+    """
+    try:
+        graph = build_graph()
+        if each_alone:
+            answer = await each(graph, packages, installed_size)
+            for a in answer.values():
+                _write_text(sys.stdout, a)
+        else:
+            answer = await impact(graph, packages, installed_size)
+            _write_text(sys.stdout, answer)
+        DpkgDatabase().save_cache()
+        if Configuration().json:
+            with open(Configuration().json, 'wt') as f:
+                json.dump(answer, f)
+                f.write('\n')
+        sys.stdout.flush()
+
+    except BrokenPipeError:
+        silence(sys.stdout)
+        sys.exit(1)
+
+    except Exception as e:
+        sys.stderr.write('Error: ' + str(e) + '\n')
+        sys.exit(1)
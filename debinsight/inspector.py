@@ -0,0 +1,225 @@
+# ------------------------------------------------------------
+# debinsight/inspector.py
+#
+# debinsight as library: the Inspector
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module holds the Inspector, which drives debinsight as a library.
+
+Unlike the command line, which runs a single inspection per process,
+an Inspector runs as many inspections as wanted, even concurrently
+within a single event loop:
+
+    inspector = Inspector(follow_depend=True)
+    result = await inspector.inspect(['bash', '/usr/bin/openssl'])
+    for pkg, d in result.items():
+        ...
+
+Each inspection gets a configuration and a database of its own (see
+debinsight.context). The index of the dpkg database, the index of the
+package file lists and the persistent cache are kept by the Inspector,
+so they are read only once and are reused by all later inspections.
+Whenever the dpkg status file or info directory changed since (after
+an apt or dpkg run), they are refreshed like the daemon does before
+the next inspection starts.
+Nothing is printed: progress messages go to the optional progress
+callback.
+"""
+
+import asyncio
+import copy
+import os.path
+from typing import Callable, Iterable, Iterator, Optional
+
+from .cache import signature
+from .configuration import Configuration
+from .context import create, scope
+from .database import Database
+from .dpkg import DpkgDatabase
+from .stats import Statistics
+from .usage import Usage
+from . import debinsight
+
+
+class Inspection:
+
+    """The result of a single inspection."""
+
+    def __init__(self, database: Database, usage: Optional[Usage]):
+        """Constructor.
+
+        :param database:    the database holding the packages collected
+        :param usage:       the deduplicated disk usage, if accounted
+        """
+        self.database = database
+        self.usage = usage
+
+    def __contains__(self, pkg: str) -> bool:
+        return self.database.packages.get(pkg, None) is not None
+
+    def __getitem__(self, pkg: str) -> dict:
+        p = self.database.packages.get(pkg, None)
+        if p is None:
+            raise KeyError(pkg)
+        return p.to_dict(self.database.names)
+
+    def __len__(self) -> int:
+        return sum(1 for p in self.database.packages.values() if p is not None)
+
+    def items(self) -> Iterator[tuple]:
+        """Yields all packages collected as the dicts dumped as JSON by --json.
+
+        :return:    yields tuples of package name and dict of the package
+        """
+        return self.database.items()
+
+    def packages(self) -> list:
+        """Gets the names of all packages collected.
+
+        :return:    list of package names
+        """
+        return [pkg for pkg, p in self.database.packages.items() if p is not None]
+
+
+class Inspector:
+
+    """Inspects installed packages and files from within a program."""
+
+    def __init__(self,
+                 admin_dir: str = '/var/lib/dpkg',
+                 root: Optional[str] = None,
+                 jobs: Optional[int] = None,
+                 native: bool = True,
+                 cache: bool = False,
+                 progress: Optional[Callable[[str], None]] = None,
+                 **settings):
+        """Constructor.
+
+        :param admin_dir:   the dpkg database directory (within the root, if given)
+        :param root:        the root directory of a chroot or container image to inspect (None for the running system)
+        :param jobs:        number of packages examined concurrently per inspection [default: number of CPUs]
+        :param native:      if False, query dpkg-query and apt-cache instead of reading the dpkg database
+        :param cache:       if True, use the persistent cache of package data
+        :param progress:    callable getting the progress messages of the inspections (None to drop them)
+        :param settings:    defaults of the configuration settings for all inspections (see inspect())
+        """
+        config = create(Configuration)
+        config.admin_dir = admin_dir
+        config.root = root
+        config.native = native
+        config.cache = cache
+        config.no_color = True
+        if root is not None:
+            config.admin_dir = os.path.join(root, admin_dir.lstrip('/'))
+        if jobs is not None:
+            config.jobs = jobs
+        _configure(config, settings)
+        self.progress = progress
+        self.statistics = create(Statistics)
+        self._config = config
+        self._dpkg = create(DpkgDatabase)
+        self._signatures = None
+
+    async def inspect(self, targets: Iterable[str] = (), **settings) -> Inspection:
+        """Inspects packages (by name) and the packages which installed files (by path).
+
+        The settings override the ones of the Inspector for this
+        inspection only. They are named like the configuration:
+
+            all:                collect all installed packages (targets may be empty then)
+            follow_depend:      follow the dependencies of the packages
+            follow_rdepend:     follow the reverse dependencies of the packages
+            follow_relations:   the relation kinds followed (e.g. ('depends', 'recommends'))
+            max_depth:          number of relations followed at most from a target
+            max_packages:       number of packages collected at most
+            include, exclude:   glob patterns of package names followed (or not)
+            no_files:           do not collect the installed files
+            no_rdepend:         do not collect the reverse dependencies (unless followed)
+            usage:              account the deduplicated disk usage of the files
+            verify:             verify the files against the MD5 sums of their packages
+
+        Inspections may run concurrently, each with its own database.
+
+        :param targets:     package names and paths of files
+        :param settings:    configuration settings of this inspection
+        :return:            the packages collected
+        """
+        config = copy.copy(self._config)
+        config.targets = tuple(targets)
+        _configure(config, settings)
+        if not config.targets and not config.all:
+            raise ValueError('Inspection needs at least one target (or all).')
+        self._refresh()
+        database = create(Database)
+        usage = create(Usage)
+        instances = {
+            Configuration: config,
+            Database: database,
+            DpkgDatabase: self._dpkg,
+            Statistics: self.statistics,
+            Usage: usage,
+        }
+        # the task copies the context, so the instances bound are confined to this inspection
+        await asyncio.create_task(self._collect(instances))
+        return Inspection(database, usage if config.usage else None)
+
+    def save_cache(self) -> None:
+        """Writes the persistent cache, if turned on."""
+        with scope({Configuration: self._config, DpkgDatabase: self._dpkg}):
+            self._dpkg.save_cache()
+
+    def _refresh(self) -> None:
+        """Reads the dpkg database again, if it changed since the last inspection.
+
+        The status file and the info directory are checked by their
+        signature. Only the stanzas which changed are parsed again (see
+        DpkgDatabase.refresh_status()), like the daemon does.
+        """
+        with scope({Configuration: self._config, DpkgDatabase: self._dpkg}):
+            signatures = (signature(self._dpkg.status_file), signature(self._dpkg.info_dir))
+            if self._signatures is not None and signatures != self._signatures:
+                if signatures[1] != self._signatures[1]:
+                    self._dpkg.refresh_list_files()
+                if signatures[0] != self._signatures[0]:
+                    self._dpkg.refresh_status()
+            self._signatures = signatures
+
+    async def _collect(self, instances: dict) -> None:
+        """Collects the packages of an inspection with the instances bound to the singletons.
+
+        :param instances:   dict of singleton class to instance
+        """
+        with scope(instances), debinsight.reporting(self.progress):
+            config = instances[Configuration]
+            if config.native and not self._dpkg.available:
+                raise RuntimeError('Cannot read the dpkg database ' + self._dpkg.status_file + '.')
+            await debinsight.collect()
+            if config.no_files:
+                for p in instances[Database].packages.values():
+                    if p is not None:
+                        p.files = None
+
+
+_SETTINGS = ('all', 'follow_depend', 'follow_rdepend', 'follow_relations', 'max_depth', 'max_packages',
+             'include', 'exclude', 'no_files', 'no_rdepend', 'usage', 'verify')
+"""The configuration settings which may be given to an Inspector or an inspection."""
+
+
+def _configure(config: Configuration, settings: dict) -> None:
+    """Applies settings to a configuration.
+
+    :param config:      the configuration
+    :param settings:    dict of setting name to value
+    """
+    for key, value in settings.items():
+        if key not in _SETTINGS:
+            raise TypeError('unknown setting: ' + key)
+        setattr(config, key, value)
+    if isinstance(config.include, str) or isinstance(config.exclude, str):
+        raise TypeError('include and exclude are lists of glob patterns')
+    if config.follow_relations is not None:
+        config.follow_relations = tuple(config.follow_relations)
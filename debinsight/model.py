@@ -0,0 +1,344 @@
+# ------------------------------------------------------------
+# debinsight/model.py
+#
+# compact in-memory package model
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module holds the compact in-memory model of collected packages.
+
+On a whole machine there are millions of installed files and tens of
+thousands of dependency edges. Keeping these as nested dicts of
+strings costs a lot of memory. Instead:
+
+    * package records use __slots__,
+    * package names are interned and referred to by integer IDs,
+    * relations hold arrays of package IDs,
+    * file lists hold a table of (interned) directories, the basenames
+      as one single string with end offsets and an array of sizes.
+
+Each record can be turned back into the very same dict as before, so
+the JSON output stays unchanged.
+"""
+
+import sys
+from array import array
+from typing import Iterator, Optional
+
+INTERNED_FIELDS = frozenset(['architecture', 'essential', 'maintainer', 'multi-arch', 'origin', 'priority',
+                             'section', 'source', 'status'])
+"""Status fields whose values repeat a lot among packages and are therefore interned."""
+
+
+class Names:
+
+    """Table of interned package names, each with a unique integer ID."""
+
+    __slots__ = ('ids', 'names')
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __getitem__(self, i: int) -> str:
+        return self.names[i]
+
+    def intern(self, name: str) -> int:
+        """Get the ID of a package name, adding the name if new.
+
+        :param name:    the package name
+        :return:        the ID of the name
+        """
+        i = self.ids.get(name, None)
+        if i is None:
+            i = len(self.names)
+            name = sys.intern(name)
+            self.ids[name] = i
+            self.names.append(name)
+        return i
+
+
+class Relations:
+
+    """A list of relations to other packages (e.g. the 'Depends' field).
+
+    All alternatives of all relations are kept in one flat list. The
+    architecture qualifiers and the alternative markers are only kept
+    if there are any at all.
+    """
+
+    __slots__ = ('ids', 'versions', 'archs', 'alternatives')
+
+    def __init__(self, ids: array, versions: tuple, archs: tuple = None, alternatives: bytearray = None):
+        """Constructor.
+
+        :param ids:             array of the package IDs
+        :param versions:        tuple of the version constraints (or None) of each package
+        :param archs:           tuple of the architecture qualifiers (or None) of each package or None
+        :param alternatives:    1 for each package which is an alternative to the preceding one or None
+        """
+        self.ids = ids
+        self.versions = versions
+        self.archs = archs
+        self.alternatives = alternatives
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def entries(self, names: Names) -> Iterator[dict]:
+        """Yields each relation as dict like {'package': ..., 'version': ...}.
+
+        An 'arch' key is added for packages with an architecture
+        qualifier. Further alternatives of a relation are listed
+        under the 'alternatives' key of its first package.
+
+        :param names:   the table of package names
+        :return:        yields one dict per relation
+        """
+        entry = None
+        for n, (i, version) in enumerate(zip(self.ids, self.versions)):
+            d = {'package': names[i]}
+            if version is not None:
+                d['version'] = version
+            if self.archs is not None and self.archs[n] is not None:
+                d['arch'] = self.archs[n]
+            if self.alternatives is not None and self.alternatives[n]:
+                entry.setdefault('alternatives', []).append(d)
+                continue
+            if entry is not None:
+                yield entry
+            entry = d
+        if entry is not None:
+            yield entry
+
+    def groups(self) -> Iterator[array]:
+        """Yields the package IDs of each relation, i.e. the IDs of all its alternatives.
+
+        :return:    yields one array of package IDs per relation
+        """
+        if self.alternatives is None:
+            for i in self.ids:
+                yield array('I', [i])
+            return
+        group = None
+        for i, alternative in zip(self.ids, self.alternatives):
+            if alternative:
+                group.append(i)
+                continue
+            if group is not None:
+                yield group
+            group = array('I', [i])
+        if group is not None:
+            yield group
+
+    @staticmethod
+    def from_groups(groups: list, names: Names) -> 'Relations':
+        """Creates the relations as parsed by deb822.parse_relations().
+
+        :param groups:  list of relations, each a list of (name, arch, version) tuples
+        :param names:   the table of package names
+        :return:        the relations
+        """
+        ids = array('I')
+        versions = []
+        archs = []
+        alternatives = bytearray()
+        for group in groups:
+            for n, (pkg, arch, version) in enumerate(group):
+                ids.append(names.intern(pkg))
+                versions.append(None if version is None else sys.intern(version))
+                archs.append(None if arch is None else sys.intern(arch))
+                alternatives.append(1 if n else 0)
+        return Relations(ids, tuple(versions),
+                         tuple(archs) if any(arch is not None for arch in archs) else None,
+                         alternatives if any(alternatives) else None)
+
+
+class FileList:
+
+    """A compact list of files (with sizes) installed by a package.
+
+    A detailed file list also holds the device, inode and number of
+    allocated 512 byte blocks of each file (see usage.Usage).
+    """
+
+    __slots__ = ('dirs', 'dir_index', 'names', 'ends', 'sizes', 'devices', 'inodes', 'blocks')
+
+    def __init__(self):
+        self.dirs = ()
+        self.dir_index = array('I')
+        self.names = ''
+        self.ends = array('I')
+        self.sizes = array('Q')
+        self.devices = None
+        self.inodes = None
+        self.blocks = None
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def __iter__(self) -> Iterator[str]:
+        for path, _ in self.items():
+            yield path
+
+    @property
+    def detailed(self) -> bool:
+        """True, if the list holds device, inode and blocks of each file."""
+        return self.inodes is not None
+
+    def items(self) -> Iterator[tuple]:
+        """Yields all files in order.
+
+        :return:    yields tuples of path and size
+        """
+        start = 0
+        for d, end, size in zip(self.dir_index, self.ends, self.sizes):
+            yield self.dirs[d] + self.names[start:end], size
+            start = end
+
+    def to_dict(self) -> dict:
+        """Turns the file list into a dict.
+
+        :return:    dict of path to size
+        """
+        return dict(self.items())
+
+    @property
+    def total(self) -> int:
+        """The sum of the sizes of all files."""
+        return sum(self.sizes)
+
+    @staticmethod
+    def from_items(items) -> 'FileList':
+        """Creates a file list.
+
+        :param items:   iterable of tuples of path and size
+        :return:        the file list
+        """
+        files = FileList()
+        dirs = {}
+        names = []
+        end = 0
+        for path, size in items:
+            cut = path.rfind('/') + 1
+            d = dirs.get(path[:cut], None)
+            if d is None:
+                d = dirs[path[:cut]] = len(dirs)
+            name = path[cut:]
+            end = end + len(name)
+            names.append(name)
+            files.dir_index.append(d)
+            files.ends.append(end)
+            files.sizes.append(size)
+        files.dirs = tuple(sys.intern(d) for d in dirs)
+        files.names = ''.join(names)
+        if len(dirs) <= 0xff:
+            files.dir_index = array('B', files.dir_index)
+        elif len(dirs) <= 0xffff:
+            files.dir_index = array('H', files.dir_index)
+        return files
+
+    @staticmethod
+    def from_stats(stats: dict, detailed: bool = False) -> 'FileList':
+        """Creates a file list from stat results.
+
+        :param stats:       dict of path to os.stat_result
+        :param detailed:    if True, keep device, inode and blocks of each file too
+        :return:            the file list
+        """
+        files = FileList.from_items((path, st.st_size) for path, st in stats.items())
+        if detailed:
+            files.devices = array('Q', [st.st_dev for st in stats.values()])
+            files.inodes = array('Q', [st.st_ino for st in stats.values()])
+            files.blocks = array('Q', [st.st_blocks for st in stats.values()])
+        return files
+
+    def __getstate__(self):
+        return self.dirs, self.dir_index, self.names, self.ends, self.sizes, self.devices, self.inodes, self.blocks
+
+    def __setstate__(self, state):
+        dirs, self.dir_index, self.names, self.ends, self.sizes, self.devices, self.inodes, self.blocks = state
+        self.dirs = tuple(sys.intern(d) for d in dirs)
+
+
+class Package:
+
+    """The collected data of a single package."""
+
+    __slots__ = ('name', 'fields', 'rdepend_ids', 'rdepend_installed', 'files', 'installed', 'verified')
+
+    def __init__(self, name: str, fields: dict):
+        """Constructor.
+
+        :param name:    the package name
+        :param fields:  the status fields of the package (relation fields as Relations)
+        """
+        self.name = sys.intern(name)
+        self.fields = fields
+        self.rdepend_ids = None
+        self.rdepend_installed = None
+        self.files = None
+        self.installed = None
+        self.verified = None
+
+    def add_reverse_dependency(self, i: int, installed: bool) -> None:
+        """Adds a reverse dependency.
+
+        :param i:           the ID of the reverse dependent package
+        :param installed:   True, if the reverse dependent package is installed
+        """
+        if self.rdepend_ids is None:
+            self.rdepend_ids = array('I')
+            self.rdepend_installed = bytearray()
+        self.rdepend_ids.append(i)
+        self.rdepend_installed.append(1 if installed else 0)
+
+    def relations(self, key: str) -> Optional[Relations]:
+        """Gets the relations of a relation field like 'depends'.
+
+        :param key:     the (lowercased) field name
+        :return:        the relations or None
+        """
+        value = self.fields.get(key, None)
+        return value if isinstance(value, Relations) else None
+
+    def reverse_dependencies(self, names: Names) -> Optional[list]:
+        """Gets the reverse dependencies as list of dicts like {'package': ..., 'installed': ...}.
+
+        :param names:   the table of package names
+        :return:        the list of reverse dependencies or None
+        """
+        if self.rdepend_ids is None:
+            return None
+        return [{'package': names[i], 'installed': bool(installed)}
+                for i, installed in zip(self.rdepend_ids, self.rdepend_installed)]
+
+    def set_files(self, files: FileList) -> None:
+        """Sets the installed files of the package.
+
+        :param files:   the installed files
+        """
+        self.files = files if len(files) else None
+        self.installed = files.total
+
+    def to_dict(self, names: Names) -> dict:
+        """Turns the package into the dict as dumped as JSON.
+
+        :param names:   the table of package names
+        :return:        a dict of all collected data of the package
+        """
+        d = {}
+        for key, value in self.fields.items():
+            d[key] = list(value.entries(names)) if isinstance(value, Relations) else value
+        if self.rdepend_ids is not None:
+            d['rdepend'] = self.reverse_dependencies(names)
+        if self.files is not None:
+            d['files'] = self.files.to_dict()
+        if self.installed is not None:
+            d['installed'] = self.installed
+        if self.verified is not None:
+            d['verify'] = self.verified
+        return d
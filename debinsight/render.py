@@ -0,0 +1,241 @@
+# ------------------------------------------------------------
+# debinsight/render.py
+#
+# renders the report of collected packages
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module renders the report of the collected packages.
+
+A full report easily has millions of lines. Instead of a print()
+and some color function calls per line, the escape sequences are
+resolved once and the lines are collected into big chunks, which
+are then written with a single call each.
+"""
+
+import os
+import sys
+from typing import TextIO
+
+from .color import palette
+from .configuration import Configuration
+from .database import Database
+from .model import FileList
+from .usage import Usage
+
+
+def silence(stream: TextIO) -> None:
+    """Redirects a stream whose reader (e.g. less) went away to /dev/null.
+
+    This stops any further BrokenPipeError, including the one raised
+    by the final flush at interpreter exit.
+
+    :param stream:  the stream (e.g. sys.stdout)
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, stream.fileno())
+    os.close(devnull)
+
+
+class Renderer:
+
+    """Renders the collected packages as text report."""
+
+    CHUNK_SIZE = 1 << 16
+    """Number of pieces of text collected before they are written."""
+
+    def __init__(self, stream: TextIO = None):
+        """Constructor.
+
+        :param stream:  the stream to write to (default: sys.stdout at the time of writing)
+        """
+        self._stream = stream
+        self._pieces = []
+        self._broken = False
+        self._palette = palette(Configuration().no_color)
+
+    def flush(self) -> None:
+        """Writes all pending text."""
+        if self._pieces and not self._broken:
+            stream = self._stream or sys.stdout
+            try:
+                stream.write(''.join(self._pieces))
+                stream.flush()
+            except BrokenPipeError:
+                self._broken = True
+                silence(stream)
+        self._pieces = []
+
+    def show(self, database: Database) -> None:
+        """Renders the report of all collected packages.
+
+        :param database:    the database of collected packages
+        """
+        header_on, header_off = self._palette['header']
+        self._write(header_on + '=== Collecting information done. ===' + header_off + '\n')
+        for pkg in database.packages:
+            self._show_package(database, pkg)
+            if self._broken:
+                return
+        if not Configuration().no_files:
+            self._show_sum_installed(database)
+        if Configuration().usage:
+            self._show_usage(Usage())
+        self.flush()
+
+    def _dependency(self, dep: dict) -> str:
+        """Formats a single package of a dependency.
+
+        :param dep:     the dependency like {'package': ..., 'arch': ..., 'version': ...}
+        :return:        the package name with architecture qualifier and version constraint
+        """
+        package_on, package_off = self._palette['package']
+        text = package_on + dep['package'] + package_off
+        if 'arch' in dep:
+            text = text + ':' + dep['arch']
+        if 'version' in dep:
+            dependency_on, dependency_off = self._palette['dependency']
+            text = text + dependency_on + ' (' + dep['version'] + ')' + dependency_off
+        return text
+
+    def _show_package(self, database: Database, pkg: str) -> None:
+        """Renders a single package.
+
+        :param database:    the database of collected packages
+        :param pkg:         the package to show
+        """
+        p = database.packages[pkg]
+        package_on, package_off = self._palette['package']
+        version_on, version_off = self._palette['version']
+        self._write(package_on + pkg + package_off + '\n')
+        self._write('\tInstalled version: ' + version_on + p.fields['version'] + version_off + '\n')
+        if not Configuration().no_depend:
+            depends = p.relations('depends')
+            if depends is not None:
+                self._show_package_dependencies(list(depends.entries(database.names)))
+        if not Configuration().no_rdepend:
+            rdepends = p.reverse_dependencies(database.names)
+            if rdepends is not None:
+                self._show_package_reverse_dependencies(rdepends)
+        if not Configuration().no_files:
+            if p.files is not None:
+                self._show_package_files(p.files)
+            if p.installed is not None:
+                size_on, size_off = self._palette['file_size']
+                self._write('\tTotal amount of bytes of installed files: ' + size_on + str(p.installed) + ' Bytes'
+                            + size_off + '\n')
+        if p.verified is not None:
+            self._show_package_verification(p.verified)
+
+    def _show_package_dependencies(self, dependencies: list) -> None:
+        """Renders a dependency list.
+
+        Alternatives of a dependency are shown on the same line, separated by '|'.
+
+        :param dependencies:    the list of dependencies
+        """
+        self._write('\tDependencies: \n')
+        for dep in dependencies:
+            line = '\t\t' + self._dependency(dep)
+            for alternative in dep.get('alternatives', ()):
+                line = line + ' | ' + self._dependency(alternative)
+            self._write(line + '\n')
+
+    def _show_package_files(self, files: FileList) -> None:
+        """Renders the files of a package.
+
+        :param files:       the files of a package
+        """
+        file_on, file_off = self._palette['file']
+        size_on, size_off = self._palette['file_size']
+        before_size = file_off + ' ' + size_on + '['
+        after_size = ' Bytes]' + size_off + '\n'
+        self._write('\tInstalled files: \n')
+        pieces = self._pieces
+        for f, size in files.items():
+            pieces.append('\t\t' + file_on + f + before_size + str(size) + after_size)
+            if len(pieces) >= self.CHUNK_SIZE:
+                self.flush()
+                if self._broken:
+                    return
+                pieces = self._pieces
+
+    def _show_package_reverse_dependencies(self, dependencies: list) -> None:
+        """Renders a reverse dependency list.
+
+        :param dependencies:    the list of dependencies
+        """
+        package_on, package_off = self._palette['package']
+        installed_on, installed_off = self._palette['installed']
+        not_installed_on, not_installed_off = self._palette['not_installed']
+        drop_not_installed = Configuration().drop_not_installed
+        self._write('\tReverse dependencies: \n')
+        for dep in dependencies:
+            if dep['installed']:
+                self._write('\t\t' + package_on + dep['package'] + package_off + ' '
+                            + installed_on + '[installed]' + installed_off + '\n')
+            elif not drop_not_installed:
+                self._write('\t\t' + package_on + dep['package'] + package_off + ' '
+                            + not_installed_on + '[not installed]' + not_installed_off + '\n')
+
+    def _show_package_verification(self, verified: dict) -> None:
+        """Renders the files of a package which failed the verification.
+
+        :param verified:    the result of the verification like {'checked': ..., 'modified': [...], ...}
+        """
+        file_on, file_off = self._palette['file']
+        dropping_on, dropping_off = self._palette['dropping']
+        failed = ('modified', 'missing', 'unreadable')
+        self._write('\tVerified files: ' + str(verified['checked']) + ' checked, '
+                    + ', '.join(str(len(verified[kind])) + ' ' + kind for kind in failed) + '\n')
+        for kind in failed:
+            for f in verified[kind]:
+                self._write('\t\t' + file_on + f + file_off + ' ' + dropping_on + '[' + kind + ']' + dropping_off + '\n')
+
+    def _show_sum_installed(self, database: Database) -> None:
+        """Renders the total sum of all installed files collected.
+
+        :param database:    the database of collected packages
+        """
+        total_sum = 0
+        for p in database.packages.values():
+            total_sum = total_sum + (p.installed or 0)
+        size_on, size_off = self._palette['file_size']
+        self._write('Total sum of bytes installed by these packages: ' + size_on + str(total_sum) + ' Bytes'
+                    + size_off + '\n')
+
+    def _show_usage(self, usage: Usage) -> None:
+        """Renders the deduplicated disk usage and the directory tree down to --usage-depth.
+
+        :param usage:   the disk usage of all collected files
+        """
+        file_on, file_off = self._palette['file']
+        size_on, size_off = self._palette['file_size']
+        self._write('Disk usage of these packages, each file counted once: ' + size_on + str(usage.apparent)
+                    + ' Bytes' + size_off + ' apparent, ' + size_on + str(usage.disk) + ' Bytes' + size_off
+                    + ' on disk in ' + str(usage.files) + ' files\n')
+        if usage.duplicates:
+            self._write('\tNot counted again (hardlinks, shared files): ' + str(usage.duplicates) + ' files with '
+                        + size_on + str(usage.duplicate_bytes) + ' Bytes' + size_off + '\n')
+        depth = Configuration().usage_depth
+        if depth == 0:
+            return
+        self._write('Disk usage per directory (apparent / on disk): \n')
+        for path, (apparent, disk, files) in usage.directories().items():
+            level = path.count('/')
+            if path == '/' or level > depth:
+                continue
+            self._write('\t' * level + file_on + path + file_off + ' ' + size_on + '[' + str(apparent) + ' / '
+                        + str(disk) + ' Bytes, ' + str(files) + ' files]' + size_off + '\n')
+
+    def _write(self, text: str) -> None:
+        """Adds a piece of text to the output.
+
+        :param text:    the text
+        """
+        self._pieces.append(text)
+        if len(self._pieces) >= self.CHUNK_SIZE:
+            self.flush()
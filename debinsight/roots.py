@@ -0,0 +1,155 @@
+# ------------------------------------------------------------
+# debinsight/roots.py
+#
+# inspecting several dpkg roots (chroots, container images) at once
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module inspects several root directories at once (--root).
+
+A root is an unpacked system tree like a chroot or the rootfs of a
+container image. It is inspected against its own dpkg database (the
+--admindir within the root) and the sizes of the files are taken from
+within the root.
+
+Each root is inspected by a process of its own out of a pool of
+processes. The configuration, the databases and the statistics are
+singletons per process, so every root gets a fresh set of them. The
+processes hand back the rendered report, the JSON of the packages and
+the statistics, which are merged here keyed by root.
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os.path
+import sys
+
+from .configuration import Configuration
+from .render import silence
+from . import color
+
+
+def _inspect_root(task: tuple) -> dict:
+    """Inspects a single root within a process of the pool.
+
+    :param task:    tuple of the root directory and the configuration settings of the parent process
+    :return:        dict of the rendered report, the JSON of the packages, the usage
+                    and the statistics; or of the error if the root could not be inspected
+    """
+    root, settings = task
+    config = Configuration()
+    config.__dict__.update(settings)
+    config.root = root
+    config.admin_dir = os.path.join(root, settings['admin_dir'].lstrip('/'))
+    try:
+        import asyncio
+        import uvloop
+        uvloop.install()
+        return asyncio.run(_inspect())
+    except Exception as e:
+        return {'error': str(e)}
+
+
+async def _inspect() -> dict:
+    """Collects and renders the packages of the root configured.
+
+    :return:    dict of the rendered report, the JSON of the packages, the usage and the statistics
+    """
+    from .database import Database
+    from .dpkg import DpkgDatabase
+    from .render import Renderer
+    from .stats import Statistics
+    from .usage import Usage
+    from . import debinsight
+
+    config = Configuration()
+    dpkg = DpkgDatabase()
+    if not dpkg.available:
+        raise RuntimeError('Cannot read the dpkg database ' + dpkg.status_file + '.')
+    report = io.StringIO()
+    with contextlib.redirect_stdout(report):
+        await debinsight.collect()
+    dpkg.save_cache()
+    with Statistics().phase('render'):
+        Renderer(report).show(Database())
+    packages = io.StringIO()
+    if config.json:
+        with Statistics().phase('json'):
+            Database().write(packages)
+    if config.stats == '-':
+        Statistics().write_table(report)
+    return {
+        'report': report.getvalue(),
+        'packages': packages.getvalue(),
+        'usage': Usage().as_dict() if config.usage else None,
+        'stats': Statistics().as_dict(),
+    }
+
+
+def _write_json(path: str, results: dict, key: str) -> None:
+    """Writes a part of the results of all roots as JSON keyed by root.
+
+    :param path:        the file to write to
+    :param results:     dict of root to result of _inspect_root()
+    :param key:         the part of the results to write
+    """
+    encoder = json.JSONEncoder(ensure_ascii=True)
+    with open(path, 'wt') as f:
+        f.write('{')
+        separator = ''
+        for root, result in results.items():
+            f.write(separator + encoder.encode(root) + ': ')
+            if 'error' in result:
+                f.write(encoder.encode({'error': result['error']}))
+            elif isinstance(result[key], str):
+                f.write(result[key])
+            else:
+                f.write(encoder.encode(result[key]))
+            separator = ', '
+        f.write('}\n')
+
+
+def run() -> None:
+    """Inspects all roots configured."""
+    config = Configuration()
+    settings = {key: value for key, value in vars(config).items() if not key.startswith('_')}
+    processes = max(min(config.jobs, len(config.roots)), 1)
+    print('Inspecting ' + str(len(config.roots)) + ' roots with ' + str(processes) + ' processes...')
+    results = {}
+    failed = False
+    try:
+        # a fresh process per root: the singletons of one root must not leak into the next
+        with multiprocessing.get_context('spawn').Pool(processes, maxtasksperchild=1) as pool:
+            tasks = [(root, settings) for root in config.roots]
+            for (root, _), result in zip(tasks, pool.imap(_inspect_root, tasks)):
+                results[root] = result
+                sys.stdout.write(color.header('=== Root ' + root + ' ===') + '\n')
+                if 'error' in result:
+                    failed = True
+                    sys.stdout.write(color.error('Error: ' + result['error']) + '\n')
+                else:
+                    sys.stdout.write(result['report'])
+                sys.stdout.flush()
+
+        if config.json:
+            _write_json(config.json, results, 'packages')
+        if config.usage_json:
+            _write_json(config.usage_json, results, 'usage')
+        if config.stats and config.stats != '-':
+            _write_json(config.stats, results, 'stats')
+
+    except BrokenPipeError:
+        silence(sys.stdout)
+        sys.exit(1)
+
+    except Exception as e:
+        sys.stderr.write('Error: ' + str(e))
+        sys.exit(1)
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,250 @@
+# ------------------------------------------------------------
+# debinsight/server.py
+#
+# debinsight daemon answering queries over a Unix socket
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module holds the debinsight daemon ('debinsight serve').
+
+The daemon keeps the dpkg database index and the file lists of the
+packages resident and answers queries over a Unix socket. It watches
+the dpkg status file and the info directory: when dpkg changes them,
+only the changed stanzas and .list files are read again.
+
+A query is a single line of JSON like
+
+    {"targets": ["bash"], "follow_depend": true}
+
+and is answered by a single line of JSON, shaped just like the output
+of --json (or {"error": "..."} if the query failed). A query of
+{"stats": true} is answered with the run time statistics. A query of
+
+    {"why": "libc6", "from": "bash", "max_chains": 3}
+
+is answered like 'debinsight why' dumps its --json; the dependency
+graph for it is kept until dpkg changes the database.
+"""
+
+import asyncio
+import io
+import json
+import os
+import os.path
+import signal
+import sys
+
+from .configuration import Configuration
+from .database import Database
+from .deb822 import RELATION_FIELDS
+from .dpkg import DpkgDatabase
+from .graph import DEFAULT_KINDS, build_graph
+from .stats import Statistics
+from .watch import watcher
+from . import color
+from . import debinsight
+from . import why
+
+QUERY_OPTIONS = {
+    'all': False,
+    'targets': (),
+    'follow_depend': False,
+    'follow_rdepend': False,
+    'follow_relations': None,
+    'max_depth': None,
+    'max_packages': None,
+    'include': (),
+    'exclude': (),
+}
+"""The configuration settings a query may set, with their defaults."""
+
+
+def default_socket() -> str:
+    """Get the default path of the Unix socket of the daemon.
+
+    :return:    the path of the socket in $XDG_RUNTIME_DIR (or the debinsight cache directory)
+    """
+    return os.path.join(os.environ.get('XDG_RUNTIME_DIR', None) or Configuration().cache_dir, 'debinsight.sock')
+
+
+class Server:
+
+    """The debinsight daemon."""
+
+    def __init__(self):
+        self._graphs = {}
+        self._lock = asyncio.Lock()
+
+    async def answer(self, line: str) -> str:
+        """Answers a single query.
+
+        :param line:    the query as JSON
+        :return:        the answer as JSON
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('query is not a JSON object')
+            if request.get('stats', False):
+                return json.dumps(Statistics().as_dict())
+            if 'why' in request:
+                async with self._lock:
+                    return json.dumps(self._why(request))
+            async with self._lock:
+                self._configure(request)
+                Database().clear()
+                with debinsight.reporting(None):
+                    await debinsight.collect()
+                if request.get('no_files', False):
+                    for p in Database().packages.values():
+                        if p is not None:
+                            p.files = None
+                f = io.StringIO()
+                Database().write(f)
+                return f.getvalue()
+        except Exception as e:
+            return json.dumps({'error': str(e)})
+
+    async def serve(self) -> None:
+        """Serves queries until SIGINT or SIGTERM."""
+        dpkg = DpkgDatabase()
+        if not dpkg.available:
+            raise RuntimeError('Cannot read the dpkg database ' + dpkg.status_file + '.')
+        print('Reading dpkg database: ' + color.tool(dpkg.status_file))
+        with Statistics().phase('refresh'):
+            dpkg.refresh_status()
+            # builds the reverse dependency index right away instead of within the first query
+            dpkg.reverse_dependencies('')
+
+        path = Configuration().socket or default_socket()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        print('Listening on ' + color.file(path))
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        watching = asyncio.create_task(self._watch())
+        try:
+            await stop.wait()
+        finally:
+            watching.cancel()
+            server.close()
+            await server.wait_closed()
+            if os.path.exists(path):
+                os.unlink(path)
+            dpkg.save_cache()
+
+    def _configure(self, request: dict) -> None:
+        """Sets the configuration as requested by a query.
+
+        :param request:     the query
+        """
+        config = Configuration()
+        for key, default in QUERY_OPTIONS.items():
+            setattr(config, key, request.get(key, default))
+        if isinstance(config.targets, str) or not all(isinstance(target, str) for target in config.targets):
+            raise ValueError('targets must be a list of package names or paths')
+        if not config.targets and not config.all:
+            raise ValueError('query needs at least one target (or all)')
+        for kind in config.follow_relations or ():
+            if kind not in RELATION_FIELDS:
+                raise ValueError('unknown relation kind: ' + str(kind))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answers all queries of a single client connection.
+
+        :param reader:  the stream to read queries from
+        :param writer:  the stream to write answers to
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                answer = await self.answer(line.decode())
+                writer.write(answer.encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _watch(self) -> None:
+        """Applies changes of the dpkg database as they happen."""
+        dpkg = DpkgDatabase()
+        admin_dir = Configuration().admin_dir
+        directories = [admin_dir, dpkg.info_dir]
+        watch = watcher(directories,
+                        lambda name: name == 'status' or name.endswith('.list'),
+                        Configuration().poll_interval)
+        try:
+            while True:
+                changes = await watch.changes()
+                async with self._lock:
+                    with Statistics().phase('refresh'):
+                        self._refresh(changes)
+                    self._graphs.clear()
+        finally:
+            watch.close()
+
+    def _why(self, request: dict) -> dict:
+        """Answers a query why a package is installed.
+
+        :param request:     the query
+        :return:            the answer (see why.why())
+        """
+        kinds = tuple(request.get('follow_relations', None) or DEFAULT_KINDS)
+        for kind in kinds:
+            if kind not in RELATION_FIELDS:
+                raise ValueError('unknown relation kind: ' + str(kind))
+        limit = request.get('max_chains', 1)
+        if not isinstance(limit, int) or limit < 1:
+            raise ValueError('max_chains must be a positive number')
+        config = Configuration()
+        config.follow_relations = kinds
+        config.max_depth = request.get('max_depth', None)
+        graph = self._graphs.get(kinds, None)
+        if graph is None:
+            graph = self._graphs[kinds] = build_graph()
+        return why.why(graph, request['why'], request.get('from', None), limit)
+
+    @staticmethod
+    def _refresh(changes) -> None:
+        """Reads the changed parts of the dpkg database again.
+
+        :param changes:     set of (directory, file name) tuples changed or None if everything may have changed
+        """
+        dpkg = DpkgDatabase()
+        if changes is None:
+            dpkg.refresh_list_files()
+            changed = dpkg.refresh_status()
+            print('Changes got lost, refreshed ' + str(len(changed)) + ' packages.')
+            return
+        lists = sorted(name for directory, name in changes if directory == dpkg.info_dir and name.endswith('.list'))
+        for name in lists:
+            dpkg.refresh_list_file(name)
+        changed = set()
+        if (Configuration().admin_dir, 'status') in changes:
+            changed = dpkg.refresh_status()
+        if changed or lists:
+            print('dpkg database changed: ' + str(len(changed)) + ' packages, ' + str(len(lists)) + ' file lists.')
+        sys.stdout.flush()
+
+
+async def run() -> None:
+    """Runs the debinsight daemon."""
+    try:
+        await Server().serve()
+
+    except Exception as e:
+        sys.stderr.write('Error: ' + str(e) + '\n')
+        sys.exit(1)
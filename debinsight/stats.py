@@ -0,0 +1,134 @@
+# ------------------------------------------------------------
+# debinsight/stats.py
+#
+# run time statistics
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module collects run time statistics of debinsight.
+
+The time of each phase is summed over all of its invocations. As
+packages are examined concurrently, the phase times of a run may
+add up to more than its wall time.
+"""
+
+import contextlib
+import json
+import time
+from typing import Optional, TextIO
+
+from .context import lookup
+
+
+class _Singleton(type):
+
+    """Singleton class instance."""
+    _instances = {}
+
+    def __call__(cls, *args, **kwargs):
+        scoped = lookup(cls)
+        if scoped is not None:
+            return scoped
+        if cls not in cls._instances:
+            cls._instances[cls] = super(_Singleton, cls).__call__(*args, **kwargs)
+        return cls._instances[cls]
+
+
+class Statistics(metaclass=_Singleton):
+
+    """The run time statistics."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.subprocesses = 0
+        self.pipe_bytes = 0
+        self.files_stated = 0
+        self.files_hashed = 0
+        self.bytes_hashed = 0
+        self.packages_pruned = 0
+        self.packages_visited = 0
+        self.tool_calls = {}
+        self.tool_calls_shared = 0
+        self.tool_retries = 0
+        self.tool_timeouts = 0
+
+    def as_dict(self) -> dict:
+        """Gets the statistics as dict (e.g. for JSON).
+
+        :return:    the statistics
+        """
+        return {
+            'wall_time': round(time.perf_counter() - self.started, 6),
+            'phases': {name: {'calls': calls, 'time': round(seconds, 6)}
+                       for name, (calls, seconds) in self.phases.items()},
+            'subprocesses': self.subprocesses,
+            'pipe_bytes': self.pipe_bytes,
+            'files_stated': self.files_stated,
+            'files_hashed': self.files_hashed,
+            'bytes_hashed': self.bytes_hashed,
+            'packages_pruned': self.packages_pruned,
+            'packages_visited': self.packages_visited,
+            'tool_calls': dict(self.tool_calls),
+            'tool_calls_shared': self.tool_calls_shared,
+            'tool_retries': self.tool_retries,
+            'tool_timeouts': self.tool_timeouts,
+        }
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Measures the time spent within a phase.
+
+        :param name:    the name of the phase
+        """
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            calls, seconds = self.phases.get(name, (0, 0.0))
+            self.phases[name] = (calls + 1, seconds + time.perf_counter() - t)
+
+    def subprocess(self, pipe_bytes: int, tool: Optional[str] = None) -> None:
+        """Counts a finished subprocess.
+
+        :param pipe_bytes:  number of bytes read from the pipes of the subprocess
+        :param tool:        the name of the tool run by the subprocess
+        """
+        self.subprocesses = self.subprocesses + 1
+        self.pipe_bytes = self.pipe_bytes + pipe_bytes
+        if tool is not None:
+            self.tool_calls[tool] = self.tool_calls.get(tool, 0) + 1
+
+    def write_json(self, f: TextIO) -> None:
+        """Writes the statistics as JSON.
+
+        :param f:   the file to write to
+        """
+        json.dump(self.as_dict(), f, indent=2)
+        f.write('\n')
+
+    def write_table(self, f: TextIO) -> None:
+        """Writes the statistics as human readable summary table.
+
+        :param f:   the file to write to
+        """
+        stats = self.as_dict()
+        f.write('{:<24}{:>10}{:>14}\n'.format('Phase', 'Calls', 'Time [s]'))
+        for name, phase in stats['phases'].items():
+            f.write('{:<24}{:>10}{:>14.3f}\n'.format(name, phase['calls'], phase['time']))
+        f.write('{:<24}{:>24.3f}\n'.format('Wall time [s]', stats['wall_time']))
+        f.write('{:<24}{:>24}\n'.format('Subprocesses', stats['subprocesses']))
+        for tool, calls in stats['tool_calls'].items():
+            f.write('{:<24}{:>24}\n'.format('  ' + tool, calls))
+        f.write('{:<24}{:>24}\n'.format('Tool calls shared', stats['tool_calls_shared']))
+        f.write('{:<24}{:>24}\n'.format('Tool calls retried', stats['tool_retries']))
+        f.write('{:<24}{:>24}\n'.format('Tool calls timed out', stats['tool_timeouts']))
+        f.write('{:<24}{:>24}\n'.format('Bytes read from pipes', stats['pipe_bytes']))
+        f.write('{:<24}{:>24}\n'.format('Files stat\'ed', stats['files_stated']))
+        f.write('{:<24}{:>24}\n'.format('Files hashed', stats['files_hashed']))
+        f.write('{:<24}{:>24}\n'.format('Bytes hashed', stats['bytes_hashed']))
+        f.write('{:<24}{:>24}\n'.format('Packages visited', stats['packages_visited']))
+        f.write('{:<24}{:>24}\n'.format('Packages pruned', stats['packages_pruned']))
@@ -0,0 +1,168 @@
+# ------------------------------------------------------------
+# debinsight/tools.py
+#
+# running the dpkg and apt tools as subprocesses
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module runs the dpkg and apt tools (dpkg-query, apt-cache) as subprocesses.
+
+All tool calls of a collection go through a single ToolRunner, which
+
+* limits the number of subprocesses running at the same time,
+  so a wide frontier does not spawn hundreds of apt-cache processes
+  fighting for the apt locks and the file descriptors,
+* kills calls running longer than a timeout, so a hung tool does
+  not stall the whole run,
+* retries calls failing for transient reasons (timeouts, a lock held
+  by apt or dpkg, no processes or file descriptors left) with an
+  exponential backoff,
+* runs identical calls in flight at the same time only once and
+  hands the result to all callers,
+* reports the stderr of a tool in the error, if it finally fails.
+"""
+
+import asyncio
+import errno
+import os
+import os.path
+import signal
+
+from .stats import Statistics
+
+_TRANSIENT_ERRNOS = frozenset([errno.EAGAIN, errno.EMFILE, errno.ENFILE, errno.ENOMEM])
+"""Errors spawning a subprocess which are worth a retry."""
+
+_TRANSIENT_MESSAGES = ('Could not get lock', 'Unable to lock', 'Resource temporarily unavailable')
+"""Messages of the tools on stderr telling a call is worth a retry."""
+
+
+def _kill(proc: asyncio.subprocess.Process) -> None:
+    """Kills a tool subprocess together with all of its children.
+
+    :param proc:    the subprocess (started in a session of its own)
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class ToolError(RuntimeError):
+
+    """A tool call failed for good."""
+
+    def __init__(self, args: tuple, reason: str, stderr: bytes = b''):
+        """Constructor.
+
+        :param args:    the tool and its arguments
+        :param reason:  why the call failed
+        :param stderr:  what the tool wrote to stderr (if anything)
+        """
+        message = ' '.join(args[:3]) + (' ...' if len(args) > 3 else '') + ': ' + reason
+        text = stderr.decode(errors='replace').strip()
+        if text:
+            message = message + '\n' + text
+        super().__init__(message)
+        self.stderr = stderr
+
+
+class _Transient(Exception):
+
+    """A tool call failed for a transient reason."""
+
+    def __init__(self, reason: str, stderr: bytes = b''):
+        super().__init__(reason)
+        self.stderr = stderr
+
+
+class ToolRunner:
+
+    """Runs tool calls on a bounded pool of subprocesses."""
+
+    def __init__(self, jobs: int, timeout: float = 60.0, retries: int = 2, backoff: float = 0.1):
+        """Constructor.
+
+        :param jobs:        number of subprocesses running at the same time at most
+        :param timeout:     seconds a single call may run at most (0 or None for no limit)
+        :param retries:     number of retries of a call failing for a transient reason
+        :param backoff:     seconds to wait before the first retry, doubled for each further one
+        """
+        self.timeout = timeout or None
+        self.retries = retries
+        self.backoff = backoff
+        self._calls = {}
+        self._slots = asyncio.Semaphore(max(jobs, 1))
+
+    async def run(self, *args: str) -> tuple:
+        """Runs a tool and collects its output.
+
+        If the very same call is already in flight, its result is
+        awaited instead of running the tool once more.
+
+        :param args:    the tool and its arguments
+        :return:        the return code, the stdout and the stderr (as bytes) of the tool
+        """
+        call = self._calls.get(args, None)
+        if call is not None:
+            Statistics().tool_calls_shared = Statistics().tool_calls_shared + 1
+        else:
+            call = asyncio.ensure_future(self._call(args))
+            self._calls[args] = call
+            call.add_done_callback(lambda _: self._calls.pop(args, None))
+        # the call carries on for the other callers, if this one is cancelled
+        return await asyncio.shield(call)
+
+    async def _call(self, args: tuple) -> tuple:
+        """Runs a tool, retrying on transient failures.
+
+        :param args:    the tool and its arguments
+        :return:        the return code, the stdout and the stderr (as bytes) of the tool
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self._spawn(args)
+            except _Transient as e:
+                if attempt >= self.retries:
+                    raise ToolError(args, str(e), e.stderr) from None
+            Statistics().tool_retries = Statistics().tool_retries + 1
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+            attempt = attempt + 1
+
+    async def _spawn(self, args: tuple) -> tuple:
+        """Runs a tool once within a slot of the pool.
+
+        :param args:    the tool and its arguments
+        :return:        the return code, the stdout and the stderr (as bytes) of the tool
+        """
+        async with self._slots:
+            try:
+                # a session of its own, so a timed out call is killed with all of its children
+                proc = await asyncio.create_subprocess_exec(*args,
+                                                            stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.PIPE,
+                                                            start_new_session=True)
+            except OSError as e:
+                if e.errno in _TRANSIENT_ERRNOS:
+                    raise _Transient(e.strerror or str(e))
+                raise ToolError(args, e.strerror or str(e)) from None
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), self.timeout)
+            except asyncio.TimeoutError:
+                _kill(proc)
+                await proc.wait()
+                Statistics().tool_timeouts = Statistics().tool_timeouts + 1
+                raise _Transient('timed out after ' + str(self.timeout) + ' seconds')
+            except asyncio.CancelledError:
+                _kill(proc)
+                # reap the killed child, even if the caller is cancelled once more meanwhile
+                await asyncio.shield(proc.wait())
+                raise
+        Statistics().subprocess(len(stdout) + len(stderr), os.path.basename(args[0]))
+        if proc.returncode != 0 and any(m.encode() in stderr for m in _TRANSIENT_MESSAGES):
+            raise _Transient('failed with exit code ' + str(proc.returncode), stderr)
+        return proc.returncode, stdout, stderr
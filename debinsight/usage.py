@@ -0,0 +1,130 @@
+# ------------------------------------------------------------
+# debinsight/usage.py
+#
+# deduplicated disk usage accounting
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module accounts the disk usage of the files of the collected packages.
+
+Adding up the sizes per package counts a file several times, if it is
+hardlinked or if several packages claim it. Here every file is only
+counted once, identified by its device and inode. Both the apparent
+size (st_size) and the size allocated on disk (st_blocks) are summed.
+
+The files are also summed up per directory. A file hardlinked into
+several directories is only counted in the first directory it has
+been seen in. The sums of the directories are rolled up into their
+parent directories only when asked for, so collecting is a single
+pass over the file lists.
+"""
+
+import json
+from typing import TextIO
+
+from .context import lookup
+from .model import FileList
+
+
+class _Singleton(type):
+
+    """Singleton class instance."""
+    _instances = {}
+
+    def __call__(cls, *args, **kwargs):
+        scoped = lookup(cls)
+        if scoped is not None:
+            return scoped
+        if cls not in cls._instances:
+            cls._instances[cls] = super(_Singleton, cls).__call__(*args, **kwargs)
+        return cls._instances[cls]
+
+
+class Usage(metaclass=_Singleton):
+
+    """The deduplicated disk usage of all collected files."""
+
+    def __init__(self):
+        self.apparent = 0
+        self.disk = 0
+        self.files = 0
+        self.duplicates = 0
+        self.duplicate_bytes = 0
+        self._directories = {}
+        self._seen = set()
+
+    def add(self, files: FileList) -> None:
+        """Accounts the files of a package.
+
+        :param files:   the detailed file list of a package
+        """
+        seen = self._seen
+        directories = self._directories
+        dirs = files.dirs
+        for d, size, device, inode, blocks in zip(files.dir_index, files.sizes, files.devices, files.inodes,
+                                                  files.blocks):
+            key = (device, inode)
+            if key in seen:
+                self.duplicates = self.duplicates + 1
+                self.duplicate_bytes = self.duplicate_bytes + size
+                continue
+            seen.add(key)
+            disk = blocks * 512
+            self.apparent = self.apparent + size
+            self.disk = self.disk + disk
+            self.files = self.files + 1
+            entry = directories.get(dirs[d], None)
+            if entry is None:
+                directories[dirs[d]] = [size, disk, 1]
+            else:
+                entry[0] = entry[0] + size
+                entry[1] = entry[1] + disk
+                entry[2] = entry[2] + 1
+
+    def as_dict(self) -> dict:
+        """Gets the usage as dict (e.g. for JSON).
+
+        :return:    the totals and the usage of each directory
+        """
+        return {
+            'apparent': self.apparent,
+            'disk': self.disk,
+            'files': self.files,
+            'duplicates': self.duplicates,
+            'duplicate_bytes': self.duplicate_bytes,
+            'directories': {path: {'apparent': apparent, 'disk': disk, 'files': files}
+                            for path, (apparent, disk, files) in self.directories().items()},
+        }
+
+    def directories(self) -> dict:
+        """Rolls the usage of the directories up into their parent directories.
+
+        :return:    dict of directory path to a tuple of apparent size, disk size and number
+                    of files of the directory and all of its subdirectories, sorted by path
+        """
+        tree = {}
+        for directory, (apparent, disk, files) in self._directories.items():
+            path = directory.rstrip('/') or '/'
+            while True:
+                entry = tree.get(path, None)
+                if entry is None:
+                    tree[path] = [apparent, disk, files]
+                else:
+                    entry[0] = entry[0] + apparent
+                    entry[1] = entry[1] + disk
+                    entry[2] = entry[2] + files
+                if path == '/' or '/' not in path:
+                    break
+                path = path[:path.rfind('/')] or '/'
+        return {path: tuple(tree[path]) for path in sorted(tree)}
+
+    def write_json(self, f: TextIO) -> None:
+        """Writes the usage as JSON.
+
+        :param f:   the file to write to
+        """
+        json.dump(self.as_dict(), f, indent=2)
+        f.write('\n')
@@ -0,0 +1,177 @@
+# ------------------------------------------------------------
+# debinsight/verify.py
+#
+# verifying installed files against their md5sums
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module verifies the files installed by packages (--verify).
+
+dpkg keeps the MD5 sums of the files of a package in the '<pkg>.md5sums'
+file of the dpkg info directory. Each listed file is hashed and compared
+to its sum, which tells the files modified or missing since the package
+was installed (like 'dpkg --verify' does, conffiles aside).
+
+Hashing is I/O and hashlib releases the GIL on big buffers, so the files
+are hashed in batches of about BATCH_SIZE files on the default thread pool
+executor of the event loop. Big files are mapped into memory and hashed
+in one go, small files are read with a single buffered read.
+
+The digests found are remembered together with the inode, mtime and size
+of each file. Verifying again only hashes the files which changed since.
+"""
+
+import asyncio
+import hashlib
+import mmap
+import os
+import stat
+from typing import Optional
+
+from .filestat import in_root
+from .stats import Statistics
+
+BATCH_SIZE = 64
+"""Approximate number of files hashed by a single job of the thread pool."""
+
+MMAP_SIZE = 1 << 20
+"""Files of at least this size are mapped into memory instead of read."""
+
+_KNOWN_WEIGHT = 16
+"""How many files with a known digest weigh as much as a single file to hash."""
+
+
+def parse_md5sums(text: str) -> dict:
+    """Parses the content of a dpkg .md5sums file.
+
+    Each line holds the hex digest and the path (relative to /) separated by two spaces.
+
+    :param text:    the content of the file
+    :return:        dict of absolute path to hex digest
+    """
+    sums = {}
+    for line in text.splitlines():
+        digest, _, path = line.partition(' ')
+        path = path.lstrip(' *')
+        if digest and path:
+            sums['/' + path.lstrip('/')] = digest.lower()
+    return sums
+
+
+def _md5(path: str, size: int) -> Optional[str]:
+    """Hashes a single file.
+
+    :param path:    path to the file
+    :param size:    size of the file
+    :return:        the hex digest or None if the file cannot be read
+    """
+    try:
+        with open(path, 'rb') as f:
+            if size >= MMAP_SIZE:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    return hashlib.md5(m).hexdigest()
+            return hashlib.md5(f.read()).hexdigest()
+    except (OSError, ValueError):
+        return None
+
+
+def _hash_batch(paths: list, root: Optional[str], known: dict) -> list:
+    """Hashes a batch of files, reusing the known digests of unchanged files.
+
+    :param paths:   list of absolute paths
+    :param root:    the root directory the paths are in (None for the running system)
+    :param known:   dict of path to tuple of inode, mtime (in ns), size and hex digest
+    :return:        list of tuples of path, inode, mtime, size and hex digest (inode None for missing files)
+    """
+    found = []
+    directories = {}
+    for path in paths:
+        try:
+            location = in_root(path, root, directories)
+            st = os.lstat(location)
+        except OSError:
+            found.append((path, None, None, None, None))
+            continue
+        if not stat.S_ISREG(st.st_mode):
+            found.append((path, st.st_ino, st.st_mtime_ns, st.st_size, ''))
+            continue
+        entry = known.get(path, None)
+        if entry is not None and entry[3] is not None and entry[:3] == (st.st_ino, st.st_mtime_ns, st.st_size):
+            found.append((path,) + entry)
+            continue
+        found.append((path, st.st_ino, st.st_mtime_ns, st.st_size, _md5(location, st.st_size)))
+    return found
+
+
+def _batches(sums: dict, known: dict) -> list:
+    """Groups paths into batches of about BATCH_SIZE files to hash.
+
+    Files with a known digest count much less, as they most likely are only stat'ed.
+
+    :param sums:    dict of path to hex digest
+    :param known:   dict of path to tuple of inode, mtime (in ns), size and hex digest
+    :return:        list of lists of paths
+    """
+    batches = []
+    batch = []
+    weight = 0
+    for path in sums:
+        batch.append(path)
+        weight = weight + (1 if path in known else _KNOWN_WEIGHT)
+        if weight >= BATCH_SIZE * _KNOWN_WEIGHT:
+            batches.append(batch)
+            batch = []
+            weight = 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+async def hash_files(sums: dict, root: Optional[str] = None, known: Optional[dict] = None) -> dict:
+    """Hashes the files listed in an md5sums file.
+
+    :param sums:    dict of path to hex digest (see parse_md5sums())
+    :param root:    the root directory the paths are in (None for the running system)
+    :param known:   dict of path to tuple of inode, mtime (in ns), size and hex digest of an earlier run
+    :return:        dict of path to tuple of inode, mtime (in ns), size and hex digest
+                    ('' if not a regular file, None if unreadable) of all files present
+    """
+    known = known or {}
+    statistics = Statistics()
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[loop.run_in_executor(None, _hash_batch, batch, root, known)
+                                     for batch in _batches(sums, known)])
+    hashed = {}
+    for result in results:
+        for path, ino, mtime, size, digest in result:
+            if ino is None:
+                continue
+            hashed[path] = entry = (ino, mtime, size, digest)
+            if digest and known.get(path, None) != entry:
+                statistics.files_hashed = statistics.files_hashed + 1
+                statistics.bytes_hashed = statistics.bytes_hashed + size
+    return hashed
+
+
+def compare(sums: dict, hashed: dict) -> dict:
+    """Compares the files hashed with their packaged sums.
+
+    :param sums:    dict of path to hex digest (see parse_md5sums())
+    :param hashed:  dict of path to tuple of inode, mtime (in ns), size and hex digest (see hash_files())
+    :return:        dict like {'checked': ..., 'modified': [...], 'missing': [...], 'unreadable': [...]}
+    """
+    modified = []
+    missing = []
+    unreadable = []
+    for path, digest in sums.items():
+        entry = hashed.get(path, None)
+        if entry is None:
+            missing.append(path)
+        elif entry[3] is None:
+            unreadable.append(path)
+        elif entry[3] != digest:
+            modified.append(path)
+    return {'checked': len(sums), 'modified': modified, 'missing': missing, 'unreadable': unreadable}
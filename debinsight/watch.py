@@ -0,0 +1,197 @@
+# ------------------------------------------------------------
+# debinsight/watch.py
+#
+# watching directories for changed files
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module watches directories for files being written, created, moved or removed.
+
+On Linux the kernel tells us via inotify (used through ctypes, so no
+extra dependency is needed). Elsewhere, or if inotify is not usable,
+the directories are polled.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import os.path
+import struct
+from typing import Callable, Optional
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_IN_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+_EVENT = struct.Struct('iIII')
+"""Header of an inotify event: watch descriptor, mask, cookie and length of the name."""
+
+
+class InotifyWatcher:
+
+    """Watches directories with inotify."""
+
+    def __init__(self, directories: list, accept: Callable[[str], bool]):
+        """Constructor.
+
+        :param directories:     the directories to watch
+        :param accept:          callable getting a file name and returning True if changes to it matter
+        :raises OSError:        if inotify is not available
+        """
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError('libc not found')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify not supported')
+        self._accept = accept
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._directories = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), _IN_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(errno, 'inotify_add_watch failed', directory)
+            self._directories[wd] = directory
+
+    async def changes(self, settle: float = 0.2) -> Optional[set]:
+        """Waits for changes.
+
+        dpkg changes many files in a row, so once something changed we
+        wait a little while for the rest before reporting.
+
+        :param settle:  seconds to wait for further changes after the first one
+        :return:        set of (directory, file name) tuples changed or None if changes got lost
+        """
+        changed = set()
+        while not changed:
+            await self._readable()
+            await asyncio.sleep(settle)
+            overflow, events = self._read()
+            if overflow:
+                return None
+            changed = set(event for event in events if self._accept(event[1]))
+        return changed
+
+    def close(self) -> None:
+        """Stops watching."""
+        os.close(self._fd)
+
+    def _read(self) -> tuple:
+        """Reads all pending events.
+
+        :return:    tuple of an overflow flag and a list of (directory, file name) tuples
+        """
+        events = []
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+                offset = offset + _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                elif wd in self._directories and name:
+                    events.append((self._directories[wd], os.fsdecode(name)))
+        return overflow, events
+
+    async def _readable(self) -> None:
+        """Waits until the inotify file descriptor has events."""
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(self._fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(self._fd)
+
+
+class PollingWatcher:
+
+    """Watches directories by polling the signatures (mtime and size) of their files."""
+
+    def __init__(self, directories: list, accept: Callable[[str], bool], interval: float = 2.0):
+        """Constructor.
+
+        :param directories:     the directories to watch
+        :param accept:          callable getting a file name and returning True if changes to it matter
+        :param interval:        seconds between two polls
+        """
+        self._accept = accept
+        self._directories = directories
+        self._interval = interval
+        self._signatures = self._scan()
+
+    async def changes(self, settle: float = 0.2) -> Optional[set]:
+        """Waits for changes.
+
+        :param settle:  not used, polling settles by itself
+        :return:        set of (directory, file name) tuples changed
+        """
+        while True:
+            await asyncio.sleep(self._interval)
+            signatures = self._scan()
+            changed = set(key for key in signatures.keys() | self._signatures.keys()
+                          if signatures.get(key, None) != self._signatures.get(key, None))
+            self._signatures = signatures
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        """Stops watching."""
+        self._signatures = {}
+
+    def _scan(self) -> dict:
+        """Scans the signatures of all files of interest.
+
+        :return:    dict of (directory, file name) to (mtime in ns, size)
+        """
+        signatures = {}
+        for directory in self._directories:
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if not self._accept(entry.name):
+                        continue
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    signatures[(directory, entry.name)] = (st.st_mtime_ns, st.st_size)
+        return signatures
+
+
+def watcher(directories: list, accept: Callable[[str], bool], interval: float = 2.0):
+    """Creates a watcher for some directories, using inotify if possible and polling otherwise.
+
+    :param directories:     the directories to watch
+    :param accept:          callable getting a file name and returning True if changes to it matter
+    :param interval:        seconds between two polls, if polling
+    :return:                an InotifyWatcher or PollingWatcher
+    """
+    try:
+        return InotifyWatcher(directories, accept)
+    except (OSError, AttributeError):
+        return PollingWatcher(directories, accept, interval)
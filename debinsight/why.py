@@ -0,0 +1,114 @@
+# ------------------------------------------------------------
+# debinsight/why.py
+#
+# why is a package installed
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""This module tells why a package is installed ('debinsight why').
+
+The answer are the shortest chains of relations leading to the
+package: either from the packages installed on purpose (the roots,
+see debinsight.graph) or from a given package (--from). The dependency
+graph of all installed packages is built once from the dpkg database,
+then a query only walks the neighbourhood of the packages asked for.
+"""
+
+import json
+import sys
+from typing import Optional, TextIO
+
+from .configuration import Configuration
+from .graph import Graph, build_graph
+from .render import silence
+from .stats import Statistics
+from . import color
+
+
+def why(graph: Graph, pkg: str, source: Optional[str] = None, limit: int = 1) -> dict:
+    """Finds the shortest chains of relations leading to a package.
+
+    The chains are at most --max-depth relations long.
+
+    :param graph:   the dependency graph
+    :param pkg:     the name of the package
+    :param source:  the name of the package the chains start at (None for the roots of the graph)
+    :param limit:   the number of chains found at most
+    :return:        the answer as dict (e.g. for JSON)
+    """
+    target = graph.id(pkg)
+    start = graph.id(source) if source is not None else None
+    with Statistics().phase('why'):
+        chains = graph.chains(target, start, limit, Configuration().max_depth)
+    answer = {
+        'package': graph.names[target],
+        'from': graph.names[start] if start is not None else None,
+        'reason': graph.reason(target),
+        'chains': [],
+    }
+    for chain in chains:
+        answer['chains'].append({
+            'packages': [graph.names[u] for u in chain],
+            'relations': [graph.relation(u, v) for u, v in zip(chain, chain[1:])],
+            'reason': graph.reason(chain[0]) if start is None else None,
+        })
+    return answer
+
+
+def _write_text(out: TextIO, answer: dict) -> None:
+    """Writes an answer as text.
+
+    :param out:     the stream to write to
+    :param answer:  the answer (see why())
+    """
+    pkg = color.package(answer['package'])
+    if answer['from'] is not None:
+        origin = color.package(answer['from'])
+        if not answer['chains']:
+            out.write(pkg + ' is not required by ' + origin + '.\n')
+            return
+        out.write(pkg + ' is required by ' + origin + ':\n')
+    else:
+        if answer['reason'] is not None:
+            out.write(pkg + ' is installed on its own: ' + answer['reason'] + '.\n')
+        if not answer['chains']:
+            out.write(pkg + ' is not required by any package installed on purpose.\n')
+            return
+        if answer['reason'] is not None and len(answer['chains']) == 1:
+            return
+        out.write(pkg + ' is installed because of:\n')
+    for chain in answer['chains']:
+        line = color.package(chain['packages'][0])
+        if chain['reason'] is not None:
+            line = line + ' [' + color.installed(chain['reason']) + ']'
+        for relation, name in zip(chain['relations'], chain['packages'][1:]):
+            line = line + ' -' + color.dependency(relation) + '-> ' + color.package(name)
+        out.write('\t' + line + '\n')
+
+
+def run(pkg: str, source: Optional[str], limit: int) -> None:
+    """Tells why a package is installed.
+
+    :param pkg:     the name of the package
+    :param source:  the name of the package the chains start at (None for the roots of the graph)
+    :param limit:   the number of chains found at most
+    """
+    try:
+        answer = why(build_graph(), pkg, source, limit)
+        _write_text(sys.stdout, answer)
+        if Configuration().json:
+            with open(Configuration().json, 'wt') as f:
+                json.dump(answer, f)
+                f.write('\n')
+        sys.stdout.flush()
+
+    except BrokenPipeError:
+        silence(sys.stdout)
+        sys.exit(1)
+
+    except Exception as e:
+        sys.stderr.write('Error: ' + str(e) + '\n')
+        sys.exit(1)
@@ -0,0 +1,11 @@
+# ------------------------------------------------------------
+# tests/__init__.py
+#
+# debinsight tests
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""The tests of debinsight (python3 -m unittest or pytest)."""
@@ -0,0 +1,93 @@
+# ------------------------------------------------------------
+# tests/support.py
+#
+# helpers of the debinsight tests
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+"""Helpers writing small dpkg databases and root images and binding fresh singletons for a test."""
+
+import os
+import os.path
+
+from debinsight.configuration import Configuration
+from debinsight.context import create, scope
+from debinsight.database import Database
+from debinsight.dpkg import DpkgDatabase
+from debinsight.stats import Statistics
+from debinsight.usage import Usage
+
+
+def write_dpkg_database(admin_dir: str, packages: dict) -> None:
+    """Writes a dpkg database (status file and .list files).
+
+    :param admin_dir:   the dpkg database directory (created if needed)
+    :param packages:    dict of package name (optionally 'name:arch') to dict of
+                        extra status fields (e.g. {'Depends': 'libc6'}) and its files ('files': [...])
+                        ('Status' replaces 'install ok installed')
+    """
+    os.makedirs(os.path.join(admin_dir, 'info'), exist_ok=True)
+    os.makedirs(os.path.join(admin_dir, 'updates'), exist_ok=True)
+    with open(os.path.join(admin_dir, 'status'), 'wt') as status:
+        for key, fields in packages.items():
+            name, _, arch = key.partition(':')
+            fields = dict(fields)
+            files = fields.pop('files', [])
+            status.write('Package: ' + name + '\n')
+            status.write('Status: ' + fields.pop('Status', 'install ok installed') + '\n')
+            status.write('Priority: optional\nSection: misc\nInstalled-Size: 4\n')
+            status.write('Maintainer: Test <test@example.com>\n')
+            status.write('Architecture: ' + (arch or fields.pop('Architecture', 'amd64')) + '\n')
+            if arch:
+                status.write('Multi-Arch: same\n')
+            status.write('Version: 1.0-1\n')
+            for field, value in fields.items():
+                status.write(field + ': ' + value + '\n')
+            status.write('Description: test package\n test\n\n')
+            with open(os.path.join(admin_dir, 'info', key + '.list'), 'wt') as f:
+                f.write(''.join(path + '\n' for path in ['/.'] + files))
+
+
+def write_linked_image(directory: str) -> tuple:
+    """Writes a root image whose /lib is an absolute symlink, next to a host directory of the same path.
+
+    The image holds <host>/libfoo.so (3 bytes) and <host>/libimage.so (5 bytes),
+    the host directory <host>/libfoo.so (10 bytes) and <host>/libhost.so (7 bytes).
+    /lib of the image links to <host>, so it must end up at the files of the image.
+
+    :param directory:   the directory to write the image and the host directory to
+    :return:            tuple of the root of the image and the host directory
+    """
+    root = os.path.join(directory, 'image')
+    host = os.path.join(directory, 'host')
+    for base, files in ((root + host, {'libfoo.so': 3, 'libimage.so': 5}), (host, {'libfoo.so': 10, 'libhost.so': 7})):
+        os.makedirs(base)
+        for name, size in files.items():
+            with open(os.path.join(base, name), 'wb') as f:
+                f.write(b'x' * size)
+    os.symlink(host, os.path.join(root, 'lib'))
+    os.symlink('lib', os.path.join(root, 'lib64'))
+    os.symlink('libfoo.so', os.path.join(root + host, 'libfoo.so.1'))
+    return root, host
+
+
+def fresh_singletons(**settings) -> scope:
+    """Binds fresh instances of all singletons for the current context.
+
+    :param settings:    attributes of the configuration
+    :return:            the scope (a context manager)
+    """
+    config = create(Configuration)
+    config.no_color = True
+    for key, value in settings.items():
+        setattr(config, key, value)
+    return scope({
+        Configuration: config,
+        Database: create(Database),
+        DpkgDatabase: create(DpkgDatabase),
+        Statistics: create(Statistics),
+        Usage: create(Usage),
+    })
@@ -0,0 +1,73 @@
+# ------------------------------------------------------------
+# tests/test_admindir.py
+#
+# tests of inspecting the dpkg database given with --admindir
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import asyncio
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from debinsight import debinsight
+from debinsight.database import Database
+
+from .support import fresh_singletons, write_dpkg_database
+
+
+def _collect(**settings) -> Database:
+    """Collects packages with a fresh configuration and database.
+
+    :param settings:    attributes of the configuration
+    :return:            the database of collected packages
+    """
+    async def collect() -> Database:
+        with fresh_singletons(**settings), debinsight.reporting(None):
+            await debinsight.collect()
+            return Database()
+    return asyncio.run(collect())
+
+
+class AdminDirTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.admin_dir = os.path.join(self.directory.name, 'dpkg')
+        self.file = os.path.join(self.directory.name, 'only-in-admindir.txt')
+        with open(self.file, 'wt') as f:
+            f.write('installed\n')
+        write_dpkg_database(self.admin_dir, {'only-in-admindir': {'files': [self.file]}})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unreadable_admindir_is_an_error(self):
+        missing = os.path.join(self.directory.name, 'missing')
+        with self.assertRaises(RuntimeError) as raised:
+            _collect(admin_dir=missing, targets=('bash',), no_files=True, no_rdepend=True)
+        self.assertIn(os.path.join(missing, 'status'), str(raised.exception))
+
+    @unittest.skipIf(shutil.which('dpkg-query') is None, 'dpkg-query not found')
+    def test_dpkg_query_reads_admindir(self):
+        database = _collect(admin_dir=self.admin_dir, native=False, targets=('only-in-admindir',),
+                            no_files=True, no_rdepend=True)
+        self.assertIn('only-in-admindir', database.packages)
+        self.assertEqual(database.packages['only-in-admindir'].fields['version'], '1.0-1')
+
+    @unittest.skipIf(shutil.which('dpkg-query') is None, 'dpkg-query not found')
+    def test_files_are_listed_from_admindir(self):
+        for native in (True, False):
+            with self.subTest(native=native):
+                database = _collect(admin_dir=self.admin_dir, native=native, targets=('only-in-admindir',),
+                                    no_rdepend=True)
+                files = database.packages['only-in-admindir'].files
+                self.assertEqual(dict(files.items()), {self.file: len('installed\n')})
+
+
+if __name__ == '__main__':
+    unittest.main()
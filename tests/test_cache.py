@@ -0,0 +1,81 @@
+# ------------------------------------------------------------
+# tests/test_cache.py
+#
+# tests of the persistent cache
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import os.path
+import pickle
+import sys
+import tempfile
+import unittest
+
+from debinsight.cache import Cache
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.pickle')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_entries_survive_a_save(self):
+        cache = Cache(self.path)
+        cache.put('status', (1, 2), {'bash': {}})
+        cache.save()
+        self.assertEqual(Cache(self.path).get('status', (1, 2)), {'bash': {}})
+        self.assertIsNone(Cache(self.path).get('status', (1, 3)))
+
+    def _write_stale_cache(self, change) -> None:
+        """Writes a cache holding an instance of a class, then changes the module of the class.
+
+        :param change:  callable getting the path of the module file
+        """
+        module = os.path.join(self.directory.name, 'stale_module.py')
+        with open(module, 'wt') as f:
+            f.write('class Entry:\n    pass\n')
+        sys.path.insert(0, self.directory.name)
+        try:
+            import stale_module
+            cache = Cache(self.path)
+            cache.put('status', (1, 2), stale_module.Entry())
+            cache.save()
+        finally:
+            sys.path.remove(self.directory.name)
+            sys.modules.pop('stale_module', None)
+        change(module)
+
+    def test_stale_pickle_is_discarded(self):
+        def rename_class(module: str) -> None:
+            with open(module, 'wt') as f:
+                f.write('class RenamedEntry:\n    pass\n')
+
+        for change in (rename_class, os.remove):
+            with self.subTest(change=change.__name__):
+                self._write_stale_cache(change)
+                sys.path.insert(0, self.directory.name)
+                try:
+                    cache = Cache(self.path)
+                finally:
+                    sys.path.remove(self.directory.name)
+                    sys.modules.pop('stale_module', None)
+                self.assertIsNone(cache.get('status', (1, 2)))
+                cache.put('status', (1, 2), 'fresh')
+                cache.save()
+                self.assertEqual(Cache(self.path).get('status', (1, 2)), 'fresh')
+
+    def test_broken_cache_is_discarded(self):
+        with open(self.path, 'wb') as f:
+            f.write(pickle.dumps((1, {}))[:5])
+        self.assertIsNone(Cache(self.path).get('status', (1, 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# ------------------------------------------------------------
+# tests/test_deb822.py
+#
+# tests of parsing deb822 stanzas and package relations
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import io
+import unittest
+
+from debinsight.deb822 import iter_stanzas, parse_relations, relation_names
+
+
+class ParseRelationsTest(unittest.TestCase):
+
+    def test_alternatives_and_versions(self):
+        self.assertEqual(parse_relations('libc6 (>= 2.28), default-mta | mail-transport-agent'), [
+            [('libc6', None, '>= 2.28')],
+            [('default-mta', None, None), ('mail-transport-agent', None, None)],
+        ])
+
+    def test_architecture_qualifiers(self):
+        self.assertEqual(parse_relations('python3:any, libfoo:i386 (= 1.0), perl:native'), [
+            [('python3', 'any', None)],
+            [('libfoo', 'i386', '= 1.0')],
+            [('perl', 'native', None)],
+        ])
+
+    def test_restrictions_are_ignored(self):
+        self.assertEqual(parse_relations('foo [amd64 i386] <!nocheck> <cross>, bar (>= 1) [!armhf]'), [
+            [('foo', None, None)],
+            [('bar', None, '>= 1')],
+        ])
+
+    def test_spaces_around_version_constraints(self):
+        self.assertEqual(parse_relations('a(>=1),b (<<2:1.0-1~), c( = 3 ), d (1.0)'), [
+            [('a', None, '>= 1')],
+            [('b', None, '<< 2:1.0-1~')],
+            [('c', None, '= 3')],
+            [('d', None, '1.0')],
+        ])
+
+    def test_empty_and_unparsable(self):
+        self.assertEqual(parse_relations(''), [])
+        self.assertEqual(parse_relations(' , a ,, '), [[('a', None, None)]])
+        self.assertEqual(parse_relations('a | | b'), [[('a', None, None), ('b', None, None)]])
+        self.assertEqual(parse_relations('a (>= 1, b'), [[('b', None, None)]])
+
+    def test_relation_names(self):
+        self.assertEqual(list(relation_names('a | b:any (>= 1), c [amd64]')), ['a', 'b', 'c'])
+
+
+class IterStanzasTest(unittest.TestCase):
+
+    def test_continuation_lines(self):
+        text = ('Package: a\n'
+                'Description: short\n'
+                ' long line\n'
+                '\tsecond\n'
+                ' .\n'
+                'Depends: x\n'
+                '\n'
+                '\n'
+                'package: b\n'
+                'Conffiles:\n'
+                ' /etc/b 0123\n'
+                ' /etc/b.d/c 4567')
+        self.assertEqual(list(iter_stanzas(io.StringIO(text))), [
+            {'package': 'a', 'description': 'short\nlong line\nsecond\n.', 'depends': 'x'},
+            {'package': 'b', 'conffiles': '\n/etc/b 0123\n/etc/b.d/c 4567'},
+        ])
+
+    def test_values_with_colons(self):
+        stanza = next(iter_stanzas(['Version: 1:2.0-1\n', 'Homepage:  https://example.com/  \n']))
+        self.assertEqual(stanza, {'version': '1:2.0-1', 'homepage': 'https://example.com/'})
+
+    def test_no_stanzas(self):
+        self.assertEqual(list(iter_stanzas(['\n', '\n'])), [])
+        self.assertEqual(list(iter_stanzas([' orphaned continuation\n'])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# ------------------------------------------------------------
+# tests/test_diff.py
+#
+# tests of comparing two dumps of collected package data
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import io
+import json
+import os
+import os.path
+import tempfile
+import unittest
+
+from debinsight import diff
+
+from .support import fresh_singletons
+
+_OLD = {
+    'bash': {'package': 'bash', 'version': '5.0-4', 'installed': 10, 'files': {'/bin/bash': 10}},
+    'zsh': {'package': 'zsh', 'version': '5.7-1', 'installed': 20},
+}
+
+_NEW = {
+    'bash': {'package': 'bash', 'version': '5.0-5', 'installed': 12, 'files': {'/bin/bash': 12}},
+    'dash': {'package': 'dash', 'version': '0.5-1', 'installed': 5},
+}
+
+
+class DiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name: str, text: str) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wt') as f:
+            f.write(text)
+        return path
+
+    def _diff(self, old_path: str, new_path: str) -> dict:
+        with fresh_singletons():
+            return diff.diff(old_path, new_path, io.StringIO())
+
+    def _assert_changes(self, summary: dict) -> None:
+        self.assertEqual((summary['added'], summary['removed'], summary['upgraded']), (1, 1, 1))
+        self.assertEqual(summary['installed'], [30, 17])
+
+    def test_json_and_ndjson_dumps(self):
+        old_path = self._write('old.json', json.dumps(_OLD))
+        new_path = self._write('new.ndjson', ''.join(json.dumps(record) + '\n' for record in _NEW.values()))
+        self._assert_changes(self._diff(old_path, new_path))
+
+    def test_dumps_laid_out_differently(self):
+        old_path = self._write('old.json', json.dumps(_OLD, indent=4))
+        new_path = self._write('new.ndjson', ''.join('{ "version" : ' + json.dumps(r['version']) + ', '
+                                                     + json.dumps(r)[1:] + '\n' for r in _NEW.values()))
+        self._assert_changes(self._diff(old_path, new_path))
+
+    def test_big_record(self):
+        files = {'/usr/share/big/' + str(i): i for i in range(200000)}
+        old = dict(_OLD, big={'package': 'big', 'version': '1', 'files': files})
+        new = dict(_OLD, big={'package': 'big', 'version': '2', 'files': files})
+        summary = self._diff(self._write('old.json', json.dumps(old)), self._write('new.json', json.dumps(new)))
+        self.assertEqual((summary['upgraded'], summary['unchanged']), (1, 2))
+
+    def test_truncated_dumps(self):
+        new_path = self._write('new.json', json.dumps(_NEW))
+        text = json.dumps(_OLD)
+        for cut in (1, len(text) // 2, len(text) - 1):
+            with self.subTest(cut=cut):
+                old_path = self._write('old.json', text[:cut])
+                with self.assertRaises(ValueError):
+                    self._diff(old_path, new_path)
+        lines = ''.join(json.dumps(record) + '\n' for record in _OLD.values())
+        old_path = self._write('old.ndjson', lines[:-10])
+        with self.assertRaises(ValueError):
+            self._diff(old_path, new_path)
+
+    def test_malformed_dump_is_not_read_to_the_end(self):
+        records = {'pkg' + str(i): {'package': 'pkg' + str(i), 'version': '1'} for i in range(100000)}
+        text = json.dumps(records)
+        path = self._write('malformed.json', text[:100] + 'nonsense' + text[100:])
+        with open(path, 'rb') as f:
+            with self.assertRaises(ValueError):
+                list(diff._json_records(f))
+            self.assertLess(f.tell(), os.path.getsize(path))
+
+    def test_not_a_dump(self):
+        for text in ('[1, 2, 3]', '{"bash": 1}', 'nonsense'):
+            with self.subTest(text=text):
+                path = self._write('not.json', text)
+                with self.assertRaises(ValueError):
+                    self._diff(path, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
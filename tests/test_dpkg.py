@@ -0,0 +1,81 @@
+# ------------------------------------------------------------
+# tests/test_dpkg.py
+#
+# tests of reading the dpkg database directly
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import asyncio
+import os
+import os.path
+import tempfile
+import unittest
+
+from debinsight import debinsight
+from debinsight.database import Database
+from debinsight.dpkg import DpkgDatabase
+
+from .support import fresh_singletons, write_dpkg_database
+
+
+class MultiArchFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.admin_dir = os.path.join(self.directory.name, 'dpkg')
+        self.files = {}
+        for arch, size in (('amd64', 3), ('armhf', 5)):
+            path = os.path.join(self.directory.name, 'libx-' + arch + '.so')
+            with open(path, 'wb') as f:
+                f.write(b'x' * size)
+            self.files[arch] = path
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, arches: tuple) -> None:
+        """Writes the database with libx installed for some architectures, in this order in the status file."""
+        write_dpkg_database(self.admin_dir, {'libx:' + arch: {'files': [self.files[arch]]} for arch in arches})
+        for arch in arches:
+            with open(os.path.join(self.admin_dir, 'info', 'libx:' + arch + '.md5sums'), 'wt') as f:
+                f.write('0' * 32 + '  ' + self.files[arch].lstrip('/') + '\n')
+
+    def test_bare_name_follows_the_first_stanza(self):
+        for arches in (('amd64', 'armhf'), ('armhf', 'amd64')):
+            with self.subTest(first=arches[0]), fresh_singletons(admin_dir=self.admin_dir):
+                self._write(arches)
+                dpkg = DpkgDatabase()
+                self.assertEqual(dpkg.list_files('libx'), ['/.', self.files[arches[0]]])
+                self.assertIn(self.files[arches[0]].lstrip('/'), dpkg.md5sums('libx'))
+                for arch in arches:
+                    self.assertEqual(dpkg.list_files('libx:' + arch), ['/.', self.files[arch]])
+                self.assertIsNone(dpkg.list_files('libx:i386'))
+
+    def test_vanished_list_file(self):
+        self._write(('amd64', 'armhf'))
+        with fresh_singletons(admin_dir=self.admin_dir):
+            dpkg = DpkgDatabase()
+            self.assertIsNotNone(dpkg.list_files('libx'))
+            os.remove(os.path.join(self.admin_dir, 'info', 'libx:amd64.list'))
+            dpkg.refresh_list_file('libx:amd64.list')
+            self.assertIsNone(dpkg.list_files('libx'))
+            self.assertEqual(dpkg.list_files('libx:armhf'), ['/.', self.files['armhf']])
+
+    def test_all_packages_are_collected_with_their_own_files(self):
+        self._write(('amd64', 'armhf'))
+
+        async def collect() -> Database:
+            with fresh_singletons(admin_dir=self.admin_dir, all=True, targets=(), no_rdepend=True), debinsight.reporting(None):
+                await debinsight.collect()
+                return Database()
+
+        packages = asyncio.run(collect()).packages
+        self.assertEqual({pkg: dict(p.files.items()) for pkg, p in packages.items()},
+                         {'libx': {self.files['amd64']: 3}, 'libx:armhf': {self.files['armhf']: 5}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# ------------------------------------------------------------
+# tests/test_filestat.py
+#
+# tests of stat'ing installed files
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import asyncio
+import os
+import os.path
+import tempfile
+import unittest
+
+from debinsight.filestat import in_root, stat_files
+
+from .support import write_linked_image
+
+
+class InRootTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root, self.host = write_linked_image(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_absolute_symlinks_stay_in_the_root(self):
+        sizes = {path: st.st_size for path, st in asyncio.run(stat_files(
+            ['/lib/libfoo.so', '/lib/libimage.so', '/lib/libhost.so', '/lib64/libfoo.so', '/lib/libfoo.so.1'],
+            self.root)).items()}
+        # the host files are never seen, the final symlink is not followed
+        self.assertEqual(sizes, {'/lib/libfoo.so': 3, '/lib/libimage.so': 5, '/lib64/libfoo.so': 3})
+
+    def test_parent_directory_does_not_leave_the_root(self):
+        self.assertEqual(in_root('/../../lib/libfoo.so', self.root), self.root + self.host + '/libfoo.so')
+        self.assertEqual(in_root('/usr/../lib/libfoo.so', self.root), self.root + self.host + '/libfoo.so')
+
+    def test_symlink_loop(self):
+        os.symlink('loop', os.path.join(self.root, 'loop'))
+        with self.assertRaises(OSError):
+            in_root('/loop/libfoo.so', self.root)
+        self.assertEqual(asyncio.run(stat_files(['/loop/libfoo.so'], self.root)), {})
+
+    def test_running_system(self):
+        self.assertEqual(in_root('/lib/libfoo.so', None), '/lib/libfoo.so')
+
+
+if __name__ == '__main__':
+    unittest.main()
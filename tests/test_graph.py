@@ -0,0 +1,69 @@
+# ------------------------------------------------------------
+# tests/test_graph.py
+#
+# tests of the dependency graph of all installed packages
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import asyncio
+import os.path
+import tempfile
+import unittest
+
+from debinsight.graph import build_graph
+from debinsight.impact import impact
+from debinsight.why import why
+
+from .support import fresh_singletons, write_dpkg_database
+
+_PACKAGES = {
+    'libgcc-s1': {},
+    'libgcc-s1:i386': {},
+    'libc6': {'Depends': 'libgcc-s1'},
+    'libc6:i386': {'Depends': 'libgcc-s1'},
+    'hello': {'Depends': 'libc6 (>= 2.28)'},
+    'wine': {'Depends': 'wine32:i386'},
+    'wine32:i386': {'Depends': 'libc6 (>= 2.28)'},
+}
+
+
+class MultiArchGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.admin_dir = os.path.join(self.directory.name, 'dpkg')
+        write_dpkg_database(self.admin_dir, _PACKAGES)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_foreign_architecture_packages_are_in_the_graph(self):
+        with fresh_singletons(admin_dir=self.admin_dir):
+            graph = build_graph()
+        self.assertEqual(len(graph), len(_PACKAGES))
+        self.assertIn('libc6:i386', graph)
+        self.assertEqual(graph.id('libc6:amd64'), graph.id('libc6'))
+        self.assertNotEqual(graph.id('libc6:i386'), graph.id('libc6'))
+        # a relation without qualifier leads to the package of the same architecture
+        self.assertEqual([graph.names[v] for v in graph.depends[graph.id('wine32')]], ['libc6:i386'])
+        self.assertEqual([graph.names[v] for v in graph.depends[graph.id('libc6:i386')]], ['libgcc-s1:i386'])
+
+    def test_why_through_foreign_architecture_packages(self):
+        with fresh_singletons(admin_dir=self.admin_dir):
+            answer = why(build_graph(), 'libgcc-s1:i386')
+        self.assertEqual([chain['packages'] for chain in answer['chains']],
+                         [['wine', 'wine32', 'libc6:i386', 'libgcc-s1:i386']])
+
+    def test_impact_of_foreign_architecture_packages(self):
+        with fresh_singletons(admin_dir=self.admin_dir):
+            answer = asyncio.run(impact(build_graph(), ['wine'], installed_size=True))
+        self.assertEqual(list(answer['removed']), ['wine'])
+        self.assertEqual(sorted(answer['orphaned']), ['libc6:i386', 'libgcc-s1:i386', 'wine32'])
+        self.assertEqual(answer['bytes'], 4 * 4 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# ------------------------------------------------------------
+# tests/test_inspector.py
+#
+# tests of debinsight as library
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import asyncio
+import os.path
+import tempfile
+import unittest
+
+from debinsight.inspector import Inspector
+
+from .support import write_dpkg_database
+
+
+class InspectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.admin_dir = os.path.join(self.directory.name, 'dpkg')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_changed_dpkg_database_is_read_again(self):
+        file = os.path.join(self.directory.name, 'new.txt')
+        with open(file, 'wt') as f:
+            f.write('new\n')
+        write_dpkg_database(self.admin_dir, {'old': {}})
+
+        async def inspect_twice() -> tuple:
+            inspector = Inspector(admin_dir=self.admin_dir, no_rdepend=True)
+            before = await inspector.inspect(all=True)
+            write_dpkg_database(self.admin_dir, {'old': {'Depends': 'new'}, 'new': {'files': [file]}})
+            after = await inspector.inspect(all=True)
+            return before, after
+
+        before, after = asyncio.run(inspect_twice())
+        self.assertEqual(before.packages(), ['old'])
+        self.assertEqual(sorted(after.packages()), ['new', 'old'])
+        self.assertNotIn('depends', before['old'])
+        self.assertEqual(after['old']['depends'], [{'package': 'new'}])
+        self.assertEqual(after['new']['files'], {file: len('new\n')})
+
+
+if __name__ == '__main__':
+    unittest.main()
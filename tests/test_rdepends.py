@@ -0,0 +1,63 @@
+# ------------------------------------------------------------
+# tests/test_rdepends.py
+#
+# tests of collecting the reverse dependencies of packages
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import os
+import os.path
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from .support import write_dpkg_database
+from .test_admindir import _collect
+
+_FAKE_APT_CACHE = '''#!/bin/sh
+printf 'lib\\nReverse Depends:\\n  app\\n  old\\n  half\\n'
+'''
+
+
+class ReverseDependenciesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.admin_dir = os.path.join(self.directory.name, 'dpkg')
+        write_dpkg_database(self.admin_dir, {
+            'lib': {},
+            'app': {'Depends': 'lib'},
+            'old': {'Depends': 'lib', 'Status': 'deinstall ok config-files'},
+            'half': {'Depends': 'lib', 'Status': 'install reinstreq half-installed'},
+        })
+        self.bin_dir = os.path.join(self.directory.name, 'bin')
+        os.makedirs(self.bin_dir)
+        apt_cache = os.path.join(self.bin_dir, 'apt-cache')
+        with open(apt_cache, 'wt') as f:
+            f.write(_FAKE_APT_CACHE)
+        os.chmod(apt_cache, os.stat(apt_cache).st_mode | stat.S_IXUSR)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @unittest.skipIf(shutil.which('dpkg-query') is None, 'dpkg-query not found')
+    def test_backends_agree_on_installed_reverse_dependencies(self):
+        path = self.bin_dir + os.pathsep + os.environ.get('PATH', '')
+        for native in (True, False):
+            with self.subTest(native=native), mock.patch.dict(os.environ, {'PATH': path}):
+                database = _collect(admin_dir=self.admin_dir, native=native, targets=('lib',), no_files=True)
+                rdepend = database.packages['lib'].to_dict(database.names)['rdepend']
+                self.assertEqual(sorted(rdepend, key=lambda r: r['package']), [
+                    {'package': 'app', 'installed': True},
+                    {'package': 'half', 'installed': False},
+                    {'package': 'old', 'installed': False},
+                ])
+
+
+if __name__ == '__main__':
+    unittest.main()
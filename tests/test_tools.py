@@ -0,0 +1,59 @@
+# ------------------------------------------------------------
+# tests/test_tools.py
+#
+# tests of running the dpkg and apt tools as subprocesses
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import asyncio
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from debinsight.tools import ToolError, ToolRunner
+
+from .support import fresh_singletons, write_dpkg_database
+from .test_admindir import _collect
+
+
+class ToolRunnerTest(unittest.TestCase):
+
+    def test_failure_keeps_stderr(self):
+        with fresh_singletons():
+            result = asyncio.run(ToolRunner(1).run('sh', '-c', 'echo out; echo oops >&2; exit 3'))
+        self.assertEqual(result, (3, b'out\n', b'oops\n'))
+
+
+class ToolFailureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.admin_dir = os.path.join(self.directory.name, 'dpkg')
+        write_dpkg_database(self.admin_dir, {'a': {}})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @unittest.skipIf(shutil.which('dpkg-query') is None, 'dpkg-query not found')
+    def test_unknown_package_is_no_error(self):
+        database = _collect(admin_dir=self.admin_dir, native=False, targets=('nope',), no_files=True,
+                            no_rdepend=True)
+        self.assertNotIn('nope', database.packages)
+
+    @unittest.skipIf(shutil.which('dpkg-query') is None, 'dpkg-query not found')
+    def test_failure_tells_stderr(self):
+        with open(os.path.join(self.admin_dir, 'status'), 'wt') as f:
+            f.write('garbage\n')
+        with self.assertRaises(ToolError) as raised:
+            _collect(admin_dir=self.admin_dir, native=False, targets=('a',), no_files=True, no_rdepend=True)
+        self.assertIn('--status a: failed with exit code 2', str(raised.exception))
+        self.assertTrue(raised.exception.stderr)
+        self.assertIn(raised.exception.stderr.decode().strip(), str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# ------------------------------------------------------------
+# tests/test_verify.py
+#
+# tests of verifying installed files against their md5sums
+#
+# This file is part of debinsight.
+# See the LICENSE file for the software license.
+# (C) Copyright 2019, Oliver Maurhart, dyle71@gmail.com
+# ------------------------------------------------------------
+
+import asyncio
+import hashlib
+import tempfile
+import unittest
+
+from debinsight.verify import compare, hash_files, parse_md5sums
+
+from .support import write_linked_image
+
+
+class VerifyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root, self.host = write_linked_image(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parse_md5sums(self):
+        digest = hashlib.md5(b'').hexdigest()
+        self.assertEqual(parse_md5sums(digest.upper() + '  usr/bin/hello\n\n' + digest + ' *bin/sh\n'),
+                         {'/usr/bin/hello': digest, '/bin/sh': digest})
+
+    def test_absolute_symlinks_stay_in_the_root(self):
+        sums = {
+            '/lib/libfoo.so': hashlib.md5(b'xxx').hexdigest(),
+            '/lib/libimage.so': hashlib.md5(b'xxxxx').hexdigest(),
+            '/lib/libhost.so': hashlib.md5(b'xxxxxxx').hexdigest(),
+            '/lib64/libfoo.so': hashlib.md5(b'x' * 10).hexdigest(),
+        }
+        hashed = asyncio.run(hash_files(sums, self.root))
+        # the files of the host are neither hashed nor found
+        self.assertEqual(compare(sums, hashed), {
+            'checked': 4,
+            'modified': ['/lib64/libfoo.so'],
+            'missing': ['/lib/libhost.so'],
+            'unreadable': [],
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()